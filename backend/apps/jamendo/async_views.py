@@ -0,0 +1,446 @@
+# backend/apps/jamendo/async_views.py
+"""
+Jamendo 端點的非同步（ASGI）版本
+
+在 ASGI 部署模式下（settings.ASYNC_UPSTREAM_VIEWS）由 urls.py 使用，
+等待上游響應時不佔用 worker，單一進程可同時處理大量進行中的上游請求。
+"""
+import asyncio
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .caching import (
+    acached_fetch, acached_fetch_entry, aderived_entry, aget_cached_many, entry_data,
+    get_ttls, make_entry,
+)
+from .client import JAMENDO_API_BASE, CircuitOpenError, QuotaExceededError, get_client
+from .entities import MISSING, acache_missing, aget_cached_tracks, schedule_cache_tracks
+from .ingestion import schedule_ingest
+from .multi_search import ENTITY_SEARCHES, combine_search_results, entity_search_params
+from .pagination import parse_page
+from .responses import cached_json_response
+from .projection import aprojected, parse_fields, parse_request_fields, project_tracks, projected
+from .random_pool import draw_random_tracks, merge_random_tracks, pool_response
+from .search import local_search_response, local_tag_response
+from .views import (
+    JAMENDO_CLIENT_ID,
+    detail_params,
+    feed_params,
+    fetch_from_jamendo,
+    batch_section_loader,
+    bucket_limit,
+    cached_local_search,
+    fetch_track_detail,
+    get_cache_key,
+    merge_fetched_tracks,
+    multi_detail_params,
+    normalize_tracks,
+    page_entry,
+    parse_batch_sections,
+    parse_limit,
+    parse_track_ids,
+    plan_batch_section,
+    render_batch_section,
+    render_track_details,
+    slice_results,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def afetch_from_jamendo(endpoint, params):
+    """fetch_from_jamendo 的非同步版本，失敗時返回 None"""
+    try:
+        logger.info(f'Jamendo API 非同步請求: {endpoint} with params: {params}')
+
+        response = await get_client().aget(endpoint, params)
+
+        if response.status_code == 200:
+            data = response.json()
+
+            # 音軌寫入本地資料庫與逐首寫入實體緩存（都在背景執行）
+            if endpoint.strip('/') == 'tracks':
+                data = normalize_tracks(data)
+                schedule_ingest(data)
+                schedule_cache_tracks(data)
+
+            logger.info(f'Jamendo API 響應成功: {len(data.get("results", []))} 項結果')
+            return data
+        else:
+            logger.error(f'Jamendo API 錯誤: {response.status_code} - {response.text}')
+            return None
+
+    except CircuitOpenError:
+        logger.warning(f'Jamendo API 斷路器開啟，快速失敗: {endpoint}')
+        return None
+    except QuotaExceededError as e:
+        logger.warning(f'{str(e)}，跳過請求: {endpoint}')
+        return None
+    except httpx.TimeoutException:
+        logger.error('Jamendo API 請求超時')
+        return None
+    except httpx.HTTPError as e:
+        logger.error(f'Jamendo API 請求異常: {str(e)}')
+        return None
+
+async def ajamendo_api_entry(endpoint, params, cache_timeout=3600, cache_profile=None,
+                             aloader=None, loader=None, fields=None):
+    """jamendo_api_entry 的非同步版本"""
+    cache_key = get_cache_key(endpoint, params, fields)
+
+    return await acached_fetch_entry(
+        cache_key,
+        aprojected(aloader or (lambda: afetch_from_jamendo(endpoint, params)), fields),
+        projected(loader or (lambda: fetch_from_jamendo(endpoint, params)), fields),
+        profile=cache_profile,
+        timeout=cache_timeout
+    )
+
+async def ajamendo_api_request(endpoint, params, cache_timeout=3600, cache_profile=None):
+    """jamendo_api_request 的非同步版本"""
+    return entry_data(await ajamendo_api_entry(endpoint, params, cache_timeout, cache_profile))
+
+async def afetch_track_detail(track_id):
+    """fetch_track_detail 的非同步版本"""
+    data = await afetch_from_jamendo('tracks', detail_params(track_id))
+    if data and data.get('results'):
+        return data['results'][0]
+    return None
+
+async def aresolve_tracks(track_ids):
+    """resolve_tracks 的非同步版本"""
+    found = await aget_cached_tracks(track_ids)
+    missing = [track_id for track_id in track_ids if track_id not in found]
+    failed = False
+    if missing:
+        data = await afetch_from_jamendo('tracks', multi_detail_params(missing))
+        if data is None:
+            failed = True
+        else:
+            await acache_missing(merge_fetched_tracks(found, missing, data))
+    return {track_id: track for track_id, track in found.items() if track is not MISSING}, failed
+
+async def arandom_tracks_data(limit):
+    """random_tracks_data 的非同步版本（取池只讀內存，補充在背景線程中進行）"""
+    tracks = draw_random_tracks(limit)
+    if len(tracks) >= limit:
+        return pool_response(tracks)
+    data = await afetch_from_jamendo('tracks', feed_params('random', limit - len(tracks)))
+    return merge_random_tracks(tracks, data, limit)
+
+async def afeed_entry(feed, limit, value=None, fields=None):
+    """feed_entry 的非同步版本"""
+    bucket = bucket_limit(limit)
+    source = await ajamendo_api_entry(
+        'tracks', feed_params(feed, bucket, value), cache_profile=feed, fields=fields
+    )
+    if source is None or bucket == limit:
+        return source
+    return await aderived_entry(
+        get_cache_key('tracks', feed_params(feed, limit, value), fields),
+        source,
+        lambda data: slice_results(data, limit),
+        profile=feed
+    )
+
+async def apage_entry(feed, page, value=None, fields=None):
+    """page_entry 的非同步版本
+
+    翻頁快照的補充需要在同一快照的請求之間合併，在線程池中執行同步的 page_entry。
+    """
+    return await sync_to_async(page_entry, thread_sensitive=False)(feed, page, value, fields)
+
+async def aentity_search_entry(endpoint, query, limit):
+    """entity_search_entry 的非同步版本"""
+    return await ajamendo_api_entry(
+        endpoint, entity_search_params(query, limit),
+        cache_profile='search', fields=ENTITY_SEARCHES[endpoint]
+    )
+
+async def _feed_response(request, feed, limit, value=None, fields=None, page=None):
+    """列表端點共用的響應邏輯"""
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    if page:
+        entry = await apage_entry(feed, page, value, fields)
+    else:
+        entry = await afeed_entry(feed, limit, value, fields)
+
+    if entry:
+        return cached_json_response(request, entry)
+    else:
+        return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def search_tracks(request):
+    """搜尋音軌"""
+    search_query = request.GET.get('q', '')
+    limit = parse_limit(request)
+
+    if not search_query:
+        return JsonResponse({'error': '缺少搜尋查詢'}, status=400)
+
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    local_data = None if page else await sync_to_async(local_search_response)(search_query, limit)
+    if local_data is not None:
+        local_data = project_tracks(local_data, fields)
+        return cached_json_response(request, make_entry(local_data, get_ttls('search')[0], compress=False))
+
+    return await _feed_response(request, 'search', limit, search_query, fields, page)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def search_all(request):
+    """綜合搜尋：同時搜尋音軌、藝人、專輯與本地音軌庫，合併排序後分組返回"""
+    search_query = request.GET.get('q', '').strip()
+    limit = parse_limit(request, default=10, maximum=50)
+
+    if not search_query:
+        return JsonResponse({'error': '缺少搜尋查詢'}, status=400)
+
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    fields = parse_fields()
+    subqueries = {'tracks': afeed_entry('search', limit, search_query, fields)}
+    for endpoint in ENTITY_SEARCHES:
+        subqueries[endpoint] = aentity_search_entry(endpoint, search_query, limit)
+    if getattr(settings, 'JAMENDO_LOCAL_SEARCH_MODE', 'off') != 'off':
+        subqueries['local'] = sync_to_async(cached_local_search)(search_query, limit, fields)
+
+    outcomes = await asyncio.gather(*subqueries.values(), return_exceptions=True)
+    results = {}
+    for name, outcome in zip(subqueries, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f'綜合搜尋子查詢失敗 ({name}): {str(outcome)}')
+            results[name] = None
+        else:
+            # 本地搜尋返回數據，上游子查詢返回緩存項
+            results[name] = outcome if name == 'local' else entry_data(outcome)
+
+    return JsonResponse(combine_search_results(search_query, results, limit))
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def tracks_by_tag(request):
+    """按標籤獲取音軌"""
+    tag = request.GET.get('tag', '')
+    limit = parse_limit(request)
+
+    if not tag:
+        return JsonResponse({'error': '缺少標籤參數'}, status=400)
+
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    local_data = None if page else await sync_to_async(local_tag_response)(tag, limit)
+    if local_data is not None:
+        local_data = project_tracks(local_data, fields)
+        return cached_json_response(request, make_entry(local_data, get_ttls('tag')[0], compress=False))
+
+    return await _feed_response(request, 'tag', limit, tag, fields, page)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def popular_tracks(request):
+    """獲取熱門音軌"""
+    limit = parse_limit(request)
+
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return await _feed_response(request, 'popular', limit, fields=fields, page=page)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def latest_tracks(request):
+    """獲取最新音軌"""
+    limit = parse_limit(request)
+
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return await _feed_response(request, 'latest', limit, fields=fields, page=page)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def random_tracks(request):
+    """獲取隨機音軌"""
+    limit = parse_limit(request)
+
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    data = await arandom_tracks_data(limit)
+
+    if data:
+        return JsonResponse(data)
+    else:
+        return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def get_track_detail(request, track_id):
+    """獲取音軌詳情"""
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    entry = await ajamendo_api_entry(
+        'tracks', detail_params(track_id),
+        cache_profile='detail',
+        aloader=lambda: afetch_track_detail(track_id),
+        loader=lambda: fetch_track_detail(track_id)
+    )
+
+    if entry:
+        return cached_json_response(request, entry)
+    else:
+        return JsonResponse({'error': '找不到音軌'}, status=404)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def get_track_details(request):
+    """按多個 id 獲取音軌（?ids=1,2,3），命中實體緩存的音軌不請求上游"""
+    try:
+        track_ids = parse_track_ids(request)
+        fields = parse_fields(request.GET.get('fields'), request.GET.get('view') or 'full')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    tracks, failed = await aresolve_tracks(track_ids)
+
+    if failed and not tracks:
+        return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
+    return JsonResponse(render_track_details(track_ids, tracks, fields))
+
+async def afetch_batch_section(section):
+    """請求單個未命中緩存的區塊"""
+    try:
+        if section['cache_key'] is None:
+            data = await arandom_tracks_data(section['params']['limit'])
+            return project_tracks(data, section['fields'])
+        return await acached_fetch(
+            section['cache_key'],
+            aprojected(lambda: afetch_from_jamendo('tracks', section['params']), section['fields']),
+            batch_section_loader(section),
+            profile=section['type']
+        )
+    except Exception as e:
+        logger.error(f'批次區塊請求失敗: {str(e)}')
+        return None
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def batch_sections(request):
+    """批次獲取多個音軌區塊（首頁一次請求）"""
+    try:
+        specs = parse_batch_sections(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+
+    sections = [plan_batch_section(spec, index) for index, spec in enumerate(specs)]
+    lookups = {
+        section['cache_key']: (
+            batch_section_loader(section),
+            section['type'],
+            3600
+        )
+        for section in sections if section.get('cache_key')
+    }
+    hits = await aget_cached_many(lookups) if lookups else {}
+
+    pending = [
+        section for section in sections
+        if not section.get('error') and section['cache_key'] not in hits
+    ]
+    fetched = await asyncio.gather(*[afetch_batch_section(section) for section in pending])
+    fetched = {id(section): data for section, data in zip(pending, fetched)}
+
+    results = []
+    for section in sections:
+        if section.get('cache_key') in hits:
+            results.append(render_batch_section(section, hits[section['cache_key']], cached=True))
+        else:
+            results.append(render_batch_section(section, fetched.get(id(section))))
+
+    return JsonResponse({
+        'sections': results,
+        'count': len(results)
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def health_check(request):
+    """健康檢查端點"""
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({
+            'status': 'error',
+            'jamendo_api': 'not_configured',
+            'error': 'JAMENDO_CLIENT_ID 未設置'
+        }, status=500)
+
+    client = get_client()
+    if client.breaker.is_open:
+        return JsonResponse({
+            'status': 'degraded',
+            'jamendo_api': 'circuit_open',
+            'client_id_configured': True,
+            'circuit': client.breaker.snapshot()
+        }, status=503)
+
+    try:
+        data = await ajamendo_api_request('tracks', {'limit': 1}, cache_timeout=60)
+
+        if data:
+            return JsonResponse({
+                'status': 'healthy',
+                'jamendo_api': 'connected',
+                'client_id_configured': True,
+                'api_base': JAMENDO_API_BASE,
+                'cache_enabled': True,
+                'http_pool': client.describe(),
+                'async': True
+            })
+        else:
+            return JsonResponse({
+                'status': 'error',
+                'jamendo_api': 'failed',
+                'error': 'API 請求失敗',
+                'client_id_configured': True
+            }, status=500)
+
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'jamendo_api': 'failed',
+            'error': str(e),
+            'client_id_configured': bool(JAMENDO_CLIENT_ID)
+        }, status=500)
@@ -0,0 +1,51 @@
+# backend/apps/jamendo/background.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import quota
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """獲取當前進程的背景任務線程池（fork 後重新建立）"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'JAMENDO_BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='jamendo-bg'
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _run(fn, args, kwargs, level):
+    """執行背景任務，確保資料庫連線在任務前後被正確清理"""
+    close_old_connections()
+    try:
+        with quota.priority(level):
+            return fn(*args, **kwargs)
+    except Exception as e:
+        logger.error(f'背景任務失敗: {getattr(fn, "__name__", fn)} - {str(e)}')
+    finally:
+        close_old_connections()
+
+
+def submit(fn, *args, priority=None, **kwargs):
+    """在背景線程執行任務，不阻塞當前請求
+
+    任務中的上游請求默認以 feed 優先級計入配額（見 quota.py）。
+    """
+    return _get_executor().submit(_run, fn, args, kwargs, priority or quota.FEED)
@@ -0,0 +1,400 @@
+# backend/apps/jamendo/cache_backends.py
+"""
+兩層緩存後端：進程內 LRU（L1）+ 共享緩存（L2，例如 Redis）
+
+    CACHES = {
+        'default': {...},  # 共享緩存
+        'jamendo': {
+            'BACKEND': 'apps.jamendo.cache_backends.TieredCache',
+            'OPTIONS': {
+                'SHARED_ALIAS': 'default',
+                'MAX_ENTRIES': 1000,
+                'MAX_BYTES': 64 * 1024 * 1024,
+                'LOCAL_TIMEOUT': 30,
+                'INVALIDATION': 'redis',  # 'redis' | 'local'
+                'CODEC': 'binary',        # 共享層的值編碼，見 cache_codecs
+            },
+        },
+    }
+
+寫入與刪除會透過失效訊息通知其他 worker 清除各自的 L1，
+LOCAL_TIMEOUT 則限制了在收不到訊息時 L1 可能落後 L2 的最長時間。
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .cache_codecs import CodecError, get_codec
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'jamendo:cache:invalidate'
+CLEAR_ALL = '*'
+
+_MISS = object()
+
+
+class LocalLRU:
+    """有容量（條目數與位元組數）上限的進程內 LRU，值以 pickle 位元組存放"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回 (是否命中, pickle 位元組)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            payload, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return False, None
+            self._data.move_to_end(key)
+            return True, payload
+
+    def set(self, key, payload, ttl):
+        """寫入並按 LRU 淘汰，返回被淘汰的條目數"""
+        if len(payload) > self.max_bytes:
+            self.delete(key)
+            return 0
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        evicted = 0
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (payload, expires_at)
+            self.size += len(payload)
+            while self._data and (len(self._data) > self.max_entries or self.size > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+                evicted += 1
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self.size -= len(item[0])
+        return True
+
+
+class LocalInvalidationBus:
+    """進程內失效通知（共享層為本地替身時使用，例如測試與開發環境）"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def start(self, handler):
+        pass
+
+    def publish(self, key):
+        pass
+
+
+class RedisInvalidationBus:
+    """透過 Redis pub/sub 廣播 L1 失效訊息"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.sender_id = uuid.uuid4().hex
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection(self.alias)
+
+    def start(self, handler):
+        """每個 worker 進程啟動一個訂閱線程（fork 後重新啟動）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self.sender_id = uuid.uuid4().hex
+            thread = threading.Thread(
+                target=self._listen,
+                args=(handler,),
+                name='jamendo-cache-invalidation',
+                daemon=True
+            )
+            thread.start()
+
+    def _listen(self, handler):
+        while True:
+            try:
+                pubsub = self._connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    data = message.get('data')
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    sender, _, key = data.partition(':')
+                    if sender != self.sender_id:
+                        handler(key)
+            except Exception as e:
+                logger.warning(f'緩存失效訂閱中斷，稍後重連: {str(e)}')
+                # 斷線期間可能錯過訊息，清空 L1 以免讀到舊數據
+                handler(CLEAR_ALL)
+                time.sleep(1)
+
+    def publish(self, key):
+        try:
+            self._connection().publish(INVALIDATION_CHANNEL, f'{self.sender_id}:{key}')
+        except Exception as e:
+            logger.warning(f'緩存失效訊息發送失敗: {str(e)}')
+
+
+INVALIDATION_BUSES = {
+    'local': LocalInvalidationBus,
+    'redis': RedisInvalidationBus,
+}
+
+
+class TieredCache(BaseCache):
+    """L1 進程內 LRU 在前、L2 共享緩存在後的兩層緩存
+
+    - get：先查 L1，未命中再查 L2 並回填 L1
+    - set/delete：寫入 L2、更新本地 L1，並通知其他 worker 清除 L1
+    - add/incr 等原子操作只在 L2 上執行（可用於跨 worker 的鎖）
+    - set_many_shared/get_many_shared：只讀寫 L2，用於大量、不需 L1 的鍵
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED_ALIAS', 'default')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self.local = LocalLRU(
+            max_entries=options.get('MAX_ENTRIES', 1000),
+            max_bytes=options.get('MAX_BYTES', 64 * 1024 * 1024),
+        )
+        self.bus = INVALIDATION_BUSES[options.get('INVALIDATION', 'local')](self.shared_alias)
+        self.codec = get_codec(options.get('CODEC', 'pickle'), options)
+        self.counters = Counter()
+        self._counter_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _count(self, name, n=1):
+        with self._counter_lock:
+            self.counters[name] += n
+
+    def _local_key(self, key, version):
+        self.bus.start(self._on_invalidate)
+        return self.make_and_validate_key(key, version=version)
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _fill_local(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self._local_ttl(timeout)
+        if ttl is not None and ttl <= 0:
+            return
+        evicted = self.local.set(local_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+        if evicted:
+            self._count('l1_evictions', evicted)
+
+    def _decode(self, key, stored):
+        """解碼共享層的值，無法解碼時返回 _MISS（視為未命中）"""
+        try:
+            return self.codec.decode(stored)
+        except CodecError as e:
+            logger.warning(f'緩存值無法解碼，視為未命中: {key} ({str(e)})')
+            self._count('codec_errors')
+            return _MISS
+
+    def _on_invalidate(self, local_key):
+        if local_key == CLEAR_ALL:
+            self.local.clear()
+        else:
+            self.local.delete(local_key)
+        self._count('l1_invalidations')
+
+    def _invalidate(self, local_key):
+        self.local.delete(local_key)
+        self.bus.publish(local_key)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        hit, payload = self.local.get(local_key)
+        if hit:
+            self._count('l1_hits')
+            return pickle.loads(payload)
+        self._count('l1_misses')
+
+        stored = self.shared.get(key, _MISS, version=version)
+        value = _MISS if stored is _MISS else self._decode(key, stored)
+        if value is _MISS:
+            self._count('l2_misses')
+            return default
+        self._count('l2_hits')
+        self._fill_local(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            hit, payload = self.local.get(local_key)
+            if hit:
+                found[key] = pickle.loads(payload)
+            else:
+                missing.append(key)
+        self._count('l1_hits', len(found))
+        self._count('l1_misses', len(missing))
+
+        if missing:
+            shared_found = {}
+            for key, stored in self.shared.get_many(missing, version=version).items():
+                value = self._decode(key, stored)
+                if value is not _MISS:
+                    shared_found[key] = value
+            self._count('l2_hits', len(shared_found))
+            self._count('l2_misses', len(missing) - len(shared_found))
+            for key, value in shared_found.items():
+                self._fill_local(self.make_key(key, version=version), value)
+            found.update(shared_found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        self.shared.set(key, self.codec.encode(value), timeout, version=version)
+        self.bus.publish(local_key)
+        self._fill_local(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(
+            {key: self.codec.encode(value) for key, value in data.items()}, timeout, version=version
+        )
+        for key, value in data.items():
+            local_key = self._local_key(key, version)
+            self.bus.publish(local_key)
+            if key not in failed:
+                self._fill_local(local_key, value, timeout)
+        return failed
+
+    def set_many_shared(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """只寫入共享層（經過編碼），不填充 L1、不發送失效通知
+
+        用於只經 get_many_shared 讀取、不會出現在 L1 中的鍵（例如單首音軌的實體緩存）。
+        """
+        return self.shared.set_many(
+            {key: self.codec.encode(value) for key, value in data.items()}, timeout, version=version
+        )
+
+    def get_many_shared(self, keys, version=None):
+        """只讀共享層，不回填 L1"""
+        found = {}
+        for key, stored in self.shared.get_many(keys, version=version).items():
+            value = self._decode(key, stored)
+            if value is not _MISS:
+                found[key] = value
+        self._count('l2_hits', len(found))
+        self._count('l2_misses', len(keys) - len(found))
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        added = self.shared.add(key, self.codec.encode(value), timeout, version=version)
+        if added:
+            self._invalidate(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        self._invalidate(local_key)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._invalidate(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        hit, _ = self.local.get(self._local_key(key, version))
+        return hit or self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._local_key(key, version)
+        value = self.shared.incr(key, delta, version=version)
+        self._invalidate(local_key)
+        return value
+
+    def clear(self):
+        self.local.clear()
+        self.bus.publish(CLEAR_ALL)
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def stats(self):
+        """各層命中統計（當前 worker 進程）"""
+        with self._counter_lock:
+            counters = dict(self.counters)
+
+        def ratio(hits, misses):
+            total = hits + misses
+            return round(hits / total, 4) if total else None
+
+        l1_hits, l1_misses = counters.get('l1_hits', 0), counters.get('l1_misses', 0)
+        l2_hits, l2_misses = counters.get('l2_hits', 0), counters.get('l2_misses', 0)
+        return {
+            'pid': os.getpid(),
+            'codec': self.codec.name,
+            'codec_errors': counters.get('codec_errors', 0),
+            'l1': {
+                'hits': l1_hits,
+                'misses': l1_misses,
+                'hit_ratio': ratio(l1_hits, l1_misses),
+                'entries': len(self.local),
+                'bytes': self.local.size,
+                'max_entries': self.local.max_entries,
+                'max_bytes': self.local.max_bytes,
+                'evictions': counters.get('l1_evictions', 0),
+                'invalidations': counters.get('l1_invalidations', 0),
+            },
+            'l2': {
+                'alias': self.shared_alias,
+                'backend': type(self.shared).__name__,
+                'hits': l2_hits,
+                'misses': l2_misses,
+                'hit_ratio': ratio(l2_hits, l2_misses),
+            },
+        }
@@ -0,0 +1,148 @@
+# backend/apps/jamendo/cache_codecs.py
+"""
+共享緩存層的值編碼（TieredCache 的 CODEC 選項）
+
+- pickle：原樣交給共享層後端，由後端自行 pickle（原有行為）
+- binary：b'JC' + 版本（1 byte）+ 旗標（1 byte）+ msgpack 序列化內容，
+  超過 CODEC_COMPRESS_MIN_SIZE 時以 zlib 壓縮；msgpack 無法表示的值改用 pickle
+
+緩存項的 variants（gzip / brotli 預壓縮版本）已是壓縮內容，再以 zlib 壓縮只浪費 CPU：
+版本 2 把 variants 分開序列化放在 zlib 壓縮部分之後（FLAG_VARIANTS），
+內容為 4 byte 長度 + 其餘欄位（可壓縮）+ variants（不壓縮）。整數不編碼，原樣交給
+共享層後端，incr / decr 仍可使用。
+
+L1 仍保存 pickle 位元組（命中時不需解壓），編碼只影響共享層的佔用與傳輸量。
+讀取時不帶標記的值視為切換編碼前寫入的舊值原樣返回，之後寫入的值使用新格式；
+版本號較新（本進程無法解碼）的值視為未命中，滾動部署期間新舊 worker 可以共存。
+msgpack 不區分 tuple 與 list，tuple 讀出後為 list。
+"""
+import pickle
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # msgpack 為可選依賴，未安裝時序列化改用 pickle
+    msgpack = None
+
+MAGIC = b'JC'
+VERSION = 2
+
+FLAG_MSGPACK = 0x01
+FLAG_ZLIB = 0x02
+FLAG_VARIANTS = 0x04
+
+_HEADER_SIZE = len(MAGIC) + 2
+_LENGTH = struct.Struct('>I')
+
+
+class CodecError(ValueError):
+    """緩存值無法解碼（格式版本不支持或內容損壞）"""
+
+
+def _variants(value):
+    """緩存項中已壓縮的 variants，其他值返回 None"""
+    if isinstance(value, dict) and isinstance(value.get('variants'), dict):
+        return value['variants'] or None
+    return None
+
+
+class PickleCodec:
+    """原有行為：共享層保存原始對象"""
+
+    name = 'pickle'
+
+    def __init__(self, options=None):
+        pass
+
+    def encode(self, value):
+        return value
+
+    def decode(self, stored):
+        return stored
+
+
+class BinaryCodec:
+    """帶版本標記的 msgpack + zlib 編碼"""
+
+    name = 'binary'
+
+    def __init__(self, options=None):
+        options = options or {}
+        self.compress_min_size = options.get('CODEC_COMPRESS_MIN_SIZE', 1024)
+        self.compress_level = options.get('CODEC_COMPRESS_LEVEL', 1)
+
+    def _serialize(self, value):
+        if msgpack is not None:
+            try:
+                return FLAG_MSGPACK, msgpack.packb(value, use_bin_type=True)
+            except (TypeError, ValueError, OverflowError):
+                # msgpack 無法表示的值（例如自訂對象）
+                pass
+        return 0, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _loads(self, flags, body):
+        if flags & FLAG_MSGPACK:
+            if msgpack is None:
+                raise CodecError('解碼緩存值需要 msgpack 套件')
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        return pickle.loads(body)
+
+    def encode(self, value):
+        # 整數原樣保存，共享層的 incr 仍可使用
+        if type(value) is int:
+            return value
+        variants = _variants(value)
+        if variants:
+            value = {**value, 'variants': {}}
+        flags, body = self._serialize(value)
+        if self.compress_min_size and len(body) >= self.compress_min_size:
+            compressed = zlib.compress(body, self.compress_level)
+            if len(compressed) < len(body):
+                flags, body = flags | FLAG_ZLIB, compressed
+        if variants:
+            # variants 以與其餘欄位相同的序列化方式保存，不經過 zlib
+            if flags & FLAG_MSGPACK:
+                tail = msgpack.packb(variants, use_bin_type=True)
+            else:
+                tail = pickle.dumps(variants, pickle.HIGHEST_PROTOCOL)
+            flags, body = flags | FLAG_VARIANTS, _LENGTH.pack(len(body)) + body + tail
+        return MAGIC + bytes((VERSION, flags)) + body
+
+    def decode(self, stored):
+        if not isinstance(stored, bytes) or not stored.startswith(MAGIC):
+            return stored
+        if len(stored) < _HEADER_SIZE:
+            raise CodecError('緩存值格式損壞')
+        version, flags = stored[len(MAGIC)], stored[len(MAGIC) + 1]
+        if version > VERSION:
+            raise CodecError(f'不支持的緩存值格式版本: {version}')
+
+        body = stored[_HEADER_SIZE:]
+        try:
+            tail = None
+            if flags & FLAG_VARIANTS:
+                (size,) = _LENGTH.unpack_from(body)
+                body, tail = body[_LENGTH.size:_LENGTH.size + size], body[_LENGTH.size + size:]
+            if flags & FLAG_ZLIB:
+                body = zlib.decompress(body)
+            value = self._loads(flags, body)
+            if tail is not None:
+                value = {**value, 'variants': self._loads(flags, tail)}
+            return value
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f'緩存值解碼失敗: {str(e)}') from e
+
+
+CODECS = {
+    'pickle': PickleCodec,
+    'binary': BinaryCodec,
+}
+
+
+def get_codec(name, options=None):
+    if name not in CODECS:
+        raise ValueError(f'不支持的緩存編碼: {name}')
+    return CODECS[name](options)
@@ -0,0 +1,594 @@
+# backend/apps/jamendo/caching.py
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from . import background
+from .compression import compress_variants
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次進行中的上游請求"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """進程內的請求合併：同一個 key 同時只有一個線程執行 fn，其餘線程等待結果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """事件循環內的請求合併：同一個 key 同時只有一個協程請求上游"""
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+
+    async def do(self, key, coro_fn):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = loop.create_task(coro_fn())
+            calls[key] = task
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        # 個別等待者被取消時不影響共享的請求
+        return await asyncio.shield(task)
+
+
+_single_flight = SingleFlight()
+_async_single_flight = AsyncSingleFlight()
+
+
+def get_cache():
+    """Jamendo 響應使用的緩存（settings.JAMENDO_CACHE_ALIAS）"""
+    return caches[getattr(settings, 'JAMENDO_CACHE_ALIAS', 'default')]
+
+
+def get_lock_cache():
+    """鎖只能放在共享層：兩層緩存的 L1 會讓其他 worker 的鎖狀態延遲可見"""
+    response_cache = get_cache()
+    return getattr(response_cache, 'shared', response_cache)
+
+
+def _in_thread(method):
+    """在線程池中執行緩存操作
+
+    BaseCache 的 aget / aset 等以 thread_sensitive=True 包裝同步方法，所有協程的緩存
+    操作都排隊在同一條線程上執行；兩層緩存與共享層客戶端都是線程安全的，
+    非同步路徑一律以 thread_sensitive=False 呼叫同步方法。
+    """
+    return sync_to_async(method, thread_sensitive=False)
+
+
+def _lock_timeout():
+    return getattr(settings, 'JAMENDO_SINGLE_FLIGHT_LOCK_TIMEOUT', 15)
+
+
+def _wait_timeout():
+    return getattr(settings, 'JAMENDO_SINGLE_FLIGHT_WAIT_TIMEOUT', 15)
+
+
+def _poll_interval():
+    return getattr(settings, 'JAMENDO_SINGLE_FLIGHT_POLL_INTERVAL', 0.05)
+
+
+def get_ttls(profile, default=3600):
+    """獲取緩存配置的 (soft TTL, hard TTL)
+
+    soft TTL 之後返回舊數據並在背景刷新，hard TTL 之後緩存才真正失效。
+    未啟用 stale-while-revalidate 時兩者相同。
+    """
+    ttls = getattr(settings, 'JAMENDO_CACHE_TTLS', {}).get(profile) or {}
+    soft = ttls.get('soft', default)
+    hard = max(ttls.get('hard', soft), soft)
+    if not getattr(settings, 'JAMENDO_CACHE_SWR_ENABLED', True):
+        hard = soft
+    return soft, hard
+
+
+def encode_body(data):
+    """把數據編碼為 JSON 響應內容，返回 (body, etag)"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def make_entry(data, soft_ttl, fetch_duration=0.0, compress=True):
+    """包裝緩存數據：只保存已編碼的 JSON 與內容雜湊，命中時可直接作為響應返回
+
+    同時記錄 soft 過期時間與上游請求耗時；compress 時一併保存
+    gzip / brotli 預壓縮版本（variants）。
+    """
+    body, etag = encode_body(data)
+    return {
+        'body': body,
+        'etag': etag,
+        'soft_expires_at': time.time() + soft_ttl,
+        'delta': fetch_duration,
+        'variants': compress_variants(body) if compress else {},
+    }
+
+
+def is_entry(value):
+    return isinstance(value, dict) and 'body' in value and 'soft_expires_at' in value
+
+
+def entry_data(entry):
+    """解碼緩存項中的數據"""
+    return json.loads(entry['body']) if entry is not None else None
+
+
+def _negative_ttl():
+    return getattr(settings, 'JAMENDO_NEGATIVE_CACHE_TTL', 30)
+
+
+def _last_known_good_ttl(profile, hard_ttl):
+    """最後成功數據的保留秒數，不保存時返回 0
+
+    只保存 JAMENDO_LAST_KNOWN_GOOD_PROFILES 中需要故障回退的緩存配置（列表與詳情），
+    保留到 hard TTL 之後 JAMENDO_LAST_KNOWN_GOOD_TTL 秒。
+    """
+    if profile not in getattr(settings, 'JAMENDO_LAST_KNOWN_GOOD_PROFILES', ()):
+        return 0
+    return hard_ttl + max(getattr(settings, 'JAMENDO_LAST_KNOWN_GOOD_TTL', 86400), 0)
+
+
+def _negative_key(cache_key):
+    return f'{cache_key}:neg'
+
+
+def _last_known_good_key(cache_key):
+    return f'{cache_key}:lkg'
+
+
+def _set_shared(key, value, timeout):
+    """寫入響應緩存的共享層（與緩存項相同的別名與編碼），不填充 L1"""
+    cache = get_cache()
+    if hasattr(cache, 'set_many_shared'):
+        cache.set_many_shared({key: value}, timeout)
+    else:
+        cache.set(key, value, timeout)
+
+
+def _get_shared(key):
+    cache = get_cache()
+    if hasattr(cache, 'get_many_shared'):
+        return cache.get_many_shared([key]).get(key)
+    return cache.get(key)
+
+
+def _store(cache_key, entry, hard_ttl, profile=None):
+    """寫入緩存項；列表與詳情另在共享層保存一份最後成功數據（上游故障時使用）"""
+    get_cache().set(cache_key, entry, hard_ttl)
+    last_known_good_ttl = _last_known_good_ttl(profile, hard_ttl)
+    if last_known_good_ttl > 0:
+        _set_shared(_last_known_good_key(cache_key), entry, last_known_good_ttl)
+
+
+def _store_negative(cache_key):
+    """上游失敗（404、錯誤響應、超時、斷路器開啟）時短暫記錄，避免重複請求"""
+    if _negative_ttl() > 0:
+        get_cache().set(_negative_key(cache_key), True, _negative_ttl())
+
+
+def _load_and_store(cache_key, loader, soft_ttl, hard_ttl, profile=None):
+    """執行 loader，成功時寫入緩存並返回緩存項"""
+    started = time.monotonic()
+    data = loader()
+    if data is None:
+        _store_negative(cache_key)
+        return None
+    entry = make_entry(data, soft_ttl, time.monotonic() - started)
+    _store(cache_key, entry, hard_ttl, profile)
+    return entry
+
+
+def last_known_good(cache_key, profile=None):
+    """最後一次成功的緩存項（已超過 hard TTL 的數據），沒有時返回 None"""
+    if profile not in getattr(settings, 'JAMENDO_LAST_KNOWN_GOOD_PROFILES', ()):
+        return None
+    entry = _get_shared(_last_known_good_key(cache_key))
+    if not is_entry(entry):
+        return None
+    logger.warning(f'上游不可用，返回最後成功的緩存數據: {cache_key}')
+    return entry
+
+
+def _get_entry(cache_key):
+    entry = get_cache().get(cache_key)
+    return entry if is_entry(entry) else None
+
+
+def _fetch_with_shared_lock(cache_key, loader, soft_ttl, hard_ttl, profile=None):
+    """跨 worker 的請求合併：以共享緩存中的鎖確保只有一個 worker 請求上游"""
+    # 等待鎖期間其他線程/進程可能已經寫入緩存
+    entry = _get_entry(cache_key)
+    if entry is not None:
+        return entry
+
+    lock_cache = get_lock_cache()
+    lock_key = f'{cache_key}:lock'
+    token = uuid.uuid4().hex
+    if lock_cache.add(lock_key, token, _lock_timeout()):
+        try:
+            return _load_and_store(cache_key, loader, soft_ttl, hard_ttl, profile)
+        finally:
+            if lock_cache.get(lock_key) == token:
+                lock_cache.delete(lock_key)
+
+    # 其他 worker 正在請求，輪詢緩存等待結果
+    deadline = time.monotonic() + _wait_timeout()
+    interval = _poll_interval()
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        entry = _get_entry(cache_key)
+        if entry is not None:
+            return entry
+        if lock_cache.get(lock_key) is None:
+            # 持鎖者失敗或已釋放但未寫入緩存
+            break
+
+    logger.warning(f'等待其他 worker 的請求結果逾時，自行請求上游: {cache_key}')
+    return _load_and_store(cache_key, loader, soft_ttl, hard_ttl, profile)
+
+
+def coalesced_fetch(cache_key, loader, soft_ttl, hard_ttl=None, profile=None):
+    """緩存未命中時合併並發請求，每個緩存鍵同時只有一個上游請求
+
+    loader 返回 None 表示失敗，不會寫入緩存。返回緩存項或 None。
+    """
+    hard_ttl = hard_ttl or soft_ttl
+    return _single_flight.do(
+        cache_key,
+        lambda: _fetch_with_shared_lock(cache_key, loader, soft_ttl, hard_ttl, profile)
+    )
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def refresh_entry(cache_key, loader, soft_ttl, hard_ttl, profile=None):
+    """立即刷新緩存（不等待），已有其他線程/worker 持鎖時返回 None"""
+    lock_cache = get_lock_cache()
+    lock_key = f'{cache_key}:lock'
+    token = uuid.uuid4().hex
+    if not lock_cache.add(lock_key, token, _lock_timeout()):
+        return None
+    try:
+        return _load_and_store(cache_key, loader, soft_ttl, hard_ttl, profile)
+    finally:
+        if lock_cache.get(lock_key) == token:
+            lock_cache.delete(lock_key)
+
+
+def _refresh(cache_key, loader, soft_ttl, hard_ttl, profile):
+    """背景刷新緩存，已有其他線程/worker 在刷新時直接跳過"""
+    try:
+        if refresh_entry(cache_key, loader, soft_ttl, hard_ttl, profile) is not None:
+            logger.info(f'背景刷新緩存完成: {cache_key}')
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+
+
+def schedule_refresh(cache_key, loader, soft_ttl, hard_ttl, profile=None):
+    """排程背景刷新，同一進程內同一緩存鍵只排一次"""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return False
+        _refreshing.add(cache_key)
+    background.submit(_refresh, cache_key, loader, soft_ttl, hard_ttl, profile)
+    return True
+
+
+def should_refresh(entry, now=None):
+    """判斷緩存項是否需要刷新
+
+    超過 soft TTL 時一定刷新；否則按 XFetch 演算法以上游耗時與
+    JAMENDO_CACHE_EARLY_REFRESH_BETA 做機率性提前刷新，避免大量緩存同時過期。
+    """
+    now = now or time.time()
+    if now >= entry['soft_expires_at']:
+        return True
+    beta = getattr(settings, 'JAMENDO_CACHE_EARLY_REFRESH_BETA', 0)
+    if beta <= 0 or not entry.get('delta'):
+        return False
+    return now - entry['delta'] * beta * math.log(random.random() or 1e-12) >= entry['soft_expires_at']
+
+
+def get_cached_many(specs):
+    """批次讀取緩存（一次 get_many）
+
+    specs 為 {cache_key: (loader, profile, timeout)}，返回命中的 {cache_key: data}；
+    超過 soft TTL 的命中項同樣返回，並排程背景刷新。
+    """
+    found = {}
+    for cache_key, entry in get_cache().get_many(list(specs)).items():
+        if not is_entry(entry):
+            continue
+        loader, profile, timeout = specs[cache_key]
+        if should_refresh(entry):
+            schedule_refresh(cache_key, loader, *get_ttls(profile, timeout), profile)
+        found[cache_key] = entry_data(entry)
+    return found
+
+
+def cached_fetch_entry(cache_key, loader, profile=None, timeout=3600):
+    """帶 stale-while-revalidate 的緩存讀取，返回緩存項（含已編碼的響應內容）
+
+    - 新鮮：直接返回
+    - 超過 soft TTL（或觸發提前刷新）：立即返回舊數據並在背景刷新
+    - 不存在（超過 hard TTL）：合併並發請求後同步請求上游
+    - 上游失敗：返回最後成功的數據（JAMENDO_LAST_KNOWN_GOOD_PROFILES 中的配置，
+      hard TTL 之後 JAMENDO_LAST_KNOWN_GOOD_TTL 內），並在 JAMENDO_NEGATIVE_CACHE_TTL 內不再請求同一緩存鍵
+    """
+    soft_ttl, hard_ttl = get_ttls(profile, timeout)
+
+    entry = _get_entry(cache_key)
+    if entry is not None:
+        if should_refresh(entry):
+            schedule_refresh(cache_key, loader, soft_ttl, hard_ttl, profile)
+        return entry
+
+    # 近期上游失敗過的緩存鍵不再請求，直接使用最後成功的數據或失敗
+    if get_cache().get(_negative_key(cache_key)):
+        return last_known_good(cache_key, profile)
+
+    entry = coalesced_fetch(cache_key, loader, soft_ttl, hard_ttl, profile)
+    if entry is None:
+        entry = last_known_good(cache_key, profile)
+    return entry
+
+
+def cached_fetch(cache_key, loader, profile=None, timeout=3600):
+    """同 cached_fetch_entry，返回解碼後的數據"""
+    return entry_data(cached_fetch_entry(cache_key, loader, profile, timeout))
+
+
+def _derive(source_entry, derive):
+    entry = make_entry(derive(entry_data(source_entry)), 0)
+    # 與來源同時過期，來源內容變化（ETag 不同）時重新衍生
+    entry['soft_expires_at'] = source_entry['soft_expires_at']
+    entry['source_etag'] = source_entry['etag']
+    return entry
+
+
+def derived_entry(cache_key, source_entry, derive, profile=None, timeout=3600):
+    """由來源緩存項衍生的緩存項（例如從較大的結果集切片），不請求上游
+
+    衍生結果同樣保存已編碼與預壓縮的內容，命中時不需重新編碼。
+    """
+    entry = _get_entry(cache_key)
+    if entry is not None and entry.get('source_etag') == source_entry['etag']:
+        return entry
+    hard_ttl = get_ttls(profile, timeout)[1]
+    entry = _derive(source_entry, derive)
+    get_cache().set(cache_key, entry, hard_ttl)
+    return entry
+
+
+async def _aload_and_store(cache_key, aloader, soft_ttl, hard_ttl, profile=None):
+    started = time.monotonic()
+    data = await aloader()
+    if data is None:
+        if _negative_ttl() > 0:
+            await _in_thread(get_cache().set)(_negative_key(cache_key), True, _negative_ttl())
+        return None
+    entry = make_entry(data, soft_ttl, time.monotonic() - started)
+    await _in_thread(get_cache().set)(cache_key, entry, hard_ttl)
+    last_known_good_ttl = _last_known_good_ttl(profile, hard_ttl)
+    if last_known_good_ttl > 0:
+        await _in_thread(_set_shared)(
+            _last_known_good_key(cache_key), entry, last_known_good_ttl
+        )
+    return entry
+
+
+async def alast_known_good(cache_key, profile=None):
+    """last_known_good 的非同步版本"""
+    if profile not in getattr(settings, 'JAMENDO_LAST_KNOWN_GOOD_PROFILES', ()):
+        return None
+    entry = await _in_thread(_get_shared)(_last_known_good_key(cache_key))
+    if not is_entry(entry):
+        return None
+    logger.warning(f'上游不可用，返回最後成功的緩存數據: {cache_key}')
+    return entry
+
+
+async def _aget_entry(cache_key):
+    entry = await _in_thread(get_cache().get)(cache_key)
+    return entry if is_entry(entry) else None
+
+
+async def _afetch_with_shared_lock(cache_key, aloader, soft_ttl, hard_ttl, profile=None):
+    """_fetch_with_shared_lock 的非同步版本"""
+    entry = await _aget_entry(cache_key)
+    if entry is not None:
+        return entry
+
+    lock_cache = get_lock_cache()
+    lock_key = f'{cache_key}:lock'
+    token = uuid.uuid4().hex
+    if await _in_thread(lock_cache.add)(lock_key, token, _lock_timeout()):
+        try:
+            return await _aload_and_store(cache_key, aloader, soft_ttl, hard_ttl, profile)
+        finally:
+            if await _in_thread(lock_cache.get)(lock_key) == token:
+                await _in_thread(lock_cache.delete)(lock_key)
+
+    deadline = time.monotonic() + _wait_timeout()
+    interval = _poll_interval()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(interval)
+        entry = await _aget_entry(cache_key)
+        if entry is not None:
+            return entry
+        if await _in_thread(lock_cache.get)(lock_key) is None:
+            break
+
+    logger.warning(f'等待其他 worker 的請求結果逾時，自行請求上游: {cache_key}')
+    return await _aload_and_store(cache_key, aloader, soft_ttl, hard_ttl, profile)
+
+
+async def aget_cached_many(specs):
+    """get_cached_many 的非同步版本"""
+    found = {}
+    for cache_key, entry in (await _in_thread(get_cache().get_many)(list(specs))).items():
+        if not is_entry(entry):
+            continue
+        loader, profile, timeout = specs[cache_key]
+        if should_refresh(entry):
+            schedule_refresh(cache_key, loader, *get_ttls(profile, timeout), profile)
+        found[cache_key] = entry_data(entry)
+    return found
+
+
+async def acached_fetch_entry(cache_key, aloader, loader, profile=None, timeout=3600):
+    """cached_fetch_entry 的非同步版本
+
+    未命中時以 aloader 非同步請求上游；背景刷新仍在背景線程中以同步的 loader 執行。
+    """
+    soft_ttl, hard_ttl = get_ttls(profile, timeout)
+
+    entry = await _aget_entry(cache_key)
+    if entry is not None:
+        if should_refresh(entry):
+            schedule_refresh(cache_key, loader, soft_ttl, hard_ttl, profile)
+        return entry
+
+    if await _in_thread(get_cache().get)(_negative_key(cache_key)):
+        return await alast_known_good(cache_key, profile)
+
+    entry = await _async_single_flight.do(
+        cache_key,
+        lambda: _afetch_with_shared_lock(cache_key, aloader, soft_ttl, hard_ttl, profile)
+    )
+    if entry is None:
+        entry = await alast_known_good(cache_key, profile)
+    return entry
+
+
+async def acached_fetch(cache_key, aloader, loader, profile=None, timeout=3600):
+    """同 acached_fetch_entry，返回解碼後的數據"""
+    return entry_data(await acached_fetch_entry(cache_key, aloader, loader, profile, timeout))
+
+
+async def aderived_entry(cache_key, source_entry, derive, profile=None, timeout=3600):
+    """derived_entry 的非同步版本"""
+    entry = await _aget_entry(cache_key)
+    if entry is not None and entry.get('source_etag') == source_entry['etag']:
+        return entry
+    hard_ttl = get_ttls(profile, timeout)[1]
+    entry = _derive(source_entry, derive)
+    await _in_thread(get_cache().set)(cache_key, entry, hard_ttl)
+    return entry
+
+
+def _load_pinned(cache_key, loader, ttl):
+    entry = _get_entry(cache_key)
+    if entry is not None:
+        return entry
+    data = loader()
+    if data is None:
+        return None
+    entry = make_entry(data, ttl)
+    # 多個 worker 同時請求同一頁時以先寫入的內容為準，之後不再覆寫
+    if not get_cache().add(cache_key, entry, ttl):
+        entry = _get_entry(cache_key) or entry
+    return entry
+
+
+def pinned_entry(cache_key, loader, ttl):
+    """固定內容的緩存項（分頁快照）：只請求一次上游，ttl 內不刷新也不覆寫
+
+    不寫入最後成功數據與失敗標記，快照過期後緩存鍵不會再被使用。
+    """
+    entry = _get_entry(cache_key)
+    if entry is not None:
+        return entry
+    return _single_flight.do(cache_key, lambda: _load_pinned(cache_key, loader, ttl))
+
+
+def _prefetch(cache_key, loader, ttl):
+    try:
+        if _load_pinned(cache_key, loader, ttl) is not None:
+            logger.info(f'背景預取緩存完成: {cache_key}')
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+
+
+def schedule_prefetch(cache_key, loader, ttl):
+    """排程背景預取固定內容的緩存項（例如下一頁），已緩存時不請求上游"""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return False
+        _refreshing.add(cache_key)
+    background.submit(_prefetch, cache_key, loader, ttl)
+    return True
+
+
+async def _aload_pinned(cache_key, aloader, ttl):
+    entry = await _aget_entry(cache_key)
+    if entry is not None:
+        return entry
+    data = await aloader()
+    if data is None:
+        return None
+    entry = make_entry(data, ttl)
+    if not await _in_thread(get_cache().add)(cache_key, entry, ttl):
+        entry = await _aget_entry(cache_key) or entry
+    return entry
+
+
+async def apinned_entry(cache_key, aloader, ttl):
+    """pinned_entry 的非同步版本"""
+    entry = await _aget_entry(cache_key)
+    if entry is not None:
+        return entry
+    return await _async_single_flight.do(cache_key, lambda: _aload_pinned(cache_key, aloader, ttl))
@@ -0,0 +1,101 @@
+# backend/apps/jamendo/circuit.py
+import logging
+import threading
+import time
+
+from . import background
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，請求未發送到上游"""
+
+
+class CircuitBreaker:
+    """上游斷路器（每個 worker 進程一個）
+
+    連續失敗達到 failure_threshold 次後開啟，開啟期間所有請求立即失敗，
+    不佔用 worker 等待超時。開啟 reset_timeout 秒後由背景線程執行 probe，
+    成功則關閉，失敗則重新計時；用戶請求本身不會被當作試探請求。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, name, probe, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允許發送請求；開啟且冷卻結束時排程背景探測"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            self.rejected += 1
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                background.submit(self._run_probe)
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._close()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                logger.warning(f'{self.name} 斷路器開啟：連續失敗 {self.failures} 次')
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        logger.info(f'{self.name} 斷路器關閉：上游已恢復')
+
+    def _run_probe(self):
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            logger.warning(f'{self.name} 恢復探測失敗: {str(e)}')
+            healthy = False
+        with self._lock:
+            self.probing = False
+            if healthy:
+                self._close()
+            else:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+    def snapshot(self):
+        """斷路器狀態（供健康檢查與統計顯示）"""
+        with self._lock:
+            open_for = time.monotonic() - self.opened_at if self.opened_at is not None else 0
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'open_for': round(open_for, 1),
+                'probing': self.probing,
+                'rejected': self.rejected,
+                'trips': self.trips,
+            }
@@ -0,0 +1,330 @@
+# backend/apps/jamendo/client.py
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from .circuit import CircuitBreaker, CircuitOpenError
+from .hedging import build_hedger
+from .quota import QuotaExceededError, build_quota
+from .replay import async_transport, mount_replay
+
+logger = logging.getLogger(__name__)
+
+# Jamendo API 配置
+JAMENDO_API_BASE = 'https://api.jamendo.com/v3.0'
+
+
+def get_jamendo_headers():
+    """獲取 Jamendo API 請求標頭"""
+    return {
+        'User-Agent': 'DDM360-Music-Streaming/1.0',
+        'Accept': 'application/json',
+    }
+
+
+class JamendoClient:
+    """Jamendo API 上游客戶端，使用 keep-alive 連線池重用 TCP/TLS 連線"""
+
+    def __init__(self, api_base=JAMENDO_API_BASE, client_id=None, pool_size=None,
+                 connect_timeout=None, read_timeout=None, max_retries=None):
+        self.api_base = api_base.rstrip('/')
+        self.client_id = client_id if client_id is not None else getattr(settings, 'JAMENDO_CLIENT_ID', '')
+        self.pool_size = pool_size or getattr(settings, 'JAMENDO_HTTP_POOL_SIZE', 10)
+        self.connect_timeout = connect_timeout or getattr(settings, 'JAMENDO_HTTP_CONNECT_TIMEOUT', 3.05)
+        self.read_timeout = read_timeout or getattr(settings, 'JAMENDO_HTTP_READ_TIMEOUT', 10)
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'JAMENDO_HTTP_MAX_RETRIES', 1)
+        self.session = self._build_session()
+        self.breaker = CircuitBreaker(
+            'Jamendo API',
+            probe=self._probe,
+            failure_threshold=getattr(settings, 'JAMENDO_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'JAMENDO_CIRCUIT_RESET_TIMEOUT', 30),
+        )
+        self.quota = build_quota('jamendo')
+        self.hedger = build_hedger()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _build_session(self):
+        """建立帶連線池的 Session"""
+        session = requests.Session()
+        # 只對連線階段失敗與閘道錯誤重試，讀取超時不重試以免放大延遲
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=self.max_retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(get_jamendo_headers())
+        return mount_replay(session)
+
+    @property
+    def timeout(self):
+        """(連線超時, 讀取超時)"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def build_url(self, endpoint):
+        """組合完整 API URL"""
+        return f'{self.api_base}/{endpoint.lstrip("/")}'
+
+    def build_params(self, params):
+        """添加必要的參數"""
+        return {
+            'client_id': self.client_id,
+            'format': 'json',
+            **params
+        }
+
+    def _record(self, status_code):
+        """按響應狀態更新斷路器：5xx 與 429 視為上游故障，404 等客戶端錯誤不計入"""
+        if status_code >= 500 or status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _send(self, endpoint, params, timeout=None):
+        return self.session.get(
+            self.build_url(endpoint),
+            params=self.build_params(params),
+            timeout=timeout or self.timeout
+        )
+
+    def _timed_send(self, endpoint, params, timeout=None):
+        """發送請求並記錄延遲（供對沖計算延遲百分位）"""
+        started = time.monotonic()
+        response = self._send(endpoint, params, timeout)
+        if response.status_code < 500:
+            self.hedger.record_latency(time.monotonic() - started)
+        return response
+
+    def _get_executor(self):
+        """對沖請求使用的線程池（啟用對沖時才建立）"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size * 2,
+                        thread_name_prefix='jamendo-http'
+                    )
+        return self._executor
+
+    def _hedged_send(self, endpoint, params, timeout=None):
+        """第一個請求超過延遲百分位仍未返回時發送對沖請求，返回先成功的響應"""
+        delay = self.hedger.delay()
+        if delay is None:
+            return self._timed_send(endpoint, params, timeout)
+
+        executor = self._get_executor()
+        primary = executor.submit(self._timed_send, endpoint, params, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.hedger.try_hedge():
+            return primary.result()
+        if not self.quota.try_acquire():
+            self.hedger.release()
+            return primary.result()
+
+        hedge = executor.submit(self._timed_send, endpoint, params, timeout)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                # requests 無法中斷進行中的請求，較慢的響應返回後直接關閉
+                for other in pending:
+                    other.add_done_callback(_discard_response)
+                self.hedger.record_winner(future is hedge)
+                return future.result()
+        raise error
+
+    async def _asend(self, endpoint, params, timeout=None):
+        connect_timeout, read_timeout = timeout or self.timeout
+        started = time.monotonic()
+        response = await get_async_http_client().get(
+            self.build_url(endpoint),
+            params=self.build_params(params),
+            headers=get_jamendo_headers(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        if response.status_code < 500:
+            self.hedger.record_latency(time.monotonic() - started)
+        return response
+
+    async def _ahedged_send(self, endpoint, params, timeout=None):
+        """_hedged_send 的非同步版本，較慢的請求會被取消"""
+        delay = self.hedger.delay()
+        if delay is None:
+            return await self._asend(endpoint, params, timeout)
+
+        primary = asyncio.ensure_future(self._asend(endpoint, params, timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self.hedger.try_hedge():
+                return await primary
+            if not await self.quota.atry_acquire():
+                self.hedger.release()
+                return await primary
+
+            hedge = asyncio.ensure_future(self._asend(endpoint, params, timeout))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    self.hedger.record_winner(task is hedge)
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _probe(self):
+        """斷路器恢復探測：最小的列表請求
+
+        探測同樣計入上游配額（背景任務，feed 優先級），額度不足時本次不探測，
+        斷路器保持開啟並在 reset_timeout 後再試。
+        """
+        if not self.quota.try_acquire():
+            logger.info('Jamendo API 上游配額不足，延後斷路器恢復探測')
+            return False
+        return self._send('tracks', {'limit': 1}).status_code < 500
+
+    def get(self, endpoint, params, timeout=None):
+        """發送 GET 請求，返回 requests.Response
+
+        斷路器開啟時拋出 CircuitOpenError，當前優先級配額不足時拋出
+        QuotaExceededError，兩者都不發送請求。
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'Jamendo API 斷路器開啟，跳過請求: {endpoint}')
+        self.quota.acquire()
+        self.hedger.start_request()
+        try:
+            if self.hedger.enabled:
+                response = self._hedged_send(endpoint, params, timeout)
+            else:
+                response = self._timed_send(endpoint, params, timeout)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        self._record(response.status_code)
+        return response
+
+    async def aget(self, endpoint, params, timeout=None):
+        """發送非同步 GET 請求（共用 httpx 連線池），返回 httpx.Response"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'Jamendo API 斷路器開啟，跳過請求: {endpoint}')
+        await self.quota.aacquire()
+        self.hedger.start_request()
+        try:
+            if self.hedger.enabled:
+                response = await self._ahedged_send(endpoint, params, timeout)
+            else:
+                response = await self._asend(endpoint, params, timeout)
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        self._record(response.status_code)
+        return response
+
+    def describe(self):
+        """連線池設定（供健康檢查顯示）"""
+        return {
+            'pool_size': self.pool_size,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'max_retries': self.max_retries,
+            'circuit': self.breaker.snapshot(),
+            'quota': self.quota.snapshot(),
+            'hedging': self.hedger.snapshot(),
+        }
+
+    def close(self):
+        """關閉連線池"""
+        self.session.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def _discard_response(future):
+    """關閉被放棄的對沖響應，歸還連線"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """獲取當前 worker 進程共用的 Jamendo 客戶端
+
+    gunicorn 會在 fork 後使用 worker，連線池不能跨進程共用，
+    因此以 pid 判斷是否需要重新建立。
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = JamendoClient()
+                _client_pid = pid
+                logger.info(f'建立 Jamendo 連線池: {_client.describe()}')
+    return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client():
+    """獲取當前事件循環共用的 httpx.AsyncClient
+
+    ASGI worker 中每個進程只有一個事件循環，所有上游請求（Jamendo、Spotify）
+    共用同一個連線池；連線不能跨事件循環使用，因此按事件循環分開保存。
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=getattr(settings, 'UPSTREAM_ASYNC_MAX_CONNECTIONS', 200),
+            max_keepalive_connections=getattr(settings, 'UPSTREAM_ASYNC_MAX_KEEPALIVE', 50),
+        )
+        client = httpx.AsyncClient(
+            limits=limits,
+            # 錄製 / 重放模式（UPSTREAM_REPLAY_MODE）下替換 transport
+            transport=async_transport(limits),
+            timeout=httpx.Timeout(
+                getattr(settings, 'JAMENDO_HTTP_READ_TIMEOUT', 10),
+                connect=getattr(settings, 'JAMENDO_HTTP_CONNECT_TIMEOUT', 3.05),
+            ),
+        )
+        _async_clients[loop] = client
+    return client
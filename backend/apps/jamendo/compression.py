@@ -0,0 +1,68 @@
+# backend/apps/jamendo/compression.py
+"""
+緩存響應的預壓縮
+
+寫入緩存時壓縮一次，緩存項中同時保存 gzip 與 brotli 版本，
+命中時按 Accept-Encoding 直接返回，不在每次請求時壓縮。
+未安裝 brotli 套件時只提供 gzip。
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # brotli 為可選依賴
+    brotli = None
+
+# 同等權重時優先使用壓縮率較高的編碼
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+
+def compress_variants(body):
+    """返回 {編碼: 壓縮後內容}，內容太小或壓縮無收益時不保存該版本"""
+    if not getattr(settings, 'JAMENDO_RESPONSE_COMPRESSION', True):
+        return {}
+    if len(body) < getattr(settings, 'JAMENDO_COMPRESS_MIN_SIZE', 1024):
+        return {}
+
+    variants = {'gzip': gzip.compress(body, getattr(settings, 'JAMENDO_GZIP_LEVEL', 6))}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=getattr(settings, 'JAMENDO_BROTLI_QUALITY', 5))
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def parse_accept_encoding(header):
+    """解析 Accept-Encoding，返回 {編碼: q 值}"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header, variants):
+    """按 Accept-Encoding 選擇已保存的壓縮版本，沒有合適的版本時返回 None（identity）"""
+    if not variants:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in variants:
+            continue
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
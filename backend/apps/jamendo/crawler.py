@@ -0,0 +1,270 @@
+# backend/apps/jamendo/crawler.py
+"""
+Jamendo 目錄批次抓取（寫入 jamendo_tracks）
+
+按曲風標籤與發行日期窗口把目錄分成多個分區，每個分區以 order=id 逐頁請求
+（新發行的音軌排在最後，不會打亂已抓取的頁），多個分區以有限的線程並發抓取。
+抓到的頁交給主線程累積成批次 upsert，每批寫入後把各分區的 offset 寫入
+檢查點檔案，中斷後重新執行會從檢查點繼續。
+
+所有請求以 CRAWL 優先級經過共用的上游配額，額度不足時等待下一個窗口。
+
+- 管理命令：python manage.py crawl_jamendo_catalog
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import quota
+from .client import CircuitOpenError, QuotaExceededError, get_client
+from .ingestion import upsert_tracks
+from .views import FEED_FILTERS, normalize_tracks
+
+logger = logging.getLogger(__name__)
+
+CRAWL_INCLUDE = 'musicinfo+stats'
+
+# Jamendo 單次請求最多返回 200 首
+MAX_PAGE_SIZE = 200
+
+# 上游失敗（斷路器開啟、網絡錯誤、5xx）時的重試
+RETRY_DELAY = 30
+MAX_RETRIES = 5
+
+# 配額用完時等待的秒數（CRAWL 優先級在 acquire 中已等待過一次）
+QUOTA_DELAY = 5
+
+
+def date_windows(since, until, window_days):
+    """把 [since, until] 切分為每段 window_days 天的日期窗口"""
+    windows = []
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=window_days - 1), until)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+
+def crawl_partitions(tags=None, since=None, until=None, window_days=365):
+    """需要抓取的分區，返回 [(分區鍵, 請求參數)]
+
+    未指定標籤時抓取全部曲風；未指定 since 時不按日期切分。
+    """
+    windows = [None]
+    if since is not None:
+        windows = date_windows(since, until or date.today(), window_days)
+
+    partitions = []
+    for tag in tags or [None]:
+        for window in windows:
+            params = FEED_FILTERS['tag'](tag) if tag else {}
+            key = tag or '*'
+            if window is not None:
+                params['datebetween'] = f'{window[0].isoformat()}_{window[1].isoformat()}'
+                key += f'|{params["datebetween"]}'
+            partitions.append((key, params))
+    return partitions
+
+
+def page_params(params, offset, limit):
+    return {
+        **params,
+        'order': 'id',
+        'include': CRAWL_INCLUDE,
+        'audioformat': 'mp32',
+        'offset': offset,
+        'limit': limit,
+    }
+
+
+class CrawlCheckpoint:
+    """各分區的抓取進度（JSON 檔案，寫入時先寫臨時檔再替換）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.partitions = {}
+        if self.path.exists():
+            self.partitions = json.loads(self.path.read_text(encoding='utf-8')).get('partitions', {})
+
+    def offset(self, key):
+        return self.partitions.get(key, {}).get('offset', 0)
+
+    def is_done(self, key):
+        return self.partitions.get(key, {}).get('done', False)
+
+    def advance(self, key, offset, tracks, done):
+        state = self.partitions.setdefault(key, {'offset': 0, 'tracks': 0, 'done': False})
+        state['offset'] = max(state['offset'], offset)
+        state['tracks'] += tracks
+        state['done'] = state['done'] or done
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f'{self.path.name}.tmp')
+        temporary.write_text(json.dumps({
+            'updated_at': timezone.now().isoformat(),
+            'partitions': self.partitions,
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(temporary, self.path)
+
+    def reset(self):
+        self.partitions = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
+def fetch_page(params, stop):
+    """以 CRAWL 優先級請求一頁，返回音軌列表；重試用完或收到停止信號時返回 None"""
+    failures = 0
+    while not stop.is_set():
+        try:
+            with quota.priority(quota.CRAWL):
+                response = get_client().get('tracks', params)
+        except QuotaExceededError:
+            # 配額不足是預期的節流，不計入重試次數
+            stop.wait(QUOTA_DELAY)
+            continue
+        except CircuitOpenError:
+            logger.warning('Jamendo API 斷路器開啟，暫停目錄抓取')
+        except requests.exceptions.RequestException as e:
+            logger.error(f'目錄抓取請求異常: {str(e)}')
+        else:
+            if response.status_code == 200:
+                return normalize_tracks(response.json()).get('results', [])
+            logger.error(f'目錄抓取請求錯誤: {response.status_code}')
+
+        failures += 1
+        if failures >= MAX_RETRIES:
+            return None
+        stop.wait(RETRY_DELAY)
+    return None
+
+
+class CatalogCrawl:
+    """有限並發的分區抓取，主線程批次寫入並更新檢查點"""
+
+    def __init__(self, partitions, checkpoint, concurrency=None, page_size=MAX_PAGE_SIZE,
+                 batch_size=None, max_tracks=None, progress=None):
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency or getattr(settings, 'JAMENDO_CRAWL_CONCURRENCY', 2))
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.batch_size = batch_size or getattr(settings, 'JAMENDO_CRAWL_BATCH_SIZE', 1000)
+        self.max_tracks = max_tracks
+        self.progress = progress
+        self.stop = threading.Event()
+        self.pending = queue.Queue()
+        for key, params in partitions:
+            if not checkpoint.is_done(key):
+                self.pending.put((key, params))
+        # 有界隊列：寫入跟不上時抓取線程等待
+        self.pages = queue.Queue(maxsize=self.concurrency * 2)
+        self.summary = {
+            'partitions': self.pending.qsize(), 'completed': 0, 'failed': 0,
+            'fetched': 0, 'written': 0, 'elapsed': 0.0, 'rate': 0.0,
+        }
+        self._started = None
+
+    def _put(self, item):
+        while not self.stop.is_set():
+            try:
+                self.pages.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _crawl_partition(self, key, params):
+        offset = self.checkpoint.offset(key)
+        while not self.stop.is_set():
+            results = fetch_page(page_params(params, offset, self.page_size), self.stop)
+            if results is None:
+                return not self.stop.is_set()
+            offset += len(results)
+            done = len(results) < self.page_size
+            if not self._put(('page', key, offset, results, done)) or done:
+                return False
+        return False
+
+    def _worker(self):
+        while not self.stop.is_set():
+            try:
+                key, params = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            failed = False
+            try:
+                failed = self._crawl_partition(key, params)
+            except Exception as e:
+                logger.error(f'目錄分區 {key} 抓取異常: {str(e)}')
+                failed = True
+            finally:
+                self._put(('end', key, failed))
+        self._put(('exit',))
+
+    def _flush(self, buffered):
+        if not buffered:
+            return
+        tracks = [track for _, _, _, results, _ in buffered for track in results]
+        with transaction.atomic():
+            written = upsert_tracks(tracks)
+        # 寫入成功後才推進檢查點，中斷時最多重新抓取未寫入的頁
+        for _, key, offset, results, done in buffered:
+            self.checkpoint.advance(key, offset, len(results), done)
+        self.checkpoint.save()
+
+        self.summary['written'] += written
+        self.summary['elapsed'] = time.monotonic() - self._started
+        self.summary['rate'] = self.summary['fetched'] / max(self.summary['elapsed'], 1e-6)
+        logger.info(
+            f'目錄抓取：已抓取 {self.summary["fetched"]} 首，寫入 {self.summary["written"]}，'
+            f'{self.summary["rate"]:.1f} 首/秒'
+        )
+        if self.progress:
+            self.progress(self.summary)
+        buffered.clear()
+
+    def run(self):
+        """執行抓取直到所有分區完成、達到 max_tracks 或被中斷，返回統計"""
+        self._started = time.monotonic()
+        workers = min(self.concurrency, self.summary['partitions'])
+        for index in range(workers):
+            threading.Thread(target=self._worker, name=f'jamendo-crawl-{index}', daemon=True).start()
+
+        buffered = []
+        buffered_tracks = 0
+        running = workers
+        try:
+            while running:
+                item = self.pages.get()
+                if item[0] == 'exit':
+                    running -= 1
+                elif item[0] == 'end':
+                    self.summary['failed' if item[2] else 'completed'] += 1
+                else:
+                    buffered.append(item)
+                    buffered_tracks += len(item[3])
+                    self.summary['fetched'] += len(item[3])
+                    if buffered_tracks >= self.batch_size:
+                        self._flush(buffered)
+                        buffered_tracks = 0
+                    if self.max_tracks and self.summary['fetched'] >= self.max_tracks:
+                        break
+        finally:
+            # 中斷（KeyboardInterrupt）時也寫入已收到的頁並保存檢查點
+            self.stop.set()
+            self._flush(buffered)
+
+        self.summary['elapsed'] = time.monotonic() - self._started
+        self.summary['rate'] = self.summary['fetched'] / max(self.summary['elapsed'], 1e-6)
+        return self.summary
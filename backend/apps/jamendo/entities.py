@@ -0,0 +1,92 @@
+# backend/apps/jamendo/entities.py
+"""
+單首音軌的實體緩存
+
+每次向上游請求音軌（列表、分頁、隨機池補充、詳情）時，結果中的每首音軌
+以 id 為鍵在背景寫入緩存；多 ID 詳情端點以一次 get_many 讀取，只向上游請求缺少的音軌。
+
+實體鍵只讀寫共享層（TieredCache 的 set_many_shared / get_many_shared）：
+一個列表響應最多 200 首，寫入 L1 會把列表緩存項擠出 L1，每個鍵的失效通知也會
+增加大量 PUBLISH。實體鍵不進入 L1，因此也不需要失效通知。
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import background
+from .caching import get_cache, get_ttls
+
+ENTITY_PREFIX = 'jamendo_track'
+
+# 上游確認不存在的音軌在失敗緩存期間內不再請求
+MISSING = False
+
+
+def track_key(track_id):
+    return f'{ENTITY_PREFIX}:{track_id}'
+
+
+def _entity_ttl():
+    return get_ttls('detail')[1]
+
+
+def _missing_ttl():
+    return getattr(settings, 'JAMENDO_NEGATIVE_CACHE_TTL', 30)
+
+
+def _set_many(entries, ttl):
+    cache = get_cache()
+    set_many = getattr(cache, 'set_many_shared', cache.set_many)
+    set_many(entries, ttl)
+
+
+def _get_many(keys):
+    cache = get_cache()
+    get_many = getattr(cache, 'get_many_shared', cache.get_many)
+    return get_many(keys)
+
+
+def _track_entries(data):
+    return {
+        track_key(track['id']): track
+        for track in (data or {}).get('results', [])
+        if isinstance(track, dict) and track.get('id')
+    }
+
+
+def cache_tracks(data):
+    """把上游響應中的音軌逐一寫入實體緩存"""
+    entries = _track_entries(data)
+    if entries:
+        _set_many(entries, _entity_ttl())
+
+
+def schedule_cache_tracks(data):
+    """在背景寫入實體緩存，不增加請求延遲"""
+    if _track_entries(data):
+        background.submit(cache_tracks, data)
+
+
+def cache_missing(track_ids):
+    """記錄上游沒有返回的音軌 id"""
+    if track_ids and _missing_ttl() > 0:
+        _set_many({track_key(track_id): MISSING for track_id in track_ids}, _missing_ttl())
+
+
+async def acache_missing(track_ids):
+    """cache_missing 的非同步版本"""
+    await sync_to_async(cache_missing, thread_sensitive=False)(track_ids)
+
+
+def get_cached_tracks(track_ids):
+    """一次 get_many 讀取多首音軌，返回 {id: 音軌或 MISSING}，未緩存的 id 不在結果中"""
+    found = _get_many([track_key(track_id) for track_id in track_ids])
+    return {
+        track_id: found[track_key(track_id)]
+        for track_id in track_ids
+        if track_key(track_id) in found
+    }
+
+
+async def aget_cached_tracks(track_ids):
+    """get_cached_tracks 的非同步版本"""
+    return await sync_to_async(get_cached_tracks, thread_sensitive=False)(track_ids)
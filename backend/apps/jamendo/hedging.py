@@ -0,0 +1,95 @@
+# backend/apps/jamendo/hedging.py
+"""
+上游請求對沖（hedged requests）
+
+第一個請求超過近期延遲的指定百分位仍未返回時，再發送一個相同的請求，
+採用先返回的結果並放棄另一個。對沖請求數量受預算限制，
+不超過上游請求總數的 JAMENDO_HEDGE_BUDGET 比例。
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+
+
+class Hedger:
+    """延遲統計、對沖預算與計數（每個客戶端一個）"""
+
+    def __init__(self, enabled=False, percentile=0.95, budget=0.05, min_delay=0.05,
+                 min_samples=20, window=500):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_won = 0
+        self.primary_won = 0
+        self.budget_denied = 0
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def delay(self):
+        """發送對沖請求前等待的秒數；樣本不足時返回 None（不對沖）"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return max(self.min_delay, ordered[index])
+
+    def try_hedge(self):
+        """在預算內時佔用一次對沖名額"""
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                self.budget_denied += 1
+                return False
+            self.hedged += 1
+            return True
+
+    def release(self):
+        """歸還未實際發送的對沖名額"""
+        with self._lock:
+            self.hedged -= 1
+
+    def record_winner(self, hedge_won):
+        with self._lock:
+            if hedge_won:
+                self.hedge_won += 1
+            else:
+                self.primary_won += 1
+
+    def snapshot(self):
+        delay = self.delay() if self.enabled else None
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'percentile': self.percentile,
+                'budget': self.budget,
+                'delay': round(delay, 3) if delay is not None else None,
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_won': self.hedge_won,
+                'primary_won': self.primary_won,
+                'budget_denied': self.budget_denied,
+            }
+
+
+def build_hedger():
+    """按 settings 建立對沖配置"""
+    return Hedger(
+        enabled=getattr(settings, 'JAMENDO_HEDGE_ENABLED', False),
+        percentile=getattr(settings, 'JAMENDO_HEDGE_PERCENTILE', 0.95),
+        budget=getattr(settings, 'JAMENDO_HEDGE_BUDGET', 0.05),
+        min_delay=getattr(settings, 'JAMENDO_HEDGE_MIN_DELAY', 0.05),
+        min_samples=getattr(settings, 'JAMENDO_HEDGE_MIN_SAMPLES', 20),
+    )
@@ -0,0 +1,188 @@
+# backend/apps/jamendo/ingestion.py
+import logging
+import threading
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import background
+from .models import JamendoTag, JamendoTrack, JamendoTrackTag
+
+logger = logging.getLogger(__name__)
+
+# 每次 upsert 都會更新的欄位
+BASE_UPDATE_FIELDS = [
+    'name', 'artist_name', 'artist_id', 'album_name', 'album_id',
+    'duration', 'position', 'releasedate', 'audio', 'audiodownload',
+    'image', 'album_image', 'cached_at',
+]
+# 只有上游數據包含對應部分時才更新，避免列表響應（不含 stats）覆蓋詳情數據
+TAG_FIELDS = ['musicinfo_tags_genres', 'musicinfo_tags_instruments', 'musicinfo_tags_vartags']
+STATS_FIELDS = ['stats_rate', 'stats_downloads_total', 'stats_playlisted']
+
+_TRUNCATE_FIELDS = ['name', 'artist_name', 'album_name']
+_URL_FIELDS = ['audio', 'audiodownload', 'image', 'album_image']
+
+# IN 查詢每批的參數數量（SQLite 的參數上限）
+_QUERY_CHUNK_SIZE = 500
+
+# 可重入：寫入區塊中呼叫 upsert_tracks 不會死鎖
+_write_lock = threading.RLock()
+
+
+def track_writes():
+    """jamendo_tracks 的寫入區塊
+
+    列表 ingest、隨機池補充、爬蟲與背景刷新在不同線程同時寫入音軌；SQLite 同時只有
+    一個寫入者，並發的寫入會得到 "database table is locked"（共享緩存的內存資料庫）
+    或在 timeout 後得到 "database is locked"。SQLite 時同一進程內的寫入依次執行，
+    跨進程的等待由 DATABASES 的 timeout 處理；其他資料庫不加鎖。
+    """
+    return _write_lock if connection.vendor == 'sqlite' else nullcontext()
+
+
+def build_track(data):
+    """把上游數據轉換為 JamendoTrack，數據不完整或無法保存時返回 None"""
+    try:
+        track = JamendoTrack.create_from_jamendo_data(data)
+        track.jamendo_id = int(track.jamendo_id)
+    except (ValueError, TypeError):
+        return None
+
+    for field_name in _TRUNCATE_FIELDS:
+        max_length = JamendoTrack._meta.get_field(field_name).max_length
+        value = getattr(track, field_name) or ''
+        setattr(track, field_name, value[:max_length])
+
+    # URL 不能截斷，超長的音軌直接跳過，避免整批寫入失敗
+    for field_name in _URL_FIELDS:
+        max_length = JamendoTrack._meta.get_field(field_name).max_length
+        if len(getattr(track, field_name) or '') > max_length:
+            return None
+    return track
+
+
+def _chunks(items, size=_QUERY_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _tag_ids(pairs):
+    """返回 {(類型, 名稱): 標籤 id}，不存在的標籤先建立"""
+    def existing():
+        ids = {}
+        for names in _chunks({name for _, name in pairs}):
+            for tag_id, kind, name in JamendoTag.objects.filter(name__in=names).values_list('id', 'kind', 'name'):
+                if (kind, name) in pairs:
+                    ids[(kind, name)] = tag_id
+        return ids
+
+    ids = existing()
+    missing = pairs - ids.keys()
+    if missing:
+        # 並發寫入時其他進程可能已建立同一標籤
+        JamendoTag.objects.bulk_create(
+            [JamendoTag(kind=kind, name=name) for kind, name in missing],
+            ignore_conflicts=True,
+        )
+        ids = existing()
+    return ids
+
+
+def sync_track_tags(tags_by_track):
+    """把音軌的標籤同步到 jamendo_track_tags，只增刪有變化的關聯
+
+    tags_by_track 為 {音軌 pk: [(類型, 名稱)]}，列表為空時清除該音軌的關聯。
+    """
+    if not tags_by_track:
+        return
+    pairs = {pair for track_pairs in tags_by_track.values() for pair in track_pairs}
+    tag_ids = _tag_ids(pairs) if pairs else {}
+    wanted = {
+        (track_id, tag_ids[pair])
+        for track_id, track_pairs in tags_by_track.items()
+        for pair in track_pairs if pair in tag_ids
+    }
+
+    with transaction.atomic():
+        existing = {}
+        for track_ids in _chunks(tags_by_track):
+            links = JamendoTrackTag.objects.filter(track_id__in=track_ids).values_list('id', 'track_id', 'tag_id')
+            for link_id, track_id, tag_id in links:
+                existing[(track_id, tag_id)] = link_id
+        stale = [link_id for link, link_id in existing.items() if link not in wanted]
+        for link_ids in _chunks(stale):
+            JamendoTrackTag.objects.filter(id__in=link_ids).delete()
+        JamendoTrackTag.objects.bulk_create(
+            [JamendoTrackTag(track_id=track_id, tag_id=tag_id) for track_id, tag_id in wanted - existing.keys()],
+            ignore_conflicts=True,
+            batch_size=_QUERY_CHUNK_SIZE,
+        )
+
+
+def _sync_upserted_tags(tracks):
+    """upsert 後同步標籤（{jamendo_id: JamendoTrack}，以 jamendo_id 查出 pk）"""
+    pks = {}
+    for jamendo_ids in _chunks(tracks):
+        pks.update(JamendoTrack.objects.filter(jamendo_id__in=jamendo_ids).values_list('jamendo_id', 'id'))
+    sync_track_tags({
+        pks[jamendo_id]: track.tag_pairs()
+        for jamendo_id, track in tracks.items() if jamendo_id in pks
+    })
+
+
+def upsert_tracks(tracks_data):
+    """以 jamendo_id 為鍵批次 upsert 音軌，每種數據形狀一條 SQL，返回寫入數量"""
+    groups = defaultdict(dict)
+    for data in tracks_data:
+        track = build_track(data)
+        if track is None:
+            continue
+        shape = ('musicinfo' in data, 'stats' in data)
+        # 同一條語句中同一鍵不能出現兩次
+        groups[shape][track.jamendo_id] = track
+
+    written = 0
+    now = timezone.now()
+    with track_writes():
+        for (has_musicinfo, has_stats), tracks in groups.items():
+            update_fields = list(BASE_UPDATE_FIELDS)
+            if has_musicinfo:
+                update_fields += TAG_FIELDS
+            if has_stats:
+                update_fields += STATS_FIELDS
+            # 包含統計與標籤的完整數據等同一次刷新，列表響應不推遲背景刷新
+            if has_musicinfo and has_stats:
+                update_fields.append('refreshed_at')
+                for track in tracks.values():
+                    track.refreshed_at = now
+            JamendoTrack.objects.bulk_create(
+                list(tracks.values()),
+                update_conflicts=True,
+                unique_fields=['jamendo_id'],
+                update_fields=update_fields,
+            )
+            # 只有包含 musicinfo 的數據才同步標籤，列表響應不會清除已有的關聯
+            if has_musicinfo:
+                _sync_upserted_tags(tracks)
+            written += len(tracks)
+    return written
+
+
+def _ingest(tracks_data):
+    written = upsert_tracks(tracks_data)
+    logger.debug(f'寫入 {written} 首 Jamendo 音軌')
+    return written
+
+
+def schedule_ingest(data):
+    """把上游響應中的音軌在背景寫入 jamendo_tracks，不增加請求延遲"""
+    if not getattr(settings, 'JAMENDO_INGEST_ENABLED', True):
+        return
+    results = data.get('results') if isinstance(data, dict) else None
+    if results:
+        background.submit(_ingest, results)
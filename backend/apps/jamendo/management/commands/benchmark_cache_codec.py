@@ -0,0 +1,108 @@
+import json
+import pickle
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.jamendo.cache_codecs import CODECS, get_codec
+from apps.jamendo.caching import make_entry
+from apps.jamendo.client import get_client
+from apps.jamendo.projection import CARD_FIELDS, project_tracks
+from apps.jamendo.views import feed_params, normalize_tracks
+
+# 未指定 --file 時從上游擷取的列表（與首頁、緩存預熱使用的列表相同）
+LIVE_FEEDS = [
+    ('popular', None),
+    ('latest', None),
+    ('tag', 'rock'),
+]
+
+
+def capture_live(limit):
+    """從 Jamendo 擷取實際的列表響應"""
+    client = get_client()
+    payloads = {}
+    for feed, value in LIVE_FEEDS:
+        response = client.get('tracks', feed_params(feed, limit, value))
+        if response.status_code != 200:
+            raise CommandError(f'Jamendo API 錯誤: {response.status_code}')
+        payloads[f'{feed}{"_" + value if value else ""}'] = normalize_tracks(response.json())
+    return payloads
+
+
+def cached_values(data):
+    """緩存中實際保存的值：列表緩存項（卡片欄位 / 完整數據）與單首音軌的實體緩存"""
+    return {
+        'entry_card': make_entry(project_tracks(data, CARD_FIELDS), 3600),
+        'entry_full': make_entry(data, 3600),
+        'tracks': data.get('results', []),
+    }
+
+
+def to_shared(codec, value):
+    """共享層實際保存的位元組（Django 的緩存後端會再 pickle 一次寫入的值）"""
+    return pickle.dumps(codec.encode(value), pickle.HIGHEST_PROTOCOL)
+
+
+def from_shared(codec, stored):
+    return codec.decode(pickle.loads(stored))
+
+
+def measure(codec, values, iterations):
+    """values 為同一類緩存值的列表，返回 (總大小, 每次寫入毫秒, 每次讀取毫秒)"""
+    stored = [to_shared(codec, value) for value in values]
+    size = sum(len(item) for item in stored)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for value in values:
+            to_shared(codec, value)
+    encode_ms = (time.perf_counter() - started) * 1000 / iterations
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for item in stored:
+            from_shared(codec, item)
+    decode_ms = (time.perf_counter() - started) * 1000 / iterations
+    return size, encode_ms, decode_ms
+
+
+class Command(BaseCommand):
+    help = '比較共享緩存層的值編碼（pickle / binary）的大小與寫入、讀取耗時'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', action='append', default=[],
+                            help='已擷取的 Jamendo 響應 JSON 檔案（可多次指定），未指定時從上游擷取')
+        parser.add_argument('--save', help='把從上游擷取的響應保存到此目錄，之後可以 --file 重跑')
+        parser.add_argument('--limit', type=int, default=200, help='從上游擷取時每個列表的音軌數')
+        parser.add_argument('--iterations', type=int, default=50, help='每項測量的重複次數')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            payloads = {Path(path).stem: json.loads(Path(path).read_text(encoding='utf-8')) for path in options['file']}
+        else:
+            payloads = capture_live(options['limit'])
+            if options['save']:
+                directory = Path(options['save'])
+                directory.mkdir(parents=True, exist_ok=True)
+                for name, data in payloads.items():
+                    (directory / f'{name}.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+        # binary 編碼使用 settings 中 Jamendo 緩存的壓縮設定
+        alias = getattr(settings, 'JAMENDO_CACHE_ALIAS', 'default')
+        codec_options = settings.CACHES.get(alias, {}).get('OPTIONS', {})
+        codecs = {name: get_codec(name, codec_options) for name in CODECS}
+        self.stdout.write(f'{"payload":<24}{"value":<12}{"codec":<8}{"bytes":>12}{"write ms":>12}{"read ms":>12}')
+        for name, data in payloads.items():
+            for kind, value in cached_values(data).items():
+                values = value if kind == 'tracks' else [value]
+                baseline = None
+                for codec_name, codec in codecs.items():
+                    size, encode_ms, decode_ms = measure(codec, values, options['iterations'])
+                    baseline = baseline or size
+                    self.stdout.write(
+                        f'{name:<24}{kind:<12}{codec_name:<8}{size:>12,}{encode_ms:>12.3f}{decode_ms:>12.3f}'
+                        f'  ({size / baseline:.0%})'
+                    )
@@ -0,0 +1,77 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.jamendo.crawler import MAX_PAGE_SIZE, CatalogCrawl, CrawlCheckpoint, crawl_partitions
+from apps.jamendo.views import JAMENDO_CLIENT_ID, JAMENDO_FEATURED_GENRES
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'日期格式錯誤（應為 YYYY-MM-DD）: {value}')
+
+
+class Command(BaseCommand):
+    help = '按曲風標籤與發行日期分頁抓取 Jamendo 目錄寫入本地音軌庫，可從檢查點繼續'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', action='append', default=[], help='抓取的曲風標籤（可多次指定）')
+        parser.add_argument('--featured', action='store_true', help='抓取首頁的全部特色曲風')
+        parser.add_argument('--since', help='按發行日期切分的起始日期（YYYY-MM-DD）')
+        parser.add_argument('--until', help='按發行日期切分的結束日期（默認今天）')
+        parser.add_argument('--window-days', type=int, default=365, help='每個日期分區的天數')
+        parser.add_argument('--concurrency', type=int, default=None, help='同時抓取的分區數')
+        parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE, help='每頁音軌數（最多 200）')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批寫入的音軌數')
+        parser.add_argument('--max-tracks', type=int, default=None, help='抓取此數量後停止（之後可繼續）')
+        parser.add_argument('--checkpoint', default=None, help='檢查點檔案路徑')
+        parser.add_argument('--reset', action='store_true', help='忽略已有的檢查點，從頭抓取')
+
+    def handle(self, *args, **options):
+        if not JAMENDO_CLIENT_ID:
+            raise CommandError('JAMENDO_CLIENT_ID 未設置')
+        if options['window_days'] < 1:
+            raise CommandError('--window-days 必須大於 0')
+
+        tags = list(options['tag'])
+        if options['featured']:
+            tags += [genre for genre in JAMENDO_FEATURED_GENRES if genre not in tags]
+        since = parse_date(options['since']) if options['since'] else None
+        until = parse_date(options['until']) if options['until'] else None
+        if until and not since:
+            raise CommandError('指定 --until 時需要同時指定 --since')
+        partitions = crawl_partitions(tags, since, until, options['window_days'])
+
+        checkpoint = CrawlCheckpoint(options['checkpoint'] or settings.JAMENDO_CRAWL_CHECKPOINT)
+        if options['reset']:
+            checkpoint.reset()
+
+        crawl = CatalogCrawl(
+            partitions, checkpoint,
+            concurrency=options['concurrency'],
+            page_size=options['page_size'],
+            batch_size=options['batch_size'],
+            max_tracks=options['max_tracks'],
+            progress=lambda summary: self.stdout.write(
+                f'已抓取 {summary["fetched"]} 首，寫入 {summary["written"]}，{summary["rate"]:.1f} 首/秒'
+            ),
+        )
+        self.stdout.write(f'待抓取分區 {crawl.summary["partitions"]} / {len(partitions)}，檢查點 {checkpoint.path}')
+
+        try:
+            summary = crawl.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f'已中斷，進度已保存到 {checkpoint.path}'))
+            return
+
+        message = (
+            f'完成分區 {summary["completed"]}，失敗 {summary["failed"]}，抓取 {summary["fetched"]} 首，'
+            f'寫入 {summary["written"]}，耗時 {summary["elapsed"]:.1f} 秒（{summary["rate"]:.1f} 首/秒）'
+        )
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
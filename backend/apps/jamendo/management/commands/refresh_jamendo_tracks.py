@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.jamendo.refresher import batch_interval, refresh_batch
+
+
+class Command(BaseCommand):
+    help = '按 refreshed_at 刷新本地音軌庫中最舊的音軌（統計數據、標籤等）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=1, help='執行的批次數')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批音軌數（最多 200）')
+        parser.add_argument('--min-age', type=int, default=None, help='只刷新超過此秒數未更新的音軌')
+        parser.add_argument('--no-wait', action='store_true',
+                            help='批次之間不按 JAMENDO_REFRESH_TRACKS_PER_HOUR 等待')
+
+    def handle(self, *args, **options):
+        updated = 0
+        for index in range(options['batches']):
+            if index and not options['no_wait']:
+                time.sleep(batch_interval(options['batch_size']))
+
+            summary = refresh_batch(options['batch_size'], options['min_age'])
+            if summary is None:
+                self.stdout.write(self.style.WARNING('上游請求失敗，停止刷新'))
+                break
+            updated += summary['updated']
+            self.stdout.write(
+                f'選取 {summary["selected"]}，更新 {summary["updated"]}，未變化 {summary["unchanged"]}，'
+                f'上游不存在 {summary["missing"]}，變化欄位 {", ".join(summary["fields"]) or "-"}'
+            )
+            if not summary['selected']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'共更新 {updated} 首音軌'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.jamendo.warming import warm_all, warm_targets
+
+
+class Command(BaseCommand):
+    help = '預熱 Jamendo 熱門、最新與特色曲風列表緩存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='忽略仍新鮮的緩存，全部重新請求')
+        parser.add_argument('--concurrency', type=int, default=None, help='同時請求上游的最大數量')
+        parser.add_argument('--list', action='store_true', help='只列出需要預熱的列表')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for feed, value, limit in warm_targets():
+                self.stdout.write(f'{feed} {value or "-"} limit={limit}')
+            return
+
+        summary = warm_all(force=options['force'], concurrency=options['concurrency'])
+        message = (
+            f'刷新 {summary["refreshed"]}，新鮮 {summary["fresh"]}，'
+            f'其他進程刷新中 {summary["busy"]}，失敗 {summary["failed"]}'
+        )
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,102 @@
+# 本地全文搜尋索引：SQLite 使用 FTS5，PostgreSQL 使用 GIN 表達式索引
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS jamendo_tracks_fts USING fts5(
+        name, artist_name, album_name,
+        musicinfo_tags_genres, musicinfo_tags_instruments, musicinfo_tags_vartags,
+        content='jamendo_tracks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jamendo_tracks_fts_ai AFTER INSERT ON jamendo_tracks BEGIN
+        INSERT INTO jamendo_tracks_fts(
+            rowid, name, artist_name, album_name,
+            musicinfo_tags_genres, musicinfo_tags_instruments, musicinfo_tags_vartags
+        ) VALUES (
+            new.id, new.name, new.artist_name, new.album_name,
+            new.musicinfo_tags_genres, new.musicinfo_tags_instruments, new.musicinfo_tags_vartags
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jamendo_tracks_fts_ad AFTER DELETE ON jamendo_tracks BEGIN
+        INSERT INTO jamendo_tracks_fts(
+            jamendo_tracks_fts, rowid, name, artist_name, album_name,
+            musicinfo_tags_genres, musicinfo_tags_instruments, musicinfo_tags_vartags
+        ) VALUES (
+            'delete', old.id, old.name, old.artist_name, old.album_name,
+            old.musicinfo_tags_genres, old.musicinfo_tags_instruments, old.musicinfo_tags_vartags
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jamendo_tracks_fts_au AFTER UPDATE ON jamendo_tracks BEGIN
+        INSERT INTO jamendo_tracks_fts(
+            jamendo_tracks_fts, rowid, name, artist_name, album_name,
+            musicinfo_tags_genres, musicinfo_tags_instruments, musicinfo_tags_vartags
+        ) VALUES (
+            'delete', old.id, old.name, old.artist_name, old.album_name,
+            old.musicinfo_tags_genres, old.musicinfo_tags_instruments, old.musicinfo_tags_vartags
+        );
+        INSERT INTO jamendo_tracks_fts(
+            rowid, name, artist_name, album_name,
+            musicinfo_tags_genres, musicinfo_tags_instruments, musicinfo_tags_vartags
+        ) VALUES (
+            new.id, new.name, new.artist_name, new.album_name,
+            new.musicinfo_tags_genres, new.musicinfo_tags_instruments, new.musicinfo_tags_vartags
+        );
+    END
+    """,
+    # 為已有數據建立索引
+    "INSERT INTO jamendo_tracks_fts(jamendo_tracks_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS jamendo_tracks_fts_au",
+    "DROP TRIGGER IF EXISTS jamendo_tracks_fts_ad",
+    "DROP TRIGGER IF EXISTS jamendo_tracks_fts_ai",
+    "DROP TABLE IF EXISTS jamendo_tracks_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS jamendo_tracks_search_idx ON jamendo_tracks USING GIN ((
+        setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(artist_name, '')), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(album_name, '')), 'C') ||
+        setweight(to_tsvector('simple'::regconfig,
+            coalesce(musicinfo_tags_genres, '') || ' ' ||
+            coalesce(musicinfo_tags_instruments, '') || ' ' ||
+            coalesce(musicinfo_tags_vartags, '')), 'D')
+    ))
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS jamendo_tracks_search_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
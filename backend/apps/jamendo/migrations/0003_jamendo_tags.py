@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:19
+
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite 上修改 jamendo_tracks 會重建該表，0002 建立的 FTS5 觸發器隨之被刪除，
+# 在表結構變更之後（回滾時在變更撤銷之後）重新建立觸發器並重建索引
+track_search = importlib.import_module('apps.jamendo.migrations.0002_jamendo_track_search')
+
+
+def restore_track_search(apps, schema_editor):
+    for statement in track_search.SQLITE_FORWARD if schema_editor.connection.vendor == 'sqlite' else []:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0002_jamendo_track_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_track_search),
+        migrations.CreateModel(
+            name='JamendoTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('genre', '曲風'), ('instrument', '樂器'), ('vartag', '其他')], max_length=20, verbose_name='類型')),
+                ('name', models.CharField(max_length=100, verbose_name='標籤名稱')),
+            ],
+            options={
+                'verbose_name': 'Jamendo 標籤',
+                'verbose_name_plural': 'Jamendo 標籤',
+                'db_table': 'jamendo_tags',
+                'ordering': ['kind', 'name'],
+                'indexes': [models.Index(fields=['name'], name='jamendo_tag_name_7f3b14_idx')],
+                'unique_together': {('kind', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='JamendoTrackTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_tags', to='jamendo.jamendotag', verbose_name='標籤')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_tags', to='jamendo.jamendotrack', verbose_name='音軌')),
+            ],
+            options={
+                'verbose_name': '音軌標籤',
+                'verbose_name_plural': '音軌標籤',
+                'db_table': 'jamendo_track_tags',
+            },
+        ),
+        migrations.AddField(
+            model_name='jamendotrack',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='tracks', through='jamendo.JamendoTrackTag', to='jamendo.jamendotag', verbose_name='標籤'),
+        ),
+        migrations.AddIndex(
+            model_name='jamendotracktag',
+            index=models.Index(fields=['track'], name='jamendo_tra_track_i_e3f71c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jamendotracktag',
+            unique_together={('tag', 'track')},
+        ),
+        migrations.RunPython(restore_track_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# 從 JSON 標籤欄位回填 jamendo_tags 與 jamendo_track_tags（之後由 ingestion 同步）
+
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+TAG_KIND_FIELDS = [
+    ('genre', 'musicinfo_tags_genres'),
+    ('instrument', 'musicinfo_tags_instruments'),
+    ('vartag', 'musicinfo_tags_vartags'),
+]
+
+
+def _parse(raw):
+    try:
+        tags = json.loads(raw) if raw else []
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return tags if isinstance(tags, list) else []
+
+
+def _track_pairs(track, max_length):
+    pairs = []
+    for kind, field_name in TAG_KIND_FIELDS:
+        for tag in _parse(getattr(track, field_name)):
+            name = tag.strip().lower()[:max_length] if isinstance(tag, str) else ''
+            if name:
+                pairs.append((kind, name))
+    return set(pairs)
+
+
+def backfill_tags(apps, schema_editor):
+    JamendoTrack = apps.get_model('jamendo', 'JamendoTrack')
+    JamendoTag = apps.get_model('jamendo', 'JamendoTag')
+    JamendoTrackTag = apps.get_model('jamendo', 'JamendoTrackTag')
+    max_length = JamendoTag._meta.get_field('name').max_length
+
+    tag_ids = {(kind, name): tag_id for tag_id, kind, name in JamendoTag.objects.values_list('id', 'kind', 'name')}
+    fields = ['id'] + [field_name for _, field_name in TAG_KIND_FIELDS]
+    last_id = 0
+    while True:
+        tracks = list(JamendoTrack.objects.filter(id__gt=last_id).order_by('id').only(*fields)[:BATCH_SIZE])
+        if not tracks:
+            break
+        last_id = tracks[-1].id
+
+        pairs_by_track = {track.id: _track_pairs(track, max_length) for track in tracks}
+        missing = {pair for pairs in pairs_by_track.values() for pair in pairs} - tag_ids.keys()
+        if missing:
+            JamendoTag.objects.bulk_create(
+                [JamendoTag(kind=kind, name=name) for kind, name in missing],
+                ignore_conflicts=True,
+            )
+            tag_ids.update(
+                ((kind, name), tag_id)
+                for tag_id, kind, name in JamendoTag.objects.values_list('id', 'kind', 'name')
+                if (kind, name) in missing
+            )
+
+        JamendoTrackTag.objects.bulk_create(
+            [
+                JamendoTrackTag(track_id=track_id, tag_id=tag_ids[pair])
+                for track_id, pairs in pairs_by_track.items()
+                for pair in pairs
+            ],
+            ignore_conflicts=True,
+            batch_size=BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0003_jamendo_tags'),
+    ]
+
+    operations = [
+        # 回滾時 0003 會刪除兩個表，這裡不需要處理
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
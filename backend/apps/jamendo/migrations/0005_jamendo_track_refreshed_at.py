@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0004_backfill_jamendo_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jamendotrack',
+            name='refreshed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='刷新時間'),
+        ),
+        migrations.AddIndex(
+            model_name='jamendotrack',
+            index=models.Index(fields=['refreshed_at'], name='jamendo_tra_refresh_99da4a_idx'),
+        ),
+    ]
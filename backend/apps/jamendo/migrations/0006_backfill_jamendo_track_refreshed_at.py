@@ -0,0 +1,28 @@
+# 把從未刷新（refreshed_at 為 NULL）的音軌回填為 NEVER_REFRESHED，0007 再把欄位改為 NOT NULL
+
+import datetime
+
+from django.db import migrations
+
+NEVER_REFRESHED = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def backfill_refreshed_at(apps, schema_editor):
+    JamendoTrack = apps.get_model('jamendo', 'JamendoTrack')
+    JamendoTrack.objects.filter(refreshed_at__isnull=True).update(refreshed_at=NEVER_REFRESHED)
+
+
+def clear_refreshed_at(apps, schema_editor):
+    JamendoTrack = apps.get_model('jamendo', 'JamendoTrack')
+    JamendoTrack.objects.filter(refreshed_at=NEVER_REFRESHED).update(refreshed_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0005_jamendo_track_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_refreshed_at, clear_refreshed_at),
+    ]
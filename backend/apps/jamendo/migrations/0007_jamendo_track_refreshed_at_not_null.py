@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:43
+
+import datetime
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite 修改欄位時會重建 jamendo_tracks，表上的 FTS5 觸發器會被刪除，需要重新建立
+search_migration = import_module('apps.jamendo.migrations.0002_jamendo_track_search')
+
+
+def restore_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in search_migration.SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jamendo', '0006_backfill_jamendo_track_refreshed_at'),
+    ]
+
+    operations = [
+        # 回滾時 AlterField 同樣會重建表，之後再建立觸發器
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AlterField(
+            model_name='jamendotrack',
+            name='refreshed_at',
+            field=models.DateTimeField(default=datetime.datetime(1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc), verbose_name='刷新時間'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
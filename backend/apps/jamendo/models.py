@@ -3,6 +3,10 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 import json
+from datetime import datetime, timezone as dt_timezone
+
+# 從未刷新的音軌的 refreshed_at（排在刷新隊列最前面），欄位不為 NULL 以便按索引順序掃描
+NEVER_REFRESHED = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 class JamendoTrack(models.Model):
     """本地緩存的 Jamendo 音軌信息"""
@@ -43,6 +47,15 @@ class JamendoTrack(models.Model):
         help_text="JSON 格式存儲的其他標籤列表"
     )
     
+    # 正規化的標籤（由 ingestion 與上面的 JSON 欄位同步，按標籤查詢音軌時使用）
+    tags = models.ManyToManyField(
+        'JamendoTag',
+        through='JamendoTrackTag',
+        related_name='tracks',
+        blank=True,
+        verbose_name="標籤"
+    )
+    
     # 統計信息
     stats_rate = models.FloatField(default=0.0, verbose_name="評分")
     stats_downloads_total = models.IntegerField(default=0, verbose_name="下載次數")
@@ -50,6 +63,8 @@ class JamendoTrack(models.Model):
     
     # 本地字段
     cached_at = models.DateTimeField(auto_now=True, verbose_name="緩存時間")
+    # 最後一次取得完整數據（統計、標籤）的時間，列表響應的寫入不會更新，背景刷新按此排序
+    refreshed_at = models.DateTimeField(default=NEVER_REFRESHED, verbose_name="刷新時間")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="創建時間")
     
     class Meta:
@@ -63,6 +78,7 @@ class JamendoTrack(models.Model):
             models.Index(fields=['album_name']),
             models.Index(fields=['stats_rate']),
             models.Index(fields=['cached_at']),
+            models.Index(fields=['refreshed_at']),
         ]
     
     def __str__(self):
@@ -77,29 +93,33 @@ class JamendoTrack(models.Model):
             return f"{minutes:02d}:{seconds:02d}"
         return "00:00"
     
+    def _parsed_tags(self, field_name):
+        """解析 JSON 標籤欄位，按欄位原始值緩存（欄位改變後才重新解析）"""
+        raw = getattr(self, field_name)
+        parsed_tags = self.__dict__.setdefault('_parsed_tags_cache', {})
+        cached = parsed_tags.get(field_name)
+        if cached is None or cached[0] != raw:
+            try:
+                tags = json.loads(raw) if raw else []
+            except (json.JSONDecodeError, TypeError):
+                tags = []
+            cached = parsed_tags[field_name] = (raw, tags if isinstance(tags, list) else [])
+        return list(cached[1])
+    
     @property
     def genres_list(self):
         """獲取曲風列表"""
-        try:
-            return json.loads(self.musicinfo_tags_genres) if self.musicinfo_tags_genres else []
-        except (json.JSONDecodeError, TypeError):
-            return []
+        return self._parsed_tags('musicinfo_tags_genres')
     
     @property
     def instruments_list(self):
         """獲取樂器列表"""
-        try:
-            return json.loads(self.musicinfo_tags_instruments) if self.musicinfo_tags_instruments else []
-        except (json.JSONDecodeError, TypeError):
-            return []
+        return self._parsed_tags('musicinfo_tags_instruments')
     
     @property
     def vartags_list(self):
         """獲取其他標籤列表"""
-        try:
-            return json.loads(self.musicinfo_tags_vartags) if self.musicinfo_tags_vartags else []
-        except (json.JSONDecodeError, TypeError):
-            return []
+        return self._parsed_tags('musicinfo_tags_vartags')
     
     @property
     def all_tags(self):
@@ -110,6 +130,20 @@ class JamendoTrack(models.Model):
         all_tags.extend(self.vartags_list)
         return list(set(all_tags))  # 去重
     
+    def tag_pairs(self):
+        """(類型, 名稱) 形式的標籤列表，用於同步 jamendo_track_tags"""
+        pairs = []
+        for kind, tags in (
+            (JamendoTag.GENRE, self.genres_list),
+            (JamendoTag.INSTRUMENT, self.instruments_list),
+            (JamendoTag.VARTAG, self.vartags_list),
+        ):
+            for tag in tags:
+                name = JamendoTag.normalize_name(tag)
+                if name:
+                    pairs.append((kind, name))
+        return list(dict.fromkeys(pairs))
+    
     def set_genres(self, genres_list):
         """設置曲風標籤"""
         self.musicinfo_tags_genres = json.dumps(genres_list) if genres_list else ''
@@ -122,6 +156,31 @@ class JamendoTrack(models.Model):
         """設置其他標籤"""
         self.musicinfo_tags_vartags = json.dumps(vartags_list) if vartags_list else ''
     
+    def to_jamendo_data(self):
+        """轉換為與 Jamendo API 相同結構的音軌數據"""
+        return {
+            'id': str(self.jamendo_id),
+            'name': self.name,
+            'duration': self.duration,
+            'artist_id': str(self.artist_id),
+            'artist_name': self.artist_name,
+            'album_name': self.album_name or 'Unknown Album',
+            'album_id': str(self.album_id) if self.album_id is not None else '',
+            'position': self.position,
+            'releasedate': self.releasedate.isoformat() if self.releasedate else '',
+            'album_image': self.album_image,
+            'image': self.image or self.album_image,
+            'audio': self.audio,
+            'audiodownload': self.audiodownload,
+            'musicinfo': {
+                'tags': {
+                    'genres': self.genres_list,
+                    'instruments': self.instruments_list,
+                    'vartags': self.vartags_list,
+                }
+            },
+        }
+
     @classmethod
     def create_from_jamendo_data(cls, jamendo_data):
         """從 Jamendo API 數據創建對象"""
@@ -165,6 +224,68 @@ class JamendoTrack(models.Model):
         except KeyError as e:
             raise ValueError(f"缺少必要的 Jamendo 數據字段: {e}")
 
+class JamendoTag(models.Model):
+    """音軌標籤（曲風、樂器、其他）"""
+    
+    GENRE = 'genre'
+    INSTRUMENT = 'instrument'
+    VARTAG = 'vartag'
+    KIND_CHOICES = [
+        (GENRE, '曲風'),
+        (INSTRUMENT, '樂器'),
+        (VARTAG, '其他'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="類型")
+    name = models.CharField(max_length=100, verbose_name="標籤名稱")
+    
+    class Meta:
+        db_table = 'jamendo_tags'
+        ordering = ['kind', 'name']
+        verbose_name = "Jamendo 標籤"
+        verbose_name_plural = "Jamendo 標籤"
+        unique_together = ['kind', 'name']
+        indexes = [
+            models.Index(fields=['name']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.name}"
+    
+    @classmethod
+    def normalize_name(cls, name):
+        """標籤名稱統一為小寫，超長的截斷"""
+        if not isinstance(name, str):
+            return ''
+        return name.strip().lower()[:cls._meta.get_field('name').max_length]
+
+class JamendoTrackTag(models.Model):
+    """音軌與標籤的關聯，(tag, track) 唯一索引用於按標籤查詢音軌"""
+    track = models.ForeignKey(
+        JamendoTrack,
+        on_delete=models.CASCADE,
+        verbose_name="音軌",
+        related_name="track_tags"
+    )
+    tag = models.ForeignKey(
+        JamendoTag,
+        on_delete=models.CASCADE,
+        verbose_name="標籤",
+        related_name="track_tags"
+    )
+    
+    class Meta:
+        db_table = 'jamendo_track_tags'
+        verbose_name = "音軌標籤"
+        verbose_name_plural = "音軌標籤"
+        unique_together = ['tag', 'track']
+        indexes = [
+            models.Index(fields=['track']),
+        ]
+    
+    def __str__(self):
+        return f"{self.track_id} - {self.tag_id}"
+
 class UserFavoriteTrack(models.Model):
     """用戶收藏的音軌"""
     user = models.ForeignKey(
@@ -0,0 +1,122 @@
+# backend/apps/jamendo/multi_search.py
+"""
+綜合搜尋：同時搜尋上游的音軌、藝人、專輯與本地音軌庫，合併排序後分組返回
+
+每個子查詢各自緩存（音軌沿用 search 列表緩存，藝人、專輯以 namesearch 查詢），
+由 views.search_all / async_views.search_all 並發執行，總耗時取決於最慢的子查詢。
+"""
+from .projection import ALBUM_CARD_FIELDS, ARTIST_CARD_FIELDS
+from .search import query_terms
+
+# 上游子查詢：Jamendo 端點與緩存的欄位
+ENTITY_SEARCHES = {
+    'artists': ARTIST_CARD_FIELDS,
+    'albums': ALBUM_CARD_FIELDS,
+}
+
+# 各分組在 top 中的類型名稱與權重（同分時藝人優先，其次專輯、音軌）
+RESULT_TYPES = {
+    'artists': ('artist', 1.0),
+    'albums': ('album', 0.97),
+    'tracks': ('track', 0.95),
+}
+
+# 上游排序的加權（同一子查詢中越前面的結果分數越高）
+POSITION_WEIGHT = 0.1
+
+TOP_LIMIT = 5
+
+
+def entity_search_params(query, limit):
+    """藝人 / 專輯搜尋的 Jamendo 請求參數"""
+    return {'namesearch': query, 'limit': limit}
+
+
+def match_score(query, text):
+    """名稱與查詢的匹配程度（0 到 1）：完全相同 > 前綴 > 每個詞都有詞首匹配 > 部分詞匹配"""
+    if not text:
+        return 0.0
+    normalized_query = ' '.join(query_terms(query))
+    normalized_text = ' '.join(query_terms(text))
+    if not normalized_query or not normalized_text:
+        return 0.0
+    if normalized_text == normalized_query:
+        return 1.0
+    if normalized_text.startswith(normalized_query):
+        return 0.85
+
+    terms = normalized_query.split()
+    words = normalized_text.split()
+    matched = sum(1 for term in terms if any(word.startswith(term) for word in words))
+    if matched == len(terms):
+        return 0.7
+    return 0.5 * matched / len(terms)
+
+
+def _track_score(query, track):
+    # 輸入藝人或專輯名稱時，該藝人、專輯的音軌也相關，但排在藝人、專輯本身之後
+    return max(
+        match_score(query, track.get('name')),
+        0.8 * match_score(query, track.get('artist_name')),
+        0.7 * match_score(query, track.get('album_name')),
+    )
+
+
+def _ranked(query, group, items):
+    scorer = _track_score if group == 'tracks' else (lambda q, item: match_score(q, item.get('name')))
+    weight = RESULT_TYPES[group][1]
+    ranked = []
+    for position, item in enumerate(items):
+        relevance = scorer(query, item)
+        position_bonus = POSITION_WEIGHT * (1 - position / len(items))
+        ranked.append((round(weight * relevance + position_bonus, 4), relevance, item))
+    ranked.sort(key=lambda ranked_item: ranked_item[0], reverse=True)
+    return ranked
+
+
+def _merge_tracks(upstream, local):
+    """上游與本地音軌去重合併（同一 id 以上游結果為準）"""
+    tracks = [{**track, 'source': 'jamendo'} for track in upstream]
+    seen = {str(track.get('id')) for track in upstream}
+    for track in local:
+        if str(track.get('id')) not in seen:
+            seen.add(str(track.get('id')))
+            tracks.append({**track, 'source': 'local'})
+    return tracks
+
+
+def combine_search_results(query, results, limit):
+    """合併各子查詢的結果
+
+    results 為 {'tracks' | 'artists' | 'albums' | 'local': 數據或 None}，
+    None 表示該子查詢失敗，其他分組仍然返回。
+    """
+    def items(name):
+        data = results.get(name)
+        return data.get('results', []) if data else []
+
+    groups = {
+        'tracks': _merge_tracks(items('tracks'), items('local')),
+        'artists': items('artists'),
+        'albums': items('albums'),
+    }
+
+    ranked_groups = {}
+    top = []
+    for group, group_items in groups.items():
+        ranked = _ranked(query, group, group_items)[:limit]
+        ranked_groups[group] = [{**item, 'score': score} for score, _, item in ranked]
+        # 名稱完全不匹配的結果（只有上游排序的加權）不放入 top
+        result_type = RESULT_TYPES[group][0]
+        top.extend(
+            {**item, 'type': result_type, 'score': score}
+            for score, relevance, item in ranked if relevance > 0
+        )
+    top.sort(key=lambda item: item['score'], reverse=True)
+
+    return {
+        'query': query,
+        'top': top[:TOP_LIMIT],
+        'groups': ranked_groups,
+        'sources': {name: 'ok' if data is not None else 'error' for name, data in results.items()},
+    }
@@ -0,0 +1,175 @@
+# backend/apps/jamendo/pagination.py
+"""
+列表端點的游標分頁
+
+以 offset 開始翻頁時建立一個快照（snapshot），游標記錄 (snapshot, 建立時間, offset, limit)。
+快照在緩存中保存開始翻頁後已向上游取得的有序音軌列表，每一頁都從這個列表切片：
+
+- 列表不足時以 JAMENDO_CURSOR_WINDOW 首為一段向上游請求並追加，已在快照中的音軌不再加入，
+  同一游標鏈的頁面不會重複
+- 每一頁第一次返回後固定（pinned），返回或重新請求同一頁時內容相同
+- 快照與頁面在建立後 JAMENDO_CURSOR_TTL 內有效，之後游標過期
+
+快照只固定已取得的部分：之後的段落仍是請求時的上游排序，上游排序在翻頁期間變化時，
+移到前面的音軌不會再出現（但不會重複）。同一進程內同一快照的補充合併執行，不同 worker
+同時補充時以後寫入的為準；快照被緩存淘汰時以當前頁的 offset 重新開始。
+"""
+import base64
+import binascii
+import json
+import time
+import uuid
+
+from django.conf import settings
+
+from .caching import SingleFlight, get_cache
+
+# Jamendo 單次請求的音軌上限
+MAX_WINDOW = 200
+# 單次頁面請求最多向上游補充的段數（去除重複後仍不足時停止）
+MAX_WINDOWS_PER_PAGE = 3
+
+_extending = SingleFlight()
+
+
+def cursor_ttl():
+    return getattr(settings, 'JAMENDO_CURSOR_TTL', 3600)
+
+
+def _window_size(limit):
+    return min(max(getattr(settings, 'JAMENDO_CURSOR_WINDOW', 100), limit), MAX_WINDOW)
+
+
+def new_page(offset, limit):
+    """開始新的翻頁（新的快照）"""
+    return {'snapshot': uuid.uuid4().hex[:16], 'created': int(time.time()), 'offset': offset, 'limit': limit}
+
+
+def encode_cursor(page):
+    raw = json.dumps(
+        [page['snapshot'], page['created'], page['offset'], page['limit']], separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游標，無效或已過期時拋出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        snapshot, created, offset, limit = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created, offset, limit = int(created), int(offset), int(limit)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('cursor 參數無效')
+    if not isinstance(snapshot, str) or not snapshot.isalnum() or offset < 0 or not 0 < limit <= 200:
+        raise ValueError('cursor 參數無效')
+    # 快照與頁面超過 TTL 後不再保留，舊游標無法保證內容穩定
+    if time.time() - created > cursor_ttl():
+        raise ValueError('cursor 已過期，請重新開始')
+    return {'snapshot': snapshot, 'created': created, 'offset': offset, 'limit': limit}
+
+
+def parse_page(request, limit):
+    """解析 cursor / offset 參數，兩者都沒有時返回 None（不分頁）
+
+    offset 開始新的翻頁（建立新的快照），之後以返回的 next_cursor 繼續。
+    """
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return decode_cursor(cursor)
+    offset = request.GET.get('offset')
+    if offset is None:
+        return None
+    try:
+        offset = int(offset)
+    except ValueError:
+        raise ValueError('offset 參數無效')
+    if offset < 0:
+        raise ValueError('offset 參數無效')
+    return new_page(offset, limit)
+
+
+def next_page(page):
+    return {**page, 'offset': page['offset'] + page['limit']}
+
+
+def page_params(params, page):
+    """加入 Jamendo 的 offset 參數"""
+    return {**params, 'limit': page['limit'], 'offset': page['offset']}
+
+
+def page_key_params(params, page):
+    """頁面緩存鍵使用的參數（包含 snapshot）"""
+    return {**page_params(params, page), 'snapshot': page['snapshot']}
+
+
+def _snapshot_key(page):
+    return f'jamendo_cursor:{page["snapshot"]}'
+
+
+def _snapshot_ttl(page):
+    return max(1, int(page['created'] + cursor_ttl() - time.time()))
+
+
+def _covers(snapshot, page):
+    end = page['offset'] - snapshot['base'] + page['limit']
+    return snapshot['done'] or len(snapshot['tracks']) >= end
+
+
+def _extend(page, fetch):
+    """向上游請求快照的下一段並追加（去除已有的音軌），上游失敗時返回 None"""
+    cache = get_cache()
+    key = _snapshot_key(page)
+    snapshot = cache.get(key) or {'base': page['offset'], 'tracks': [], 'next_offset': page['offset'], 'done': False}
+    if _covers(snapshot, page):
+        return snapshot
+
+    size = _window_size(page['limit'])
+    data = fetch(snapshot['next_offset'], size)
+    if data is None:
+        return None
+    results = data.get('results', [])
+    seen = {track.get('id') for track in snapshot['tracks']}
+    snapshot = {
+        **snapshot,
+        'tracks': snapshot['tracks'] + [track for track in results if track.get('id') not in seen],
+        'next_offset': snapshot['next_offset'] + size,
+        'done': len(results) < size,
+    }
+    cache.set(key, snapshot, _snapshot_ttl(page))
+    return snapshot
+
+
+def snapshot_page(page, fetch):
+    """從快照中切出一頁，快照不足時以 fetch(offset, limit) 向上游補充
+
+    返回 Jamendo 格式的數據，上游失敗時返回 None。
+    """
+    snapshot = None
+    for _ in range(MAX_WINDOWS_PER_PAGE):
+        snapshot = _extending.do(_snapshot_key(page), lambda: _extend(page, fetch))
+        if snapshot is None:
+            return None
+        if _covers(snapshot, page):
+            break
+    start = page['offset'] - snapshot['base']
+    results = snapshot['tracks'][start:start + page['limit']] if start >= 0 else []
+    return {
+        'headers': {'status': 'success', 'code': 0, 'results_count': len(results)},
+        'results': results,
+    }
+
+
+def add_pagination(data, page):
+    """在頁面數據中加入分頁資訊"""
+    if data is None:
+        return None
+    has_more = len(data.get('results', [])) >= page['limit']
+    return {
+        **data,
+        'pagination': {
+            'offset': page['offset'],
+            'limit': page['limit'],
+            'has_more': has_more,
+            'next_cursor': encode_cursor(next_page(page)) if has_more else None,
+        },
+    }
@@ -0,0 +1,81 @@
+# backend/apps/jamendo/projection.py
+"""
+列表端點的欄位投影
+
+列表端點默認只返回卡片需要的欄位（view=card），緩存中也只保存投影後的數據；
+view=full 返回上游完整數據，fields=a,b,c 可指定任意頂層欄位（總是包含 id）。
+上游請求仍帶 include=musicinfo，完整數據在投影前寫入本地音軌庫。
+"""
+import re
+
+from django.conf import settings
+
+# 首頁卡片、播放器與播放清單使用的欄位
+CARD_FIELDS = (
+    'album_id', 'album_image', 'album_name', 'artist_id', 'artist_name',
+    'audio', 'audiodownload', 'audiodownload_allowed', 'duration', 'id',
+    'image', 'name', 'releasedate', 'shorturl',
+)
+
+# 綜合搜尋中藝人、專輯結果使用的欄位
+ARTIST_CARD_FIELDS = ('id', 'image', 'joindate', 'name', 'shorturl', 'website')
+ALBUM_CARD_FIELDS = (
+    'artist_id', 'artist_name', 'id', 'image', 'name', 'releasedate', 'shorturl',
+)
+
+LIST_VIEWS = {
+    'card': CARD_FIELDS,
+    'full': None,
+}
+
+MAX_FIELDS = 30
+_FIELD_NAME = re.compile(r'^[a-z_]+$')
+
+
+def parse_fields(fields=None, view=None):
+    """解析 fields / view 參數，返回欄位元組（已排序，作為緩存鍵的一部分）或 None（完整數據）"""
+    if fields:
+        names = {name.strip() for name in fields.split(',')}
+        if not all(_FIELD_NAME.match(name) for name in names) or len(names) > MAX_FIELDS:
+            raise ValueError('fields 參數無效')
+        return tuple(sorted(names | {'id'}))
+
+    view = view or getattr(settings, 'JAMENDO_LIST_DEFAULT_VIEW', 'card')
+    if view not in LIST_VIEWS:
+        raise ValueError(f'不支持的 view: {view}')
+    return LIST_VIEWS[view]
+
+
+def parse_request_fields(request):
+    """從查詢參數解析欄位投影"""
+    return parse_fields(request.GET.get('fields'), request.GET.get('view'))
+
+
+def project_tracks(data, fields):
+    """只保留 results 中每首音軌的指定欄位，fields 為 None 時原樣返回"""
+    if fields is None or data is None:
+        return data
+    return {
+        **data,
+        'results': [
+            {name: track[name] for name in fields if name in track}
+            for track in data.get('results', [])
+        ],
+    }
+
+
+def projected(loader, fields):
+    """包裝 loader，使寫入緩存的是投影後的數據"""
+    if fields is None:
+        return loader
+    return lambda: project_tracks(loader(), fields)
+
+
+def aprojected(aloader, fields):
+    """projected 的非同步版本"""
+    if fields is None:
+        return aloader
+
+    async def load():
+        return project_tracks(await aloader(), fields)
+    return load
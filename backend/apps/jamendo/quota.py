@@ -0,0 +1,203 @@
+# backend/apps/jamendo/quota.py
+"""
+Jamendo 上游配額（按 client_id 限流）
+
+所有 worker 共用一個固定窗口計數器：每個窗口（JAMENDO_QUOTA_WINDOW 秒）一個計數鍵，
+放在共享緩存層（REDIS_URL 設置時跨 worker 共用，否則只在進程內有效），每次上游請求
+以 incr 計一次，窗口開始時歸零。不同優先級可使用的比例不同，低優先級先被延遲或丟棄，
+預留的額度留給用戶請求：
+
+- interactive：用戶觸發的搜尋、詳情、列表請求（默認）
+- feed：緩存背景刷新、預熱、隨機音軌池補充
+- crawl：批次抓取、目錄刷新等背景任務
+
+固定窗口不平滑請求：一個窗口末尾與下一個窗口開頭可以各用完額度，跨窗口邊界的
+短時間內最多發出 2 倍 limit 的請求。上游限制是嚴格的滑動速率時，limit 應設為
+上游限制的一半（或縮短窗口）。
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import caching
+
+INTERACTIVE = 'interactive'
+FEED = 'feed'
+CRAWL = 'crawl'
+PRIORITIES = (INTERACTIVE, FEED, CRAWL)
+
+DEFAULT_SHARES = {INTERACTIVE: 1.0, FEED: 0.7, CRAWL: 0.4}
+DEFAULT_MAX_WAIT = {INTERACTIVE: 1.0, FEED: 0.0, CRAWL: 60.0}
+
+_priority = contextvars.ContextVar('jamendo_quota_priority', default=INTERACTIVE)
+
+
+class QuotaExceededError(Exception):
+    """當前優先級在本窗口內已無可用額度，請求未發送到上游"""
+
+
+@contextmanager
+def priority(name):
+    """在區塊內以指定優先級請求上游（線程與協程各自獨立）"""
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class UpstreamQuota:
+    """跨 worker 共用的固定窗口計數器，按優先級分配窗口額度的可用比例"""
+
+    def __init__(self, name, limit, window, shares=None, max_wait=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.shares = {**DEFAULT_SHARES, **(shares or {})}
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self._lock = threading.Lock()
+        self.counters = {
+            level: {'granted': 0, 'delayed': 0, 'dropped': 0} for level in PRIORITIES
+        }
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    def _cache(self):
+        return caching.get_lock_cache()
+
+    def _window_key(self, now):
+        return f'jamendo:quota:{self.name}:{int(now // self.window)}'
+
+    def _allowance(self, level):
+        return int(self.limit * self.shares.get(level, 1.0))
+
+    def _count(self, level, counter):
+        with self._lock:
+            self.counters[level][counter] += 1
+
+    def _until_next_window(self, now):
+        return self.window - (now % self.window)
+
+    def _try_take(self, level, now):
+        cache = self._cache()
+        key = self._window_key(now)
+        cache.add(key, 0, self.window * 2)
+        used = cache.incr(key)
+        if used <= self._allowance(level):
+            return True
+        # 超出額度時撤回這次計數，不影響其他優先級
+        cache.decr(key)
+        return False
+
+    async def _atry_take(self, level, now):
+        # Django 的 aincr 默認為 aget + aset（非原子），django-redis 與 TieredCache 也沒有
+        # 非同步版本，並發的協程會讀到同一計數而全部通過；改在線程池中使用原子的 incr。
+        # 不佔用 thread_sensitive 的共用線程，避免阻塞其他非同步緩存操作
+        return await sync_to_async(self._try_take, thread_sensitive=False)(level, now)
+
+    def _wait_time(self, level, now):
+        """本窗口額度用完時需等待的秒數，超過該優先級的最長等待時間時返回 None"""
+        wait = self._until_next_window(now)
+        return wait if wait <= self.max_wait.get(level, 0) else None
+
+    def acquire(self, level=None):
+        """在本窗口計一次請求；額度不足時等待下一個窗口或拋出 QuotaExceededError"""
+        if not self.enabled:
+            return
+        level = level or current_priority()
+        now = time.time()
+        if self._try_take(level, now):
+            self._count(level, 'granted')
+            return
+        wait = self._wait_time(level, now)
+        if wait is not None:
+            self._count(level, 'delayed')
+            time.sleep(wait)
+            if self._try_take(level, time.time()):
+                self._count(level, 'granted')
+                return
+        self._count(level, 'dropped')
+        raise QuotaExceededError(f'{self.name} 上游配額不足（{level}）')
+
+    async def aacquire(self, level=None):
+        """acquire 的非同步版本"""
+        if not self.enabled:
+            return
+        level = level or current_priority()
+        now = time.time()
+        if await self._atry_take(level, now):
+            self._count(level, 'granted')
+            return
+        wait = self._wait_time(level, now)
+        if wait is not None:
+            self._count(level, 'delayed')
+            await asyncio.sleep(wait)
+            if await self._atry_take(level, time.time()):
+                self._count(level, 'granted')
+                return
+        self._count(level, 'dropped')
+        raise QuotaExceededError(f'{self.name} 上游配額不足（{level}）')
+
+    def try_acquire(self, level=None):
+        """不等待地計一次請求，額度不足時返回 False（用於可省略的額外請求，例如對沖、斷路器探測）"""
+        if not self.enabled:
+            return True
+        level = level or current_priority()
+        if self._try_take(level, time.time()):
+            self._count(level, 'granted')
+            return True
+        return False
+
+    async def atry_acquire(self, level=None):
+        """try_acquire 的非同步版本"""
+        if not self.enabled:
+            return True
+        level = level or current_priority()
+        if await self._atry_take(level, time.time()):
+            self._count(level, 'granted')
+            return True
+        return False
+
+    def remaining(self, level=INTERACTIVE):
+        """本窗口內指定優先級的剩餘額度"""
+        if not self.enabled:
+            return None
+        used = self._cache().get(self._window_key(time.time())) or 0
+        return max(0, self._allowance(level) - used)
+
+    def snapshot(self):
+        """配額狀態與本進程的限流統計"""
+        with self._lock:
+            counters = {level: dict(values) for level, values in self.counters.items()}
+        if not self.enabled:
+            return {'enabled': False, 'counters': counters}
+        return {
+            'enabled': True,
+            'limit': self.limit,
+            'window': self.window,
+            'window_resets_in': round(self._until_next_window(time.time()), 1),
+            'remaining': {level: self.remaining(level) for level in PRIORITIES},
+            'counters': counters,
+        }
+
+
+def build_quota(name='jamendo'):
+    """按 settings 建立配額（JAMENDO_QUOTA_LIMIT 為 0 時不限流）"""
+    return UpstreamQuota(
+        name,
+        limit=getattr(settings, 'JAMENDO_QUOTA_LIMIT', 0),
+        window=getattr(settings, 'JAMENDO_QUOTA_WINDOW', 60),
+        shares=getattr(settings, 'JAMENDO_QUOTA_SHARES', None),
+        max_wait=getattr(settings, 'JAMENDO_QUOTA_MAX_WAIT', None),
+    )
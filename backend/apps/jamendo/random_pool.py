@@ -0,0 +1,200 @@
+# backend/apps/jamendo/random_pool.py
+"""
+隨機音軌池
+
+每個 worker 進程在內存中保存一批打亂順序的音軌，請求直接從池中取出
+（取出即移除，池補充前不會重複）。池低於水位時在背景補充，
+來源為 Jamendo 上游的隨機列表與本地 jamendo_tracks。
+
+請求中不會補充池（補充需要多次上游請求與本地抽樣）：池中不足的部分
+由調用方以一次上游請求補足。
+"""
+import logging
+import os
+import random
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from . import background
+from .models import JamendoTrack
+
+logger = logging.getLogger(__name__)
+
+# Jamendo 單次請求最多返回 200 首
+UPSTREAM_BATCH_SIZE = 200
+
+
+def _pool_settings():
+    size = getattr(settings, 'JAMENDO_RANDOM_POOL_SIZE', 600)
+    refill_at = getattr(settings, 'JAMENDO_RANDOM_POOL_REFILL_AT', size // 3)
+    local_ratio = getattr(settings, 'JAMENDO_RANDOM_POOL_LOCAL_RATIO', 0.5)
+    return size, refill_at, local_ratio
+
+
+def _sample_local(count):
+    """從本地音軌庫隨機抽樣（按主鍵範圍取隨機 ID，避免 ORDER BY RANDOM() 全表排序）"""
+    if count <= 0:
+        return []
+    bounds = JamendoTrack.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+
+    population = range(bounds['low'], bounds['high'] + 1)
+    ids = random.sample(population, min(count * 2, len(population)))
+    tracks = JamendoTrack.objects.filter(id__in=ids).order_by()[:count]
+    return [track.to_jamendo_data() for track in tracks]
+
+
+def _fetch_upstream(count):
+    """從 Jamendo 上游獲取隨機音軌"""
+    # 避免循環導入：views 依賴本模組
+    from .views import JAMENDO_CLIENT_ID, feed_params, fetch_from_jamendo
+
+    if not JAMENDO_CLIENT_ID:
+        return []
+    results = []
+    while len(results) < count:
+        data = fetch_from_jamendo('tracks', feed_params('random', UPSTREAM_BATCH_SIZE))
+        batch = data.get('results', []) if data else []
+        if not batch:
+            break
+        results.extend(batch)
+    return results
+
+
+class RandomTrackPool:
+    """進程內隨機音軌池，取出的音軌在下次補充前不會再次出現"""
+
+    def __init__(self):
+        self._tracks = deque()
+        self._ids = set()
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._refilling = False
+        self.draws = 0
+        self.short_draws = 0
+        self.refills = 0
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def _add(self, tracks):
+        random.shuffle(tracks)
+        added = 0
+        with self._lock:
+            for track in tracks:
+                track_id = str(track.get('id', ''))
+                if not track_id or track_id in self._ids:
+                    continue
+                self._ids.add(track_id)
+                self._tracks.append(track)
+                added += 1
+        return added
+
+    def refill(self):
+        """補充到目標大小，返回新增數量"""
+        with self._refill_lock:
+            size, _, local_ratio = _pool_settings()
+            missing = size - len(self)
+            if missing <= 0:
+                return 0
+
+            local_count = int(missing * local_ratio)
+            tracks = _sample_local(local_count)
+            tracks += _fetch_upstream(missing - len(tracks))
+            added = self._add(tracks)
+            self.refills += 1
+            logger.info(f'隨機音軌池補充 {added} 首，當前 {len(self)} 首')
+            return added
+
+    def _background_refill(self):
+        try:
+            self.refill()
+        finally:
+            self._refilling = False
+
+    def schedule_refill(self):
+        """低於水位時在背景補充（同一時間只有一個補充任務）"""
+        _, refill_at, _ = _pool_settings()
+        if len(self) > refill_at or self._refilling:
+            return
+        self._refilling = True
+        background.submit(self._background_refill)
+
+    def draw(self, limit):
+        """取出最多 limit 首音軌（只讀內存，不阻塞），池中不足時返回已有的部分"""
+        with self._lock:
+            tracks = [self._tracks.popleft() for _ in range(min(limit, len(self._tracks)))]
+            for track in tracks:
+                self._ids.discard(str(track.get('id', '')))
+            self.draws += 1
+            if len(tracks) < limit:
+                self.short_draws += 1
+        self.schedule_refill()
+        return tracks
+
+    def stats(self):
+        size, refill_at, _ = _pool_settings()
+        return {
+            'size': len(self),
+            'target_size': size,
+            'refill_at': refill_at,
+            'draws': self.draws,
+            'short_draws': self.short_draws,
+            'refills': self.refills,
+        }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """獲取當前進程的隨機音軌池（fork 後重新建立，避免各 worker 返回相同音軌）"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = RandomTrackPool()
+                _pool_pid = pid
+    return _pool
+
+
+def pool_response(tracks):
+    """生成與 Jamendo API 相同結構的響應數據"""
+    return {
+        'headers': {
+            'status': 'success',
+            'code': 0,
+            'results_count': len(tracks),
+            'source': 'pool',
+        },
+        'results': tracks,
+    }
+
+
+def draw_random_tracks(limit):
+    """從隨機音軌池取出最多 limit 首（池在背景補充，不在請求中補充）"""
+    return get_pool().draw(limit)
+
+
+def merge_random_tracks(tracks, data, limit):
+    """池中取出的音軌加上上游補足的部分
+
+    池為空時原樣返回上游數據；上游請求失敗時返回池中已有的音軌（都沒有時返回 None）。
+    """
+    if not tracks:
+        return data
+    seen = {str(track.get('id', '')) for track in tracks}
+    for track in (data or {}).get('results', []):
+        if len(tracks) >= limit:
+            break
+        if str(track.get('id', '')) not in seen:
+            seen.add(str(track.get('id', '')))
+            tracks.append(track)
+    return pool_response(tracks)
@@ -0,0 +1,212 @@
+# backend/apps/jamendo/refresher.py
+"""
+本地音軌庫（jamendo_tracks）的背景刷新
+
+按 refreshed_at 索引取出最久未刷新的音軌（從未刷新的音軌為 NEVER_REFRESHED，排在最前），以多 ID 的上游請求
+（CRAWL 優先級）取得最新數據，只更新實際有變化的欄位；沒有變化的音軌只更新
+refreshed_at。列表響應的寫入只更新 cached_at，不影響刷新順序。
+刷新速度受 JAMENDO_REFRESH_TRACKS_PER_HOUR 限制。
+
+- 管理命令：python manage.py refresh_jamendo_tracks
+- 進程內排程：JAMENDO_REFRESH_ENABLED=True 時由 wsgi/asgi 入口啟動
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import quota
+from .caching import get_lock_cache
+from .client import CircuitOpenError, QuotaExceededError, get_client
+from .entities import cache_tracks
+from .ingestion import (
+    BASE_UPDATE_FIELDS, STATS_FIELDS, TAG_FIELDS, build_track, sync_track_tags, track_writes,
+)
+from .models import JamendoTrack
+from .views import JAMENDO_CLIENT_ID, normalize_tracks
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INCLUDE = 'musicinfo+stats'
+
+# Jamendo 單次請求最多返回 200 首
+MAX_BATCH_SIZE = 200
+
+LEADER_KEY = 'jamendo:refresher:leader'
+
+
+def _batch_size():
+    return min(getattr(settings, 'JAMENDO_REFRESH_BATCH_SIZE', 100), MAX_BATCH_SIZE)
+
+
+def _min_age():
+    return getattr(settings, 'JAMENDO_REFRESH_MIN_AGE', 86400)
+
+
+def batch_interval(batch_size=None):
+    """按每小時刷新數量計算的批次間隔（秒）"""
+    per_hour = max(1, getattr(settings, 'JAMENDO_REFRESH_TRACKS_PER_HOUR', 3000))
+    return 3600 * (batch_size or _batch_size()) / per_hour
+
+
+def stale_tracks(batch_size, min_age):
+    """最久未刷新（超過 min_age 秒）的音軌，按 refreshed_at 索引順序取出"""
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    return list(JamendoTrack.objects.filter(refreshed_at__lt=cutoff).order_by('refreshed_at')[:batch_size])
+
+
+def fetch_tracks(jamendo_ids):
+    """一次上游請求取得多首音軌的最新數據，返回 {jamendo_id: 數據}，失敗時返回 None
+
+    直接使用客戶端而非 fetch_from_jamendo，避免觸發整行覆寫的背景 upsert。
+    """
+    params = {
+        'id': ' '.join(str(jamendo_id) for jamendo_id in jamendo_ids),
+        'include': REFRESH_INCLUDE,
+        'audioformat': 'mp32',
+        'limit': len(jamendo_ids),
+    }
+    try:
+        with quota.priority(quota.CRAWL):
+            response = get_client().get('tracks', params)
+    except CircuitOpenError:
+        logger.warning('Jamendo API 斷路器開啟，跳過本批音軌刷新')
+        return None
+    except QuotaExceededError as e:
+        logger.warning(f'{str(e)}，跳過本批音軌刷新')
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f'音軌刷新請求異常: {str(e)}')
+        return None
+
+    if response.status_code != 200:
+        logger.error(f'音軌刷新請求錯誤: {response.status_code}')
+        return None
+
+    data = normalize_tracks(response.json())
+    cache_tracks(data)
+    fetched = {}
+    for track in data.get('results', []):
+        try:
+            fetched[int(track['id'])] = track
+        except (KeyError, TypeError, ValueError):
+            continue
+    return fetched
+
+
+def _compared_fields(data):
+    fields = [name for name in BASE_UPDATE_FIELDS if name != 'cached_at']
+    if 'musicinfo' in data:
+        fields += TAG_FIELDS
+    if 'stats' in data:
+        fields += STATS_FIELDS
+    return fields
+
+
+def changed_fields(row, data):
+    """把上游數據中有變化的欄位寫入 row，返回變化的欄位名"""
+    fresh = build_track(data)
+    if fresh is None:
+        return []
+    changed = []
+    for name in _compared_fields(data):
+        # 上游的 id 等欄位為字串，比較前轉換為欄位的 Python 類型
+        value = JamendoTrack._meta.get_field(name).to_python(getattr(fresh, name))
+        if getattr(row, name) != value:
+            setattr(row, name, value)
+            changed.append(name)
+    return changed
+
+
+def refresh_batch(batch_size=None, min_age=None):
+    """刷新一批最舊的音軌，返回統計；上游請求失敗時返回 None"""
+    rows = stale_tracks(batch_size or _batch_size(), _min_age() if min_age is None else min_age)
+    if not rows:
+        return {'selected': 0, 'updated': 0, 'unchanged': 0, 'missing': 0, 'fields': []}
+
+    fetched = fetch_tracks([row.jamendo_id for row in rows])
+    if fetched is None:
+        return None
+
+    # 按變化的欄位組合分組，每組一條 bulk_update，只寫入該組變化的欄位
+    groups = defaultdict(list)
+    retagged = {}
+    untouched = []
+    missing = 0
+    for row in rows:
+        data = fetched.get(row.jamendo_id)
+        if data is None:
+            missing += 1
+        changed = changed_fields(row, data) if data is not None else []
+        if changed:
+            groups[tuple(changed)].append(row)
+            if set(changed) & set(TAG_FIELDS):
+                retagged[row.pk] = row.tag_pairs()
+        else:
+            untouched.append(row.pk)
+
+    now = timezone.now()
+    with track_writes(), transaction.atomic():
+        for fields, group in groups.items():
+            for row in group:
+                row.cached_at = now
+                row.refreshed_at = now
+            JamendoTrack.objects.bulk_update(group, list(fields) + ['cached_at', 'refreshed_at'])
+        sync_track_tags(retagged)
+        # 沒有變化（或上游已不存在）的音軌只更新 refreshed_at，排到隊尾
+        if untouched:
+            JamendoTrack.objects.filter(pk__in=untouched).update(refreshed_at=now)
+
+    updated = sum(len(group) for group in groups.values())
+    summary = {
+        'selected': len(rows),
+        'updated': updated,
+        'unchanged': len(rows) - updated - missing,
+        'missing': missing,
+        'fields': sorted({name for fields in groups for name in fields}),
+    }
+    logger.info(
+        f'音軌刷新：{summary["selected"]} 首，更新 {updated}，'
+        f'上游不存在 {missing}，變化欄位 {summary["fields"]}'
+    )
+    return summary
+
+
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+
+def _refresher_loop():
+    while True:
+        interval = batch_interval()
+        try:
+            # 多個 worker 共用同一預算：每個間隔只有取得鎖的 worker 執行一批
+            if get_lock_cache().add(LEADER_KEY, os.getpid(), max(1, int(interval))):
+                refresh_batch()
+        except Exception as e:
+            logger.error(f'音軌刷新排程異常: {str(e)}')
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_refresher():
+    """在當前進程啟動音軌刷新線程（每個進程只啟動一次）"""
+    global _refresher_pid
+    if not getattr(settings, 'JAMENDO_REFRESH_ENABLED', False) or not JAMENDO_CLIENT_ID:
+        return False
+    pid = os.getpid()
+    with _refresher_lock:
+        if _refresher_pid == pid:
+            return False
+        _refresher_pid = pid
+    threading.Thread(target=_refresher_loop, name='jamendo-track-refresher', daemon=True).start()
+    logger.info(f'音軌刷新排程已啟動 (pid {pid})')
+    return True
@@ -0,0 +1,298 @@
+# backend/apps/jamendo/replay.py
+"""
+上游請求的錄製 / 重放（Jamendo、Spotify 共用）
+
+UPSTREAM_REPLAY_MODE：
+- off：直接請求上游（默認）
+- record：照常請求上游，並把響應（狀態、標頭、內容、延遲）寫入 UPSTREAM_REPLAY_DIR
+- replay：不連網，從錄製的檔案返回響應；沒有錄製的請求視為連線失敗
+
+同步請求在 requests 的 transport adapter 層攔截（Jamendo 連線池、Spotify Session），
+非同步請求在共用 httpx.AsyncClient 的 transport 層攔截，斷路器、配額、對沖、
+緩存與請求合併的邏輯都照常執行，可以在沒有網絡的環境重複測量。
+
+請求以 method + URL（查詢參數排序，去除 client_id 等憑證）+ 請求內容識別，
+同一請求錄製多次時重放按順序輪流返回。重放延遲由 UPSTREAM_REPLAY_LATENCY 決定：
+recorded（錄製時的延遲）、none、synthetic（以 UPSTREAM_REPLAY_SEED 為種子的
+對數常態分佈）。錄製的響應可能包含 Spotify token，檔案不要提交到版本庫。
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (OFF, RECORD, REPLAY)
+
+# 不寫入錄製檔案、也不參與請求識別的查詢參數
+REDACTED_PARAMS = {'client_id', 'client_secret'}
+
+# 響應內容已解壓，重放時這些標頭不再正確
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+# 每個請求最多保存的響應數
+MAX_RESPONSES_PER_KEY = 20
+
+
+def get_mode():
+    mode = getattr(settings, 'UPSTREAM_REPLAY_MODE', OFF)
+    if mode not in MODES:
+        raise ValueError(f'不支持的上游重放模式: {mode}')
+    return mode
+
+
+def normalize_url(url):
+    """排序查詢參數並去除憑證"""
+    parts = urlsplit(str(url))
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name not in REDACTED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def request_key(method, url, body=None):
+    digest = hashlib.sha256(f'{method.upper()} {normalize_url(url)}'.encode())
+    if body:
+        digest.update(body if isinstance(body, bytes) else str(body).encode())
+    return digest.hexdigest()[:32]
+
+
+def _kept_headers(headers):
+    return {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS}
+
+
+class FixtureStore:
+    """錄製檔案：每個請求一個 JSON 檔案，保存依序錄製的響應"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._fixtures = {}
+        self._positions = {}
+
+    def _path(self, key, url):
+        host = urlsplit(str(url)).netloc.replace(':', '_') or 'upstream'
+        return self.directory / f'{host}_{key}.json'
+
+    def _load(self, key, url):
+        if key not in self._fixtures:
+            path = self._path(key, url)
+            self._fixtures[key] = json.loads(path.read_text(encoding='utf-8')) if path.exists() else None
+        return self._fixtures[key]
+
+    def record(self, method, url, body, status_code, headers, content, latency):
+        key = request_key(method, url, body)
+        try:
+            text, encoding = content.decode('utf-8'), 'text'
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(content).decode('ascii'), 'base64'
+        response = {
+            'status': status_code,
+            'headers': _kept_headers(headers),
+            'body': text,
+            'body_encoding': encoding,
+            'latency': round(latency, 4),
+        }
+        with self._lock:
+            fixture = self._load(key, url) or {
+                'request': {'method': method.upper(), 'url': normalize_url(url)},
+                'responses': [],
+            }
+            fixture['responses'] = (fixture['responses'] + [response])[-MAX_RESPONSES_PER_KEY:]
+            self._fixtures[key] = fixture
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key, url)
+            temporary = path.with_name(f'{path.name}.tmp')
+            temporary.write_text(json.dumps(fixture, ensure_ascii=False, indent=2), encoding='utf-8')
+            os.replace(temporary, path)
+
+    def next_response(self, method, url, body):
+        """按錄製順序輪流返回響應，沒有錄製時返回 None"""
+        key = request_key(method, url, body)
+        with self._lock:
+            fixture = self._load(key, url)
+            if not fixture or not fixture['responses']:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            response = fixture['responses'][position % len(fixture['responses'])]
+        content = response['body'].encode('utf-8')
+        if response.get('body_encoding') == 'base64':
+            content = base64.b64decode(content)
+        return response['status'], response['headers'], content, response.get('latency', 0.0)
+
+
+class LatencyModel:
+    """重放延遲：recorded、none 或 synthetic（對數常態分佈，固定種子）"""
+
+    def __init__(self, mode='recorded', median=0.15, sigma=0.5, seed=0):
+        if mode not in ('recorded', 'none', 'synthetic'):
+            raise ValueError(f'不支持的重放延遲模式: {mode}')
+        self.mode = mode
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, recorded):
+        if self.mode == 'none':
+            return 0.0
+        if self.mode == 'recorded':
+            return recorded
+        with self._lock:
+            return self._random.lognormvariate(0, self.sigma) * self.median
+
+
+def _body_bytes(body):
+    if body is None:
+        return b''
+    return body if isinstance(body, bytes) else str(body).encode()
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests 的 transport adapter：錄製時委派給原有 adapter，重放時不連網"""
+
+    def __init__(self, mode, store, latency, inner=None):
+        super().__init__()
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        body = _body_bytes(request.body)
+        if self.mode == RECORD:
+            started = time.monotonic()
+            response = self.inner.send(request, **kwargs)
+            # 讀取內容後才算完成，與未錄製時 Session 讀取響應的耗時一致
+            content = response.content
+            self.store.record(request.method, request.url, body, response.status_code,
+                              response.headers, content, time.monotonic() - started)
+            return response
+
+        recorded = self.store.next_response(request.method, request.url, body)
+        if recorded is None:
+            logger.warning(f'上游重放：沒有錄製的響應 {request.method} {normalize_url(request.url)}')
+            raise requests.exceptions.ConnectionError('上游重放：沒有錄製的響應', request=request)
+        status_code, headers, content, latency = recorded
+        time.sleep(self.latency.delay(latency))
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.reason = _reason(status_code)
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx 的非同步 transport：錄製時委派給原有 transport，重放時不連網"""
+
+    def __init__(self, mode, store, latency, inner=None):
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self.inner = inner
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        if self.mode == RECORD:
+            started = time.monotonic()
+            response = await self.inner.handle_async_request(request)
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            self.store.record(request.method, request.url, body, response.status_code,
+                              response.headers, response.content, time.monotonic() - started)
+            # aread 已按 content-encoding 解壓，返回時去掉對應的標頭
+            return httpx.Response(response.status_code, headers=_kept_headers(response.headers),
+                                  content=response.content, request=request)
+
+        recorded = self.store.next_response(request.method, request.url, body)
+        if recorded is None:
+            logger.warning(f'上游重放：沒有錄製的響應 {request.method} {normalize_url(request.url)}')
+            raise httpx.ConnectError('上游重放：沒有錄製的響應', request=request)
+        status_code, headers, content, latency = recorded
+        await asyncio.sleep(self.latency.delay(latency))
+        return httpx.Response(status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+def _reason(status_code):
+    try:
+        return HTTPStatus(status_code).phrase
+    except ValueError:
+        return ''
+
+
+_store = None
+_latency = None
+_shared_lock = threading.Lock()
+
+
+def _shared():
+    """進程內共用的錄製檔案與延遲模型（重放順序與隨機延遲在進程內可重現）"""
+    global _store, _latency
+    if _store is None:
+        with _shared_lock:
+            if _store is None:
+                _latency = LatencyModel(
+                    getattr(settings, 'UPSTREAM_REPLAY_LATENCY', 'recorded'),
+                    median=getattr(settings, 'UPSTREAM_REPLAY_LATENCY_MEDIAN', 0.15),
+                    sigma=getattr(settings, 'UPSTREAM_REPLAY_LATENCY_SIGMA', 0.5),
+                    seed=getattr(settings, 'UPSTREAM_REPLAY_SEED', 0),
+                )
+                _store = FixtureStore(getattr(settings, 'UPSTREAM_REPLAY_DIR', 'upstream_fixtures'))
+    return _store, _latency
+
+
+def mount_replay(session):
+    """錄製 / 重放模式下替換 Session 的 adapter（保留原有的連線池與重試設定）"""
+    mode = get_mode()
+    if mode == OFF:
+        return session
+    store, latency = _shared()
+    for prefix in ('https://', 'http://'):
+        inner = session.get_adapter(f'{prefix}replay') if mode == RECORD else None
+        session.mount(prefix, ReplayAdapter(mode, store, latency, inner))
+    logger.info(f'上游請求{"錄製" if mode == RECORD else "重放"}模式: {store.directory}')
+    return session
+
+
+def async_transport(limits):
+    """共用 httpx.AsyncClient 的 transport，未啟用錄製 / 重放時返回 None（httpx 默認）"""
+    mode = get_mode()
+    if mode == OFF:
+        return None
+    store, latency = _shared()
+    inner = httpx.AsyncHTTPTransport(limits=limits) if mode == RECORD else None
+    return ReplayAsyncTransport(mode, store, latency, inner)
@@ -0,0 +1,63 @@
+# backend/apps/jamendo/responses.py
+import time
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .compression import ENCODING_PREFERENCE, choose_encoding
+
+
+def variant_etag(etag, encoding):
+    """壓縮版本的 ETag（不同編碼是不同的表示，ETag 需不同）"""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _base_etag(etag):
+    for encoding in ENCODING_PREFERENCE:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return f'{etag[:-len(suffix)]}"'
+    return etag
+
+
+def etag_matches(request, etag):
+    """檢查 If-None-Match 是否包含當前 ETag（任一編碼版本的 ETag 皆視為相同內容）"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [value.strip() for value in header.split(',')]
+    return any(_base_etag(value.removeprefix('W/')) == etag for value in candidates)
+
+
+def cache_control(entry):
+    """按緩存項剩餘的 soft TTL 生成 Cache-Control"""
+    max_age = max(0, int(entry['soft_expires_at'] - time.time()))
+    return f'public, max-age={max_age}'
+
+
+def cached_json_response(request, entry):
+    """直接以緩存中已編碼的 JSON 作為響應，客戶端 ETag 相同時返回 304
+
+    緩存項帶有預壓縮版本時按 Accept-Encoding 選擇，否則返回未壓縮內容。
+    """
+    variants = entry.get('variants') or {}
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), variants)
+
+    if etag_matches(request, entry['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            variants[encoding] if encoding else entry['body'],
+            content_type='application/json'
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = variant_etag(entry['etag'], encoding)
+    response['Cache-Control'] = cache_control(entry)
+    if variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
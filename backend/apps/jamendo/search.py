@@ -0,0 +1,170 @@
+# backend/apps/jamendo/search.py
+"""
+本地音軌全文搜尋（jamendo_tracks）
+
+- SQLite：FTS5 虛擬表 jamendo_tracks_fts，由觸發器與 jamendo_tracks 同步
+- PostgreSQL：加權 tsvector 表達式上的 GIN 索引
+- 其他資料庫：icontains 查詢（無排序）
+- 按標籤查詢：正規化的 jamendo_tags / jamendo_track_tags 表（索引查詢）
+
+索引與觸發器由 migrations/0002_jamendo_track_search.py 建立。
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import JamendoTag, JamendoTrack, JamendoTrackTag
+
+logger = logging.getLogger(__name__)
+
+# 排名權重：歌名 > 藝人 > 專輯 > 標籤
+SQLITE_FTS_TABLE = 'jamendo_tracks_fts'
+SQLITE_BM25_WEIGHTS = '10.0, 6.0, 4.0, 1.0, 1.0, 1.0'
+
+POSTGRES_TSVECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(artist_name, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(album_name, '')), 'C') || "
+    "setweight(to_tsvector('simple'::regconfig, "
+    "coalesce(musicinfo_tags_genres, '') || ' ' || "
+    "coalesce(musicinfo_tags_instruments, '') || ' ' || "
+    "coalesce(musicinfo_tags_vartags, '')), 'D')"
+)
+
+
+def query_terms(query):
+    """把使用者輸入拆成搜尋詞（去除運算符號，避免注入 FTS 語法）"""
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _search_sqlite(terms, limit):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return list(JamendoTrack.objects.raw(
+        f'SELECT t.* FROM {SQLITE_FTS_TABLE} f '
+        f'JOIN jamendo_tracks t ON t.id = f.rowid '
+        f'WHERE {SQLITE_FTS_TABLE} MATCH %s '
+        f'ORDER BY bm25({SQLITE_FTS_TABLE}, {SQLITE_BM25_WEIGHTS}), t.stats_rate DESC '
+        f'LIMIT %s',
+        [match, limit]
+    ))
+
+
+def _search_postgres(terms, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    return list(JamendoTrack.objects.raw(
+        f'SELECT * FROM jamendo_tracks '
+        f'WHERE ({POSTGRES_TSVECTOR}) @@ to_tsquery(\'simple\', %s) '
+        f'ORDER BY ts_rank(({POSTGRES_TSVECTOR}), to_tsquery(\'simple\', %s)) DESC, stats_rate DESC '
+        f'LIMIT %s',
+        [tsquery, tsquery, limit]
+    ))
+
+
+def _search_fallback(terms, limit):
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(name__icontains=term) | Q(artist_name__icontains=term) |
+            Q(album_name__icontains=term) | Q(musicinfo_tags_genres__icontains=term) |
+            Q(musicinfo_tags_vartags__icontains=term)
+        )
+    return list(JamendoTrack.objects.filter(condition)[:limit])
+
+
+def search_local_tracks(query, limit=20):
+    """在本地 jamendo_tracks 中按相關度搜尋，返回 JamendoTrack 列表"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    vendor = connection.vendor
+    try:
+        if vendor == 'sqlite':
+            return _search_sqlite(terms, limit)
+        if vendor == 'postgresql':
+            return _search_postgres(terms, limit)
+    except Exception as e:
+        # 索引尚未建立（未執行遷移）等情況下退回普通查詢
+        logger.warning(f'本地全文搜尋失敗，改用普通查詢: {str(e)}')
+    return _search_fallback(terms, limit)
+
+
+def local_response(tracks):
+    """把 JamendoTrack 列表轉為 Jamendo 格式的響應數據"""
+    results = [track.to_jamendo_data() for track in tracks]
+    return {
+        'headers': {
+            'status': 'success',
+            'code': 0,
+            'results_count': len(results),
+            'source': 'local',
+        },
+        'results': results,
+    }
+
+
+def local_search_response(query, limit):
+    """本地結果足夠時返回 Jamendo 格式的響應數據，否則返回 None
+
+    settings.JAMENDO_LOCAL_SEARCH_MODE：
+    - 'off'：不使用本地搜尋
+    - 'local_first'：本地結果達到門檻時直接返回，否則請求上游
+    - 'local_only'：只使用本地結果
+    門檻為 limit，可用 JAMENDO_LOCAL_SEARCH_MIN_RESULTS 設置更低的上限。
+    """
+    mode = getattr(settings, 'JAMENDO_LOCAL_SEARCH_MODE', 'off')
+    if mode == 'off':
+        return None
+
+    tracks = search_local_tracks(query, limit)
+    threshold = _local_threshold(limit)
+    if mode != 'local_only' and len(tracks) < threshold:
+        logger.info(f'本地搜尋結果不足 ({len(tracks)}/{threshold})，請求上游: {query}')
+        return None
+
+    return local_response(tracks)
+
+
+def _local_threshold(limit):
+    min_results = getattr(settings, 'JAMENDO_LOCAL_SEARCH_MIN_RESULTS', None)
+    return min(limit, min_results) if min_results else limit
+
+
+def tag_names(tag):
+    """標籤參數（多個標籤以 + 或空格分隔）拆分為正規化的標籤名稱"""
+    return [name for name in (JamendoTag.normalize_name(part) for part in re.split(r'[+\s]+', tag)) if name][:5]
+
+
+def tracks_with_tags(names, limit):
+    """帶有全部指定標籤（不分類型）的本地音軌
+
+    經 jamendo_tags.name 索引與 jamendo_track_tags 的 (tag, track) 索引查出音軌 id，
+    不需解析 JSON 標籤欄位。按評分排序（相同時按 id），結果不受資料庫返回順序影響。
+    """
+    tracks = JamendoTrack.objects.all()
+    for name in names:
+        tracks = tracks.filter(pk__in=JamendoTrackTag.objects.filter(tag__name=name).values('track_id'))
+    return list(tracks.order_by('-stats_rate', 'pk')[:limit])
+
+
+def local_tag_response(tag, limit):
+    """按標籤查詢本地音軌庫，結果足夠時返回 Jamendo 格式的響應數據，否則返回 None
+
+    settings.JAMENDO_LOCAL_TAG_MODE 與 JAMENDO_LOCAL_SEARCH_MODE 相同（off / local_first / local_only），
+    門檻與本地搜尋共用。
+    """
+    mode = getattr(settings, 'JAMENDO_LOCAL_TAG_MODE', 'off')
+    names = tag_names(tag)
+    if mode == 'off' or not names:
+        return None
+
+    tracks = tracks_with_tags(names, limit)
+    threshold = _local_threshold(limit)
+    if mode != 'local_only' and len(tracks) < threshold:
+        logger.info(f'本地標籤音軌不足 ({len(tracks)}/{threshold})，請求上游: {tag}')
+        return None
+
+    return local_response(tracks)
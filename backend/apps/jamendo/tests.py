@@ -0,0 +1,817 @@
+import asyncio
+import json
+import logging
+import threading
+import pickle
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import async_views, cache_backends, cache_codecs, client as client_module, views
+from .async_views import ajamendo_api_request
+from .cache_backends import TieredCache
+from .caching import cached_fetch_entry, entry_data, get_lock_cache, make_entry, should_refresh
+from .circuit import CircuitOpenError
+from .ingestion import upsert_tracks
+from .models import NEVER_REFRESHED, JamendoTrack
+from .quota import CRAWL, FEED, INTERACTIVE, QuotaExceededError, UpstreamQuota, priority
+from .refresher import stale_tracks
+from .search import SQLITE_FTS_TABLE, local_search_response, local_tag_response, tracks_with_tags
+
+# 共享層以 LocMem 作為本地替身
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'jamendo-tests-default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'jamendo-tests-shared'},
+    'jamendo': {
+        'BACKEND': 'apps.jamendo.cache_backends.TieredCache',
+        'OPTIONS': {'SHARED_ALIAS': 'shared', 'CODEC': 'binary'},
+    },
+}
+
+
+def jamendo_track(track_id, name, **fields):
+    return {
+        'id': str(track_id),
+        'name': name,
+        'artist_name': 'Test Artist',
+        'artist_id': '1',
+        'album_name': 'Test Album',
+        'album_id': '2',
+        'duration': 180,
+        'releasedate': '2020-01-01',
+        'audio': 'https://example.com/audio.mp3',
+        'audiodownload': 'https://example.com/download.mp3',
+        'musicinfo': {'tags': {'genres': ['rock'], 'instruments': [], 'vartags': []}},
+        **fields,
+    }
+
+
+@skipUnless(connection.vendor == 'sqlite', '只適用於 SQLite 的 FTS5 索引')
+class TrackSearchIndexTests(TestCase):
+    """遷移到最新版本後，FTS5 觸發器仍與 jamendo_tracks 同步"""
+
+    def test_triggers_exist_after_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertTrue({'jamendo_tracks_fts_ai', 'jamendo_tracks_fts_ad', 'jamendo_tracks_fts_au'} <= triggers)
+
+    def test_upserted_track_matches_fts(self):
+        upsert_tracks([jamendo_track(101, 'Zephyrine Lullaby')])
+        upsert_tracks([jamendo_track(101, 'Quixotic Lullaby')])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', ['quixotic'])
+            self.assertEqual(len(cursor.fetchall()), 1)
+            cursor.execute(f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s', ['zephyrine'])
+            self.assertEqual(cursor.fetchall(), [])
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('integrity-check')")
+
+
+class MemoryInvalidationBus:
+    """測試用的進程內 pub/sub：訊息送給同一 alias 的其他訂閱者（模擬其他 worker）"""
+
+    subscribers = []
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.handler = None
+        self.published = []
+
+    def start(self, handler):
+        if self.handler is None:
+            self.handler = handler
+            self.subscribers.append(self)
+
+    def publish(self, key):
+        self.published.append(key)
+        for bus in self.subscribers:
+            if bus is not self and bus.alias == self.alias:
+                bus.handler(key)
+
+
+def tiered_cache(**options):
+    return TieredCache('', {'OPTIONS': {'SHARED_ALIAS': 'shared', 'CODEC': 'binary', **options}})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    """兩層緩存：L1 淘汰、跨 worker 失效、各層計數與只寫共享層的鍵"""
+
+    def setUp(self):
+        caches['shared'].clear()
+        MemoryInvalidationBus.subscribers = []
+        patcher = mock.patch.dict(cache_backends.INVALIDATION_BUSES, {'memory': MemoryInvalidationBus})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def local_keys(self, cache):
+        return [key.rsplit(':', 1)[-1] for key in cache.local._data]
+
+    def test_l1_evicts_least_recently_used_entry(self):
+        cache = tiered_cache(MAX_ENTRIES=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key.upper())
+        cache.get('a')
+        cache.set('d', 'D')
+
+        self.assertEqual(sorted(self.local_keys(cache)), ['a', 'c', 'd'])
+        self.assertEqual(cache.stats()['l1']['evictions'], 1)
+        # 被淘汰的鍵仍可從共享層讀取並回填 L1
+        self.assertEqual(cache.get('b'), 'B')
+        self.assertEqual(cache.stats()['l2']['hits'], 1)
+
+    def test_l1_evicts_by_size(self):
+        cache = tiered_cache(MAX_ENTRIES=100, MAX_BYTES=300)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'y' * 100)
+        cache.set('c', 'z' * 100)
+
+        self.assertNotIn('a', self.local_keys(cache))
+        self.assertLessEqual(cache.local.size, 300)
+        # 超過上限的值不進入 L1
+        cache.set('big', 'w' * 1000)
+        self.assertNotIn('big', self.local_keys(cache))
+        self.assertEqual(cache.get('big'), 'w' * 1000)
+
+    def test_counters_per_tier(self):
+        cache = tiered_cache()
+        self.assertIsNone(cache.get('missing'))
+        tiered_cache().set('k', {'v': 1})
+        self.assertEqual(cache.get('k'), {'v': 1})
+        self.assertEqual(cache.get('k'), {'v': 1})
+
+        stats = cache.stats()
+        self.assertEqual((stats['l1']['hits'], stats['l1']['misses']), (1, 2))
+        self.assertEqual((stats['l2']['hits'], stats['l2']['misses']), (1, 1))
+        self.assertEqual(stats['l1']['hit_ratio'], round(1 / 3, 4))
+
+    def test_write_invalidates_other_workers_l1(self):
+        worker_a = tiered_cache(INVALIDATION='memory')
+        worker_b = tiered_cache(INVALIDATION='memory')
+        worker_a.set('k', 'v1')
+        self.assertEqual(worker_b.get('k'), 'v1')
+        self.assertIn('k', self.local_keys(worker_b))
+
+        worker_a.set('k', 'v2')
+        self.assertNotIn('k', self.local_keys(worker_b))
+        self.assertEqual(worker_b.get('k'), 'v2')
+
+        worker_a.delete('k')
+        self.assertIsNone(worker_b.get('k'))
+        self.assertEqual(worker_b.stats()['l1']['invalidations'], 2)
+
+    def test_shared_only_keys_skip_l1(self):
+        cache = tiered_cache(INVALIDATION='memory')
+        cache.get('warm')
+        cache.set_many_shared({'e:1': {'id': '1'}, 'e:2': {'id': '2'}})
+
+        self.assertEqual(len(cache.local), 0)
+        self.assertEqual(cache.bus.published, [])
+        self.assertEqual(cache.get_many_shared(['e:1', 'e:2', 'e:3']), {'e:1': {'id': '1'}, 'e:2': {'id': '2'}})
+        self.assertEqual(len(cache.local), 0)
+        # 共享層保存的是編碼後的位元組
+        self.assertIsInstance(caches['shared'].get('e:1'), bytes)
+
+
+class BinaryCodecTests(SimpleTestCase):
+    """共享層的 binary 編碼：版本標記、整數原樣保存、已壓縮的 variants 不再壓縮"""
+
+    def setUp(self):
+        self.codec = cache_codecs.BinaryCodec()
+
+    def test_round_trip_is_tagged_with_magic_and_version(self):
+        value = {'results': [{'id': '1', 'name': 'Track 1'}], 'count': 1}
+        encoded = self.codec.encode(value)
+        self.assertEqual(encoded[:2], b'JC')
+        self.assertEqual(encoded[2], cache_codecs.VERSION)
+        self.assertEqual(self.codec.decode(encoded), value)
+
+    def test_newer_version_is_rejected(self):
+        encoded = self.codec.encode({'id': '1'})
+        with self.assertRaises(cache_codecs.CodecError):
+            self.codec.decode(encoded[:2] + bytes((cache_codecs.VERSION + 1,)) + encoded[3:])
+
+    def test_version_one_values_still_decode(self):
+        body = zlib.compress(pickle.dumps({'id': '1'}))
+        stored = b'JC' + bytes((1, cache_codecs.FLAG_ZLIB)) + body
+        self.assertEqual(self.codec.decode(stored), {'id': '1'})
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_integers_pass_through_for_incr(self):
+        self.assertEqual(self.codec.encode(5), 5)
+        self.assertEqual(self.codec.decode(5), 5)
+        caches['shared'].clear()
+        cache = tiered_cache()
+        cache.set('counter', 5)
+        self.assertEqual(caches['shared'].get('counter'), 5)
+        self.assertEqual(cache.incr('counter'), 6)
+        self.assertEqual(cache.get('counter'), 6)
+
+    def test_entry_variants_are_stored_without_zlib(self):
+        entry = make_entry(upstream_payload(*range(1, 101)), 3600)
+        self.assertTrue(entry['variants'])
+        encoded = self.codec.encode(entry)
+
+        flags = encoded[3]
+        self.assertTrue(flags & cache_codecs.FLAG_ZLIB)
+        self.assertTrue(flags & cache_codecs.FLAG_VARIANTS)
+        for variant in entry['variants'].values():
+            self.assertIn(variant, encoded)
+        self.assertLess(len(encoded), len(entry['body']))
+        self.assertEqual(self.codec.decode(encoded), entry)
+
+    def test_entry_without_variants_has_no_variants_section(self):
+        entry = make_entry(upstream_payload(1), 3600, compress=False)
+        encoded = self.codec.encode(entry)
+        self.assertFalse(encoded[3] & cache_codecs.FLAG_VARIANTS)
+        self.assertEqual(self.codec.decode(encoded), entry)
+
+
+def upstream_payload(*track_ids):
+    return {
+        'headers': {'status': 'success', 'code': 0, 'results_count': len(track_ids)},
+        'results': [jamendo_track(track_id, f'Track {track_id}') for track_id in track_ids],
+    }
+
+
+def upstream_response(payload=None, status_code=200, delay=0):
+    """requests.Session.get 的替身響應"""
+    def get(*args, **kwargs):
+        time.sleep(delay)
+        response = mock.Mock(status_code=status_code, text='')
+        response.json.return_value = payload if payload is not None else upstream_payload(1, 2, 3)
+        return response
+    return get
+
+
+def aupstream_response(payload=None, status_code=200, delay=0):
+    """httpx.AsyncClient.get 的替身響應"""
+    async def get(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return httpx.Response(status_code, json=payload if payload is not None else upstream_payload(1, 2, 3))
+    return get
+
+
+upstream_settings = override_settings(
+    CACHES=TEST_CACHES,
+    JAMENDO_CACHE_ALIAS='jamendo',
+    JAMENDO_INGEST_ENABLED=False,
+    JAMENDO_CACHE_EARLY_REFRESH_BETA=0,
+    JAMENDO_QUOTA_LIMIT=0,
+    JAMENDO_HEDGE_ENABLED=False,
+    UPSTREAM_REPLAY_MODE='off',
+)
+
+
+class UpstreamMixin:
+    """以替身取代 Jamendo 上游，每個測試使用新的客戶端（斷路器、配額）與空緩存"""
+
+    def setUp(self):
+        caches['jamendo'].clear()
+        patcher = mock.patch.object(client_module, '_client', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # 上游請求與故障日誌不輸出到測試結果
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+
+@upstream_settings
+class UpstreamTestCase(UpstreamMixin, SimpleTestCase):
+    pass
+
+
+class SingleFlightTests(UpstreamTestCase):
+    """緩存未命中時，同一緩存鍵的並發請求只向上游請求一次"""
+
+    params = {'order': 'popularity_total', 'limit': 3}
+
+    def test_concurrent_threads_share_one_upstream_call(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(delay=0.2)) as get:
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                futures = [
+                    executor.submit(views.jamendo_api_request, 'tracks', self.params, cache_profile='popular')
+                    for _ in range(10)
+                ]
+                results = [future.result() for future in futures]
+
+        self.assertEqual(get.call_count, 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(len(results[0]['results']), 3)
+
+    async def test_concurrent_coroutines_share_one_upstream_call(self):
+        with mock.patch.object(httpx.AsyncClient, 'get', side_effect=aupstream_response(delay=0.2)) as get:
+            results = await asyncio.gather(*[
+                ajamendo_api_request('tracks', self.params, cache_profile='popular') for _ in range(10)
+            ])
+
+        self.assertEqual(get.call_count, 1)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_waits_for_other_worker_holding_the_shared_lock(self):
+        cache_key = 'jamendo_single_flight_test'
+        get_lock_cache().add(f'{cache_key}:lock', 'other-worker', 15)
+        entry = make_entry({'results': [{'id': '1'}]}, 3600)
+
+        # 模擬另一個 worker 稍後寫入緩存
+        writer = threading.Timer(0.1, lambda: caches['jamendo'].set(cache_key, entry, 3600))
+        writer.start()
+        loader = mock.Mock(return_value={'results': []})
+        try:
+            result = cached_fetch_entry(cache_key, loader, profile='popular')
+        finally:
+            writer.join()
+
+        loader.assert_not_called()
+        self.assertEqual(entry_data(result), {'results': [{'id': '1'}]})
+
+
+def run_inline(fn, *args, priority=None, **kwargs):
+    """background.submit 的替身：在當前線程立即執行"""
+    return fn(*args, **kwargs)
+
+
+class AsyncCacheAccessTests(UpstreamTestCase):
+    """非同步路徑的緩存操作在線程池中執行，不排隊在 thread_sensitive 的主線程上"""
+
+    async def test_cache_calls_run_off_the_main_thread(self):
+        main_thread = await sync_to_async(threading.get_ident)()
+        cache_threads = set()
+
+        def record(method):
+            def call(*args, **kwargs):
+                cache_threads.add(threading.get_ident())
+                return method(*args, **kwargs)
+            return call
+
+        cache = caches['jamendo']
+        with mock.patch.object(cache, 'get', record(cache.get)), \
+                mock.patch.object(cache, 'set', record(cache.set)), \
+                mock.patch.object(httpx.AsyncClient, 'get', side_effect=aupstream_response()):
+            await ajamendo_api_request('tracks', {'order': 'popularity_total', 'limit': 3}, cache_profile='popular')
+            await ajamendo_api_request('tracks', {'order': 'popularity_total', 'limit': 3}, cache_profile='popular')
+
+        self.assertTrue(cache_threads)
+        self.assertNotIn(main_thread, cache_threads)
+
+class LimitTests(UpstreamTestCase):
+    """limit 限制在 1..maximum，較小的 limit 由分桶緩存項切片返回"""
+
+    def popular(self, limit):
+        response = views.popular_tracks(RequestFactory().get('/api/jamendo/tracks/popular/', {'limit': limit}))
+        return [track['id'] for track in json.loads(response.content)['results']]
+
+    def test_limit_is_clamped(self):
+        for value, expected in [('-5', 1), ('0', 1), ('500', 200)]:
+            request = RequestFactory().get('/api/jamendo/tracks/popular/', {'limit': value})
+            self.assertEqual(views.parse_limit(request), expected)
+
+    def test_non_positive_limit_returns_one_track(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(upstream_payload(*range(1, 51)))):
+            self.assertEqual(self.popular(-5), ['1'])
+            self.assertEqual(self.popular(0), ['1'])
+
+    def test_smaller_limit_is_served_from_the_bucket_entry(self):
+        with mock.patch.object(
+            requests.Session, 'get', side_effect=upstream_response(upstream_payload(*range(1, 51)))
+        ) as get:
+            self.assertEqual(len(self.popular(50)), 50)
+            self.assertEqual(self.popular(20), [str(track_id) for track_id in range(1, 21)])
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['params']['limit'], 50)
+
+
+class BatchSectionsTests(UpstreamTestCase):
+    """首頁批次端點：一次請求返回多個區塊，每個區塊各自帶有 status"""
+
+    def batch(self, sections):
+        request = RequestFactory().post(
+            '/api/jamendo/batch/', json.dumps({'sections': sections}), content_type='application/json'
+        )
+        return {section['id']: section for section in json.loads(views.batch_sections(request).content)['sections']}
+
+    def test_sections_are_served_in_one_request(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(upstream_payload(*range(1, 51)))):
+            sections = self.batch([
+                {'id': 'popular', 'type': 'popular', 'limit': 30},
+                {'id': 'genre_0', 'type': 'tag', 'tag': 'jazz', 'limit': 15},
+                {'id': 'broken', 'type': 'tag'},
+            ])
+        self.assertEqual((sections['popular']['status'], sections['popular']['count']), ('ok', 30))
+        self.assertEqual((sections['genre_0']['status'], sections['genre_0']['count']), ('ok', 15))
+        self.assertEqual(sections['broken']['status'], 'invalid')
+
+    def test_section_limit_is_clamped(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(upstream_payload(*range(1, 51)))):
+            sections = self.batch([{'id': 'popular', 'type': 'popular', 'limit': -5}])
+        self.assertEqual(sections['popular']['count'], 1)
+
+@override_settings(JAMENDO_CACHE_TTLS={'popular': {'soft': 100, 'hard': 300}}, JAMENDO_CACHE_SWR_ENABLED=True)
+class StaleWhileRevalidateTests(UpstreamTestCase):
+    """凍結時鐘下的 soft / hard TTL 與 XFetch 提前刷新"""
+
+    cache_key = 'jamendo_swr_test'
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1_000_000.0
+        clock = mock.patch('time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        submit = mock.patch('apps.jamendo.caching.background.submit', side_effect=run_inline)
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+        self.loader = mock.Mock(side_effect=[{'version': 1}, {'version': 2}])
+
+    def fetch(self):
+        return entry_data(cached_fetch_entry(self.cache_key, self.loader, profile='popular'))
+
+    def test_fresh_entry_is_served_without_refresh(self):
+        self.assertEqual(self.fetch(), {'version': 1})
+        self.now += 99
+        self.assertEqual(self.fetch(), {'version': 1})
+        self.assertEqual(self.loader.call_count, 1)
+        self.submit.assert_not_called()
+
+    def test_stale_entry_is_served_then_refreshed_in_background(self):
+        self.fetch()
+        self.now += 101
+        # 超過 soft TTL：仍返回舊數據，刷新交給背景任務
+        self.assertEqual(self.fetch(), {'version': 1})
+        self.assertEqual(self.submit.call_count, 1)
+        self.assertEqual(self.loader.call_count, 2)
+        self.assertEqual(self.fetch(), {'version': 2})
+
+    def test_hard_expired_entry_is_fetched_synchronously(self):
+        self.fetch()
+        self.now += 301
+        # 清除 L1（按 monotonic 時鐘過期），模擬另一個 worker 讀取共享層
+        caches['jamendo'].local.clear()
+        self.assertEqual(self.fetch(), {'version': 2})
+        self.submit.assert_not_called()
+
+    def test_xfetch_refreshes_early_with_probability(self):
+        entry = {'soft_expires_at': self.now + 5, 'delta': 1.0}
+        with override_settings(JAMENDO_CACHE_EARLY_REFRESH_BETA=1.0):
+            # -delta * beta * ln(r) >= 5 需要 r <= e^-5
+            with mock.patch('random.random', return_value=0.001):
+                self.assertTrue(should_refresh(entry, self.now))
+            with mock.patch('random.random', return_value=0.5):
+                self.assertFalse(should_refresh(entry, self.now))
+            self.assertFalse(should_refresh({**entry, 'delta': 0}, self.now))
+        with override_settings(JAMENDO_CACHE_EARLY_REFRESH_BETA=0), mock.patch('random.random', return_value=0.001):
+            self.assertFalse(should_refresh(entry, self.now))
+        self.assertTrue(should_refresh(entry, self.now + 5))
+
+
+@override_settings(JAMENDO_CIRCUIT_FAILURE_THRESHOLD=3, JAMENDO_CIRCUIT_RESET_TIMEOUT=30, JAMENDO_NEGATIVE_CACHE_TTL=30)
+class UpstreamFailureTests(UpstreamTestCase):
+    """斷路器、失敗緩存與最後成功數據的回退"""
+
+    params = {'order': 'popularity_total', 'limit': 3}
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        client = client_module.get_client()
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(status_code=503)) as get:
+            for _ in range(3):
+                self.assertEqual(client.get('tracks', self.params).status_code, 503)
+            with self.assertRaises(CircuitOpenError):
+                client.get('tracks', self.params)
+
+        self.assertEqual(get.call_count, 3)
+        self.assertTrue(client.breaker.is_open)
+        self.assertEqual(client.breaker.snapshot()['rejected'], 1)
+
+    def test_client_errors_do_not_open_breaker(self):
+        client = client_module.get_client()
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(status_code=404)):
+            for _ in range(5):
+                client.get('tracks', self.params)
+        self.assertFalse(client.breaker.is_open)
+
+    def test_last_known_good_is_served_when_upstream_fails(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(upstream_payload(7))):
+            fresh = views.jamendo_api_request('tracks', self.params, cache_profile='popular')
+        # 緩存項超過 hard TTL
+        caches['jamendo'].delete(views.get_cache_key('tracks', self.params))
+
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(status_code=503)) as get:
+            self.assertEqual(views.jamendo_api_request('tracks', self.params, cache_profile='popular'), fresh)
+            # 失敗緩存期間不再請求上游
+            self.assertEqual(views.jamendo_api_request('tracks', self.params, cache_profile='popular'), fresh)
+        self.assertEqual(get.call_count, 1)
+
+    def test_last_known_good_is_not_kept_for_search(self):
+        params = {'search': 'lullaby', 'limit': 3}
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response()):
+            views.jamendo_api_request('tracks', params, cache_profile='search')
+        caches['jamendo'].delete(views.get_cache_key('tracks', params))
+
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(status_code=503)):
+            self.assertIsNone(views.jamendo_api_request('tracks', params, cache_profile='search'))
+
+    def test_open_breaker_serves_last_known_good_and_fails_health_check(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response(upstream_payload(7))):
+            fresh = views.jamendo_api_request('tracks', self.params, cache_profile='popular')
+        caches['jamendo'].delete(views.get_cache_key('tracks', self.params))
+
+        client = client_module.get_client()
+        for _ in range(3):
+            client.breaker.record_failure()
+        with mock.patch.object(requests.Session, 'get') as get:
+            self.assertEqual(views.jamendo_api_request('tracks', self.params, cache_profile='popular'), fresh)
+            response = views.health_check(RequestFactory().get('/api/jamendo/health/'))
+        get.assert_not_called()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content)['jamendo_api'], 'circuit_open')
+
+
+class UpstreamQuotaTests(UpstreamTestCase):
+    """固定窗口配額：低優先級只能使用窗口額度的一部分，其餘留給用戶請求"""
+
+    def setUp(self):
+        super().setUp()
+        caches['shared'].clear()
+        self.quota = UpstreamQuota('quota-test', limit=10, window=60, max_wait={CRAWL: 0.0})
+        # 固定在窗口中間，額度用完時不等待下一個窗口
+        patcher = mock.patch('time.time', return_value=6030.0)
+        self.now = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_crawl_share_is_exhausted_while_interactive_still_succeeds(self):
+        for _ in range(4):
+            self.quota.acquire(CRAWL)
+        with self.assertRaises(QuotaExceededError):
+            self.quota.acquire(CRAWL)
+        self.assertFalse(self.quota.try_acquire(CRAWL))
+
+        for _ in range(6):
+            self.quota.acquire(INTERACTIVE)
+        with self.assertRaises(QuotaExceededError):
+            self.quota.acquire(INTERACTIVE)
+        self.assertEqual(self.quota.counters[CRAWL], {'granted': 4, 'delayed': 0, 'dropped': 1})
+        self.assertEqual(self.quota.counters[INTERACTIVE], {'granted': 6, 'delayed': 0, 'dropped': 1})
+
+    def test_count_resets_at_the_next_window(self):
+        for _ in range(4):
+            self.quota.acquire(CRAWL)
+        self.assertEqual(self.quota.remaining(CRAWL), 0)
+        self.now.return_value = 6060.0
+        self.assertEqual(self.quota.remaining(CRAWL), 4)
+        self.quota.acquire(CRAWL)
+
+class CircuitProbeQuotaTests(UpstreamTestCase):
+    """斷路器恢復探測計入上游配額"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = client_module.get_client()
+        self.client.quota = UpstreamQuota('probe-test', limit=2, window=60)
+
+    def test_probe_counts_against_the_quota(self):
+        with priority(FEED), mock.patch.object(requests.Session, 'get', side_effect=upstream_response()) as get:
+            self.assertTrue(self.client._probe())
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(self.client.quota.counters[FEED]['granted'], 1)
+
+    def test_probe_is_skipped_when_quota_is_exhausted(self):
+        with priority(FEED):
+            self.assertTrue(self.client.quota.try_acquire())
+            with mock.patch.object(requests.Session, 'get') as get:
+                self.assertFalse(self.client._probe())
+        get.assert_not_called()
+
+
+@skipUnless(connection.vendor == 'sqlite', '只適用於 SQLite 的 FTS5 索引')
+@upstream_settings
+class LocalSearchTests(UpstreamMixin, TestCase):
+    """本地搜尋：默認關閉、結果不足時請求上游、按 bm25 權重排序"""
+
+    def setUp(self):
+        super().setUp()
+        upsert_tracks([
+            jamendo_track(1, 'Quiet Evening', album_name='Aurora Sessions'),
+            jamendo_track(2, 'Aurora', artist_name='Night Owls'),
+            jamendo_track(3, 'Morning Light', artist_name='Aurora Band'),
+            jamendo_track(4, 'Unrelated Song'),
+        ])
+
+    def search(self, query, limit=3):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response()) as get:
+            response = views.search_tracks(RequestFactory().get('/api/jamendo/search/', {'q': query, 'limit': limit}))
+        return json.loads(response.content), get.call_count
+
+    def test_local_search_is_off_by_default(self):
+        self.assertIsNone(local_search_response('aurora', 3))
+        data, upstream_calls = self.search('aurora')
+        self.assertEqual(upstream_calls, 1)
+        self.assertNotEqual(data['headers'].get('source'), 'local')
+
+    @override_settings(JAMENDO_LOCAL_SEARCH_MODE='local_first')
+    def test_results_are_ranked_by_field_weight(self):
+        data, upstream_calls = self.search('aurora')
+        self.assertEqual(upstream_calls, 0)
+        self.assertEqual(data['headers']['source'], 'local')
+        # 歌名 > 藝人 > 專輯
+        self.assertEqual([track['id'] for track in data['results']], ['2', '3', '1'])
+
+    @override_settings(JAMENDO_LOCAL_SEARCH_MODE='local_first')
+    def test_too_few_local_results_fall_back_to_upstream(self):
+        data, upstream_calls = self.search('aurora', limit=5)
+        self.assertEqual(upstream_calls, 1)
+        self.assertEqual(len(data['results']), 3)
+        self.assertNotEqual(data['headers'].get('source'), 'local')
+
+    @override_settings(JAMENDO_LOCAL_SEARCH_MODE='local_first', JAMENDO_LOCAL_SEARCH_MIN_RESULTS=2)
+    def test_min_results_lowers_the_threshold(self):
+        self.assertEqual(len(local_search_response('aurora', 5)['results']), 3)
+        self.assertIsNone(local_search_response('morning', 5))
+
+    @override_settings(JAMENDO_LOCAL_SEARCH_MODE='local_only')
+    def test_local_only_never_requests_upstream(self):
+        data, upstream_calls = self.search('morning', limit=5)
+        self.assertEqual(upstream_calls, 0)
+        self.assertEqual([track['id'] for track in data['results']], ['3'])
+
+
+def rated_track(track_id, rate, genres):
+    return jamendo_track(
+        track_id, f'Track {track_id}',
+        musicinfo={'tags': {'genres': genres, 'instruments': [], 'vartags': []}},
+        stats={'rate': rate, 'downloads_total': 0, 'playlisted': 0},
+    )
+
+
+@skipUnless(connection.vendor == 'sqlite', '查詢計劃檢查只適用於 SQLite')
+@upstream_settings
+class LocalTagTests(UpstreamMixin, TestCase):
+    """按標籤查詢本地音軌：默認關閉、經標籤索引查詢、按評分排序"""
+
+    def setUp(self):
+        super().setUp()
+        upsert_tracks([
+            rated_track(1, 2.0, ['rock']),
+            rated_track(2, 9.0, ['rock']),
+            rated_track(3, 5.0, ['rock', 'jazz']),
+            rated_track(4, 7.0, ['jazz']),
+            rated_track(5, 5.0, ['rock']),
+        ])
+
+    def ids(self, data):
+        return [track['id'] for track in data['results']]
+
+    def test_local_tag_mode_is_off_by_default(self):
+        self.assertIsNone(local_tag_response('rock', 3))
+
+    def test_tracks_are_ordered_by_rating_then_id(self):
+        self.assertEqual([track.jamendo_id for track in tracks_with_tags(['rock'], 10)], [2, 3, 5, 1])
+        self.assertEqual([track.jamendo_id for track in tracks_with_tags(['rock', 'jazz'], 10)], [3])
+
+    def test_query_uses_tag_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            tracks_with_tags(['rock'], 3)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {queries[-1]["sql"]}')
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        self.assertNotIn('SCAN jamendo_tracks', plan)
+        self.assertRegex(plan, r'SEARCH \w+ USING (COVERING )?INDEX jamendo_track_tags')
+
+    @override_settings(JAMENDO_LOCAL_TAG_MODE='local_first')
+    def test_tracks_by_tag_serves_local_results_in_order(self):
+        with mock.patch.object(requests.Session, 'get', side_effect=upstream_response()) as get:
+            response = views.tracks_by_tag(RequestFactory().get('/api/jamendo/tracks/tag/', {'tag': 'rock', 'limit': 3}))
+        get.assert_not_called()
+        self.assertEqual(self.ids(json.loads(response.content)), ['2', '3', '5'])
+
+
+class StaleTracksTests(TestCase):
+    """背景刷新按 refreshed_at 索引順序取出最久未刷新的音軌"""
+
+    def setUp(self):
+        upsert_tracks([jamendo_track(track_id, f'Track {track_id}') for track_id in (1, 2, 3, 4)])
+        now = timezone.now()
+        JamendoTrack.objects.filter(jamendo_id=2).update(refreshed_at=now - timedelta(days=3))
+        JamendoTrack.objects.filter(jamendo_id=3).update(refreshed_at=now - timedelta(days=2))
+        JamendoTrack.objects.filter(jamendo_id=4).update(refreshed_at=now)
+
+    def test_never_refreshed_tracks_come_first_then_oldest(self):
+        self.assertEqual(JamendoTrack.objects.get(jamendo_id=1).refreshed_at, NEVER_REFRESHED)
+        self.assertEqual([track.jamendo_id for track in stale_tracks(10, 86400)], [1, 2, 3])
+        self.assertEqual([track.jamendo_id for track in stale_tracks(2, 86400)], [1, 2])
+
+    @skipUnless(connection.vendor == 'sqlite', '查詢計劃檢查只適用於 SQLite')
+    def test_query_walks_the_refreshed_at_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            stale_tracks(10, 86400)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {queries[-1]["sql"]}')
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('jamendo_tra_refresh_99da4a_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ConcurrentTrackWritesTests(TransactionTestCase):
+    """背景線程同時寫入音軌時依次執行，不出現 database table is locked"""
+
+    def test_concurrent_upserts_do_not_lock(self):
+        def write(base):
+            try:
+                for round_ in range(10):
+                    upsert_tracks([jamendo_track(base + offset, f'Track {round_}') for offset in range(30)])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(write, worker * 1000) for worker in range(4)]:
+                future.result()
+        self.assertEqual(JamendoTrack.objects.count(), 120)
+
+class ShiftingUpstream:
+    """每次請求前在排行最前面插入一首新音軌，模擬翻頁期間上游排序的變化"""
+
+    def __init__(self, size=500):
+        self.ranking = [str(track_id) for track_id in range(1, size + 1)]
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        self.ranking.insert(0, str(10000 + self.calls))
+        offset, limit = params.get('offset', 0), params['limit']
+        track_ids = self.ranking[offset:offset + limit]
+        return upstream_response(upstream_payload(*track_ids))()
+
+
+@override_settings(JAMENDO_CURSOR_WINDOW=50)
+class CursorPaginationTests(UpstreamTestCase):
+    """同一游標鏈的頁面不重複、不隨上游變化"""
+
+    def setUp(self):
+        super().setUp()
+        self.upstream = ShiftingUpstream()
+        for patcher in (
+            mock.patch.object(requests.Session, 'get', side_effect=self.upstream.get),
+            mock.patch('apps.jamendo.background.submit', side_effect=run_inline),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def page(self, **params):
+        response = views.popular_tracks(RequestFactory().get('/api/jamendo/tracks/popular/', params))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def ids(self, data):
+        return [track['id'] for track in data['results']]
+
+    def test_cursor_chain_pages_do_not_overlap(self):
+        pages = [self.page(offset=0, limit=20)]
+        while len(pages) < 6:
+            pages.append(self.page(cursor=pages[-1]['pagination']['next_cursor']))
+
+        served = [track_id for data in pages for track_id in self.ids(data)]
+        self.assertEqual(len(served), 120)
+        self.assertEqual(len(set(served)), 120)
+        # 上游在翻頁期間變化了多次
+        self.assertGreater(self.upstream.calls, 2)
+
+    def test_revisited_page_is_unchanged(self):
+        first = self.page(offset=0, limit=20)
+        cursor = first['pagination']['next_cursor']
+        second = self.page(cursor=cursor)
+        for _ in range(4):
+            self.page(cursor=self.page(cursor=cursor)['pagination']['next_cursor'])
+        self.assertEqual(self.ids(self.page(cursor=cursor)), self.ids(second))
+
+    def test_new_chain_gets_its_own_snapshot(self):
+        first = self.page(offset=0, limit=20)
+        calls = self.upstream.calls
+        again = self.page(offset=0, limit=20)
+        self.assertGreater(self.upstream.calls, calls)
+        self.assertNotEqual(self.ids(first), self.ids(again))
+
+    def test_expired_cursor_is_rejected(self):
+        cursor = self.page(offset=0, limit=20)['pagination']['next_cursor']
+        with mock.patch('time.time', return_value=time.time() + 7200):
+            response = views.popular_tracks(RequestFactory().get('/api/jamendo/tracks/popular/', {'cursor': cursor}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_view_pages_from_the_same_snapshot(self):
+        request = RequestFactory().get('/api/jamendo/tracks/popular/', {'offset': 0, 'limit': 20})
+        first = json.loads((await async_views.popular_tracks(request)).content)
+        request = RequestFactory().get('/api/jamendo/tracks/popular/', {'cursor': first['pagination']['next_cursor']})
+        second = json.loads((await async_views.popular_tracks(request)).content)
+
+        self.assertEqual(len(self.ids(second)), 20)
+        self.assertFalse(set(self.ids(first)) & set(self.ids(second)))
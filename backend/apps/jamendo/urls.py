@@ -1,22 +1,33 @@
 # backend/apps/jamendo/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI 部署模式下，上游相關端點使用非同步版本
+if getattr(settings, 'ASYNC_UPSTREAM_VIEWS', False):
+    from . import async_views as upstream_views
+else:
+    upstream_views = views
+
 urlpatterns = [
     # 基本端點
     path('config/', views.get_jamendo_config, name='jamendo-config'),
-    path('health/', views.health_check, name='jamendo-health'),
+    path('health/', upstream_views.health_check, name='jamendo-health'),
+    path('cache/stats/', views.cache_stats, name='jamendo-cache-stats'),
     
     # API 代理端點（如果需要）
     path('proxy/', views.jamendo_api_proxy, name='jamendo-proxy'),
     
     # 專用端點
-    path('search/', views.search_tracks, name='jamendo-search'),
-    path('tracks/tag/', views.tracks_by_tag, name='jamendo-tracks-by-tag'),
-    path('tracks/popular/', views.popular_tracks, name='jamendo-popular'),
-    path('tracks/latest/', views.latest_tracks, name='jamendo-latest'),
-    path('tracks/random/', views.random_tracks, name='jamendo-random'),
-    path('tracks/<int:track_id>/', views.get_track_detail, name='jamendo-track-detail'),
+    path('search/', upstream_views.search_tracks, name='jamendo-search'),
+    path('search/all/', upstream_views.search_all, name='jamendo-search-all'),
+    path('tracks/tag/', upstream_views.tracks_by_tag, name='jamendo-tracks-by-tag'),
+    path('tracks/popular/', upstream_views.popular_tracks, name='jamendo-popular'),
+    path('tracks/latest/', upstream_views.latest_tracks, name='jamendo-latest'),
+    path('tracks/random/', upstream_views.random_tracks, name='jamendo-random'),
+    path('tracks/details/', upstream_views.get_track_details, name='jamendo-track-details'),
+    path('tracks/<int:track_id>/', upstream_views.get_track_detail, name='jamendo-track-detail'),
+    path('batch/', upstream_views.batch_sections, name='jamendo-batch'),
     
     # 新增端點
     path('tags/', views.get_available_tags, name='jamendo-tags'),
@@ -4,83 +4,143 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from django.core.cache import cache
 import json
 import logging
 import hashlib
 
+from concurrent.futures import ThreadPoolExecutor
+
+from .caching import (
+    cached_fetch, cached_fetch_entry, derived_entry, entry_data, get_cache, get_cached_many,
+    get_ttls, make_entry, pinned_entry, schedule_prefetch,
+)
+from .responses import cached_json_response
+from .entities import MISSING, cache_missing, get_cached_tracks, schedule_cache_tracks
+from .client import JAMENDO_API_BASE, CircuitOpenError, QuotaExceededError, get_client
+from .ingestion import schedule_ingest
+from .multi_search import ENTITY_SEARCHES, combine_search_results, entity_search_params
+from .pagination import add_pagination, cursor_ttl, next_page, page_key_params, parse_page, snapshot_page
+from .projection import parse_fields, parse_request_fields, project_tracks, projected
+from .random_pool import draw_random_tracks, get_pool, merge_random_tracks, pool_response
+from .search import local_response, local_search_response, local_tag_response, search_local_tracks
+
 logger = logging.getLogger(__name__)
 
-# Jamendo API 配置
-JAMENDO_API_BASE = 'https://api.jamendo.com/v3.0'
 JAMENDO_CLIENT_ID = getattr(settings, 'JAMENDO_CLIENT_ID', '')
 
-def get_jamendo_headers():
-    """獲取 Jamendo API 請求標頭"""
+# Jamendo API 官方推薦的曲風標籤（前端首頁逐一請求，緩存預熱也以此為準）
+# 來源：https://developer.jamendo.com/v3.0/tracks
+JAMENDO_FEATURED_GENRES = [
+    'pop',        # 流行音樂 - 最受歡迎的主流音樂
+    'rock',       # 搖滾音樂 - 經典搖滾風格
+    'electronic', # 電子音樂 - 電子合成器音樂
+    'jazz',       # 爵士音樂 - 爵士樂風格
+    'classical',  # 古典音樂 - 古典樂曲
+    'hiphop',     # 嘻哈音樂 - 說唱和節拍音樂
+    'metal',      # 金屬音樂 - 重金屬音樂
+    'world',      # 世界音樂 - 各國民族音樂
+    'soundtrack', # 配樂音樂 - 電影配樂等
+    'lounge'      # 休閒音樂 - 輕鬆氛圍音樂
+]
+
+def get_cache_key(endpoint, params, fields=None):
+    """生成緩存鍵（投影的欄位也是鍵的一部分）"""
+    cache_string = f"{endpoint}_{json.dumps(sorted(params.items()))}"
+    if fields is not None:
+        cache_string += f"_fields={','.join(fields)}"
+    return f"jamendo_{hashlib.md5(cache_string.encode()).hexdigest()}"
+
+# 列表端點的篩選參數，鍵同時是 settings.JAMENDO_CACHE_TTLS 中的緩存配置名
+FEED_FILTERS = {
+    'search': lambda value: {'search': value},
+    'tag': lambda value: {'tags': value},
+    'popular': lambda value: {'order': 'popularity_total'},
+    'latest': lambda value: {'order': 'releasedate_desc'},
+    'random': lambda value: {'order': 'random'},
+}
+
+def feed_params(feed, limit, value=None):
+    """生成列表端點的 Jamendo 請求參數"""
     return {
-        'User-Agent': 'DDM360-Music-Streaming/1.0',
-        'Accept': 'application/json',
+        **FEED_FILTERS[feed](value),
+        'include': 'musicinfo',
+        'audioformat': 'mp32',
+        'limit': limit
     }
 
-def get_cache_key(endpoint, params):
-    """生成緩存鍵"""
-    cache_string = f"{endpoint}_{json.dumps(sorted(params.items()))}"
-    return hashlib.md5(cache_string.encode()).hexdigest()
+def detail_params(track_id):
+    """生成音軌詳情的 Jamendo 請求參數"""
+    return {
+        'id': track_id,
+        'include': 'musicinfo+stats+lyrics',
+        'audioformat': 'mp32'
+    }
 
-def jamendo_api_request(endpoint, params, cache_timeout=3600):
-    """統一的 Jamendo API 請求函數，帶緩存"""
-    # 生成緩存鍵
-    cache_key = get_cache_key(endpoint, params)
-    
-    # 嘗試從緩存獲取
-    cached_data = cache.get(f"jamendo_{cache_key}")
-    if cached_data:
-        logger.info(f'從緩存返回數據: {endpoint}')
-        return cached_data
-    
-    # 添加必要的參數
-    final_params = {
-        'client_id': JAMENDO_CLIENT_ID,
-        'format': 'json',
-        **params
+def multi_detail_params(track_ids):
+    """生成多首音軌的 Jamendo 請求參數（id 以空格分隔，一次請求）"""
+    return {
+        'id': ' '.join(track_ids),
+        'include': 'musicinfo',
+        'audioformat': 'mp32',
+        'limit': len(track_ids)
     }
-    
-    url = f'{JAMENDO_API_BASE}/{endpoint.lstrip("/")}'
+
+DETAILS_MAX_IDS = 200
+
+def parse_track_ids(request):
+    """解析 ids 參數（逗號分隔，去除重複並保持順序）"""
+    track_ids = list(dict.fromkeys(
+        track_id.strip() for track_id in request.GET.get('ids', '').split(',') if track_id.strip()
+    ))
+    if not track_ids:
+        raise ValueError('缺少 ids 參數')
+    if not all(track_id.isdigit() for track_id in track_ids):
+        raise ValueError('ids 參數無效')
+    if len(track_ids) > DETAILS_MAX_IDS:
+        raise ValueError(f'ids 最多 {DETAILS_MAX_IDS} 個')
+    return track_ids
+
+def parse_limit(request, default=20, maximum=200):
+    """解析 limit 參數，限制在 1..maximum 之間（0 或負數不能用於切片分桶結果）"""
+    return max(1, min(int(request.GET.get('limit', default)), maximum))
+
+def normalize_tracks(data):
+    """數據後處理：確保所有曲目都有必要字段"""
+    for track in data.get('results', []):
+        # 確保圖片字段
+        if not track.get('image') and track.get('album_image'):
+            track['image'] = track['album_image']
+        
+        # 確保時長字段
+        if not track.get('duration'):
+            track['duration'] = 180  # 默認3分鐘
+        
+        # 格式化藝人信息
+        if not track.get('artist_name'):
+            track['artist_name'] = 'Unknown Artist'
+        
+        # 格式化專輯信息
+        if not track.get('album_name'):
+            track['album_name'] = 'Unknown Album'
+    return data
+
+def fetch_from_jamendo(endpoint, params):
+    """向 Jamendo 上游請求數據（不經過緩存），失敗時返回 None"""
+    client = get_client()
     
     try:
-        logger.info(f'Jamendo API 請求: {url} with params: {final_params}')
+        logger.info(f'Jamendo API 請求: {endpoint} with params: {params}')
         
-        response = requests.get(
-            url,
-            params=final_params,
-            headers=get_jamendo_headers(),
-            timeout=30
-        )
+        response = client.get(endpoint, params)
         
         if response.status_code == 200:
             data = response.json()
             
-            # 數據後處理：確保所有曲目都有必要字段
-            if 'results' in data:
-                for track in data['results']:
-                    # 確保圖片字段
-                    if not track.get('image') and track.get('album_image'):
-                        track['image'] = track['album_image']
-                    
-                    # 確保時長字段
-                    if not track.get('duration'):
-                        track['duration'] = 180  # 默認3分鐘
-                    
-                    # 格式化藝人信息
-                    if not track.get('artist_name'):
-                        track['artist_name'] = 'Unknown Artist'
-                    
-                    # 格式化專輯信息
-                    if not track.get('album_name'):
-                        track['album_name'] = 'Unknown Album'
-            
-            # 緩存數據
-            cache.set(f"jamendo_{cache_key}", data, cache_timeout)
+            # 音軌寫入本地資料庫與逐首寫入實體緩存（都在背景執行）
+            if endpoint.strip('/') == 'tracks':
+                data = normalize_tracks(data)
+                schedule_ingest(data)
+                schedule_cache_tracks(data)
             
             logger.info(f'Jamendo API 響應成功: {len(data.get("results", []))} 項結果')
             return data
@@ -88,6 +148,12 @@ def jamendo_api_request(endpoint, params, cache_timeout=3600):
             logger.error(f'Jamendo API 錯誤: {response.status_code} - {response.text}')
             return None
             
+    except CircuitOpenError:
+        logger.warning(f'Jamendo API 斷路器開啟，快速失敗: {endpoint}')
+        return None
+    except QuotaExceededError as e:
+        logger.warning(f'{str(e)}，跳過請求: {endpoint}')
+        return None
     except requests.exceptions.Timeout:
         logger.error('Jamendo API 請求超時')
         return None
@@ -95,6 +161,255 @@ def jamendo_api_request(endpoint, params, cache_timeout=3600):
         logger.error(f'Jamendo API 請求異常: {str(e)}')
         return None
 
+def jamendo_api_entry(endpoint, params, cache_timeout=3600, cache_profile=None, loader=None,
+                      fields=None):
+    """統一的 Jamendo API 請求函數，帶緩存，返回緩存項（含已編碼的 JSON 與 ETag）
+
+    cache_profile 對應 settings.JAMENDO_CACHE_TTLS 中的 soft/hard TTL，
+    未配置時以 cache_timeout 作為 TTL。fields 不為 None 時緩存投影後的數據。
+    """
+    # 生成緩存鍵
+    cache_key = get_cache_key(endpoint, params, fields)
+    
+    # 新鮮或可容忍的舊緩存直接返回（必要時背景刷新），
+    # 緩存未命中時同一緩存鍵的並發請求合併為一次上游請求
+    return cached_fetch_entry(
+        cache_key,
+        projected(loader or (lambda: fetch_from_jamendo(endpoint, params)), fields),
+        profile=cache_profile,
+        timeout=cache_timeout
+    )
+
+def jamendo_api_request(endpoint, params, cache_timeout=3600, cache_profile=None):
+    """統一的 Jamendo API 請求函數，帶緩存，返回解碼後的數據"""
+    return entry_data(jamendo_api_entry(endpoint, params, cache_timeout, cache_profile))
+
+def bucket_limit(limit):
+    """把 limit 向上取整到緩存分桶（settings.JAMENDO_LIMIT_BUCKETS）
+
+    同一列表只按分桶請求上游與緩存，較小的 limit 由分桶結果切片返回。
+    """
+    for bucket in sorted(getattr(settings, 'JAMENDO_LIMIT_BUCKETS', [])):
+        if limit <= bucket:
+            return bucket
+    return limit
+
+def slice_results(data, limit):
+    """只保留前 limit 首音軌"""
+    results = data.get('results', [])[:limit]
+    headers = data.get('headers')
+    if isinstance(headers, dict):
+        headers = {**headers, 'results_count': len(results)}
+    return {**data, 'headers': headers, 'results': results}
+
+def feed_entry(feed, limit, value=None, fields=None):
+    """列表端點的緩存項：請求並緩存分桶大小的結果，再切片為所需的 limit"""
+    bucket = bucket_limit(limit)
+    source = jamendo_api_entry(
+        'tracks', feed_params(feed, bucket, value), cache_profile=feed, fields=fields
+    )
+    if source is None or bucket == limit:
+        return source
+    return derived_entry(
+        get_cache_key('tracks', feed_params(feed, limit, value), fields),
+        source,
+        lambda data: slice_results(data, limit),
+        profile=feed
+    )
+
+def page_cache_key(feed, page, value=None, fields=None):
+    """分頁緩存鍵（包含快照編號）"""
+    return get_cache_key('tracks', page_key_params(feed_params(feed, page['limit'], value), page), fields)
+
+def page_loader(feed, page, value=None, fields=None):
+    """單頁的載入函數：從翻頁快照切片（快照不足時向上游補充），投影後加入分頁資訊"""
+    def fetch(offset, limit):
+        return fetch_from_jamendo('tracks', {**feed_params(feed, limit, value), 'offset': offset})
+    return lambda: add_pagination(project_tracks(snapshot_page(page, fetch), fields), page)
+
+def prefetch_next_page(entry, feed, page, value=None, fields=None):
+    """還有下一頁時在背景預取，用戶捲動到下一頁時直接命中緩存"""
+    if entry is None or not entry_data(entry)['pagination']['has_more']:
+        return
+    following = next_page(page)
+    schedule_prefetch(
+        page_cache_key(feed, following, value, fields),
+        page_loader(feed, following, value, fields),
+        cursor_ttl()
+    )
+
+def page_entry(feed, page, value=None, fields=None):
+    """分頁列表的緩存項：同一快照的每一頁內容固定且不重複，並預取下一頁"""
+    entry = pinned_entry(
+        page_cache_key(feed, page, value, fields),
+        page_loader(feed, page, value, fields),
+        cursor_ttl()
+    )
+    prefetch_next_page(entry, feed, page, value, fields)
+    return entry
+
+def entity_search_entry(endpoint, query, limit):
+    """藝人 / 專輯名稱搜尋的緩存項"""
+    return jamendo_api_entry(
+        endpoint, entity_search_params(query, limit),
+        cache_profile='search', fields=ENTITY_SEARCHES[endpoint]
+    )
+
+def cached_local_search(query, limit, fields=None):
+    """本地音軌庫搜尋，結果按 search 緩存配置緩存"""
+    return cached_fetch(
+        get_cache_key('local_search', {'q': query, 'limit': limit}, fields),
+        lambda: project_tracks(local_response(search_local_tracks(query, limit)), fields),
+        profile='search'
+    )
+
+def multi_search_loaders(query, limit, fields=None):
+    """綜合搜尋的上游子查詢（各自緩存，返回數據或 None）"""
+    loaders = {'tracks': lambda: entry_data(feed_entry('search', limit, query, fields))}
+    for endpoint in ENTITY_SEARCHES:
+        loaders[endpoint] = lambda endpoint=endpoint: entry_data(entity_search_entry(endpoint, query, limit))
+    return loaders
+
+def fetch_track_detail(track_id):
+    """請求單個音軌詳情，找不到時返回 None"""
+    data = fetch_from_jamendo('tracks', detail_params(track_id))
+    if data and data.get('results'):
+        return data['results'][0]
+    return None
+
+def merge_fetched_tracks(found, missing, data):
+    """合併上游返回的音軌，記錄上游確認不存在的 id"""
+    fetched = {str(track['id']): track for track in data.get('results', []) if track.get('id')}
+    found.update(fetched)
+    return [track_id for track_id in missing if track_id not in fetched]
+
+def resolve_tracks(track_ids):
+    """按 id 取得多首音軌：一次 get_many 讀取實體緩存，缺少的音軌合併為一次上游請求
+
+    返回 ({id: 音軌}, 上游是否失敗)。
+    """
+    found = get_cached_tracks(track_ids)
+    missing = [track_id for track_id in track_ids if track_id not in found]
+    failed = False
+    if missing:
+        # 上游返回的音軌已在 fetch_from_jamendo 中寫入實體緩存
+        data = fetch_from_jamendo('tracks', multi_detail_params(missing))
+        if data is None:
+            failed = True
+        else:
+            cache_missing(merge_fetched_tracks(found, missing, data))
+    return {track_id: track for track_id, track in found.items() if track is not MISSING}, failed
+
+def render_track_details(track_ids, tracks, fields=None):
+    """按請求的順序生成多 ID 詳情響應"""
+    return project_tracks({
+        'results': [tracks[track_id] for track_id in track_ids if track_id in tracks],
+        'missing': [track_id for track_id in track_ids if track_id not in tracks]
+    }, fields)
+
+BATCH_MAX_SECTIONS = 20
+
+def parse_batch_sections(request):
+    """解析批次請求的區塊定義列表"""
+    try:
+        body = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError('請求內容不是有效的 JSON')
+    
+    specs = body.get('sections') if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        raise ValueError('缺少 sections 參數')
+    if len(specs) > BATCH_MAX_SECTIONS:
+        raise ValueError(f'sections 最多 {BATCH_MAX_SECTIONS} 個')
+    return specs
+
+def plan_batch_section(spec, index):
+    """把區塊定義轉換為請求計劃
+
+    定義格式：{"id": "可選", "type": "tag|search|popular|latest|random",
+    "tag": "rock", "q": "搜尋詞", "limit": 50, "view": "card|full", "fields": "id,name"}
+    """
+    spec = spec if isinstance(spec, dict) else {}
+    feed = spec.get('type')
+    section = {'id': spec.get('id') or f'section_{index}', 'type': feed}
+    
+    if feed not in FEED_FILTERS:
+        section['error'] = f'不支持的區塊類型: {feed}'
+        return section
+    
+    value = None
+    if feed == 'tag':
+        value = spec.get('tag')
+        if not value:
+            section['error'] = '缺少標籤參數'
+            return section
+    elif feed == 'search':
+        value = spec.get('q')
+        if not value:
+            section['error'] = '缺少搜尋查詢'
+            return section
+    
+    try:
+        limit = max(1, min(int(spec.get('limit', 20)), 200))
+    except (TypeError, ValueError):
+        section['error'] = 'limit 參數無效'
+        return section
+    
+    try:
+        fields = parse_fields(spec.get('fields'), spec.get('view'))
+    except ValueError as e:
+        section['error'] = str(e)
+        return section
+    
+    # 隨機區塊直接按 limit 從隨機音軌池取出，其他區塊按分桶請求後切片
+    params = feed_params(feed, limit if feed == 'random' else bucket_limit(limit), value)
+    section['params'] = params
+    section['limit'] = limit
+    section['fields'] = fields
+    # 隨機區塊從隨機音軌池取出，不使用響應緩存
+    section['cache_key'] = None if feed == 'random' else get_cache_key('tracks', params, fields)
+    return section
+
+def render_batch_section(section, data=None, cached=False):
+    """生成單個區塊的響應"""
+    result = {'id': section['id'], 'type': section['type']}
+    if section.get('error'):
+        result.update({'status': 'invalid', 'error': section['error']})
+    elif data is None:
+        result.update({'status': 'error', 'error': 'Jamendo API 錯誤'})
+    else:
+        results = data.get('results', [])[:section['limit']]
+        result.update({
+            'status': 'ok',
+            'cached': cached,
+            'count': len(results),
+            'results': results
+        })
+    return result
+
+def batch_section_loader(section):
+    """區塊的上游請求函數（返回投影後的數據）"""
+    return projected(lambda: fetch_from_jamendo('tracks', section['params']), section['fields'])
+
+def random_tracks_data(limit):
+    """從隨機音軌池取出音軌，不足的部分以一次上游請求補足（池在背景補充）"""
+    tracks = draw_random_tracks(limit)
+    if len(tracks) >= limit:
+        return pool_response(tracks)
+    data = fetch_from_jamendo('tracks', feed_params('random', limit - len(tracks)))
+    return merge_random_tracks(tracks, data, limit)
+
+def fetch_batch_section(section):
+    """請求單個未命中緩存的區塊"""
+    if section['cache_key'] is None:
+        data = random_tracks_data(section['params']['limit'])
+        return project_tracks(data, section['fields'])
+    return cached_fetch(
+        section['cache_key'],
+        batch_section_loader(section),
+        profile=section['type']
+    )
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_jamendo_config(request):
@@ -111,52 +426,102 @@ def get_jamendo_config(request):
 def search_tracks(request):
     """搜尋音軌"""
     search_query = request.GET.get('q', '')
-    limit = min(int(request.GET.get('limit', 20)), 200)
+    limit = parse_limit(request)
     
     if not search_query:
         return JsonResponse({'error': '缺少搜尋查詢'}, status=400)
     
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # 本地音軌庫結果足夠時不請求上游（分頁請求按上游的 offset 翻頁，不使用本地結果）
+    local_data = None if page else local_search_response(search_query, limit)
+    if local_data is not None:
+        local_data = project_tracks(local_data, fields)
+        return cached_json_response(request, make_entry(local_data, get_ttls('search')[0], compress=False))
+    
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'search': search_query,
-        'include': 'musicinfo',
-        'audioformat': 'mp32',
-        'limit': limit
-    }
-    
-    data = jamendo_api_request('tracks', params)
+    if page:
+        entry = page_entry('search', page, search_query, fields)
+    else:
+        entry = feed_entry('search', limit, search_query, fields)
     
-    if data:
-        return JsonResponse(data)
+    if entry:
+        return cached_json_response(request, entry)
     else:
         return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def search_all(request):
+    """綜合搜尋：同時搜尋音軌、藝人、專輯與本地音軌庫，合併排序後分組返回"""
+    search_query = request.GET.get('q', '').strip()
+    limit = parse_limit(request, default=10, maximum=50)
+    
+    if not search_query:
+        return JsonResponse({'error': '缺少搜尋查詢'}, status=400)
+    
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+    
+    fields = parse_fields()
+    loaders = multi_search_loaders(search_query, limit, fields)
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        futures = {name: executor.submit(loader) for name, loader in loaders.items()}
+        # 本地搜尋在請求線程中同時執行（資料庫連線不跨線程）
+        if getattr(settings, 'JAMENDO_LOCAL_SEARCH_MODE', 'off') != 'off':
+            try:
+                results['local'] = cached_local_search(search_query, limit, fields)
+            except Exception as e:
+                logger.error(f'本地搜尋失敗: {str(e)}')
+                results['local'] = None
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f'綜合搜尋子查詢失敗 ({name}): {str(e)}')
+                results[name] = None
+    
+    return JsonResponse(combine_search_results(search_query, results, limit))
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def tracks_by_tag(request):
     """按標籤獲取音軌"""
     tag = request.GET.get('tag', '')
-    limit = min(int(request.GET.get('limit', 20)), 200)
+    limit = parse_limit(request)
     
     if not tag:
         return JsonResponse({'error': '缺少標籤參數'}, status=400)
     
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # 本地音軌庫中該標籤的音軌足夠時不請求上游（分頁請求仍按上游的 offset 翻頁）
+    local_data = None if page else local_tag_response(tag, limit)
+    if local_data is not None:
+        local_data = project_tracks(local_data, fields)
+        return cached_json_response(request, make_entry(local_data, get_ttls('tag')[0], compress=False))
+    
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'tags': tag,
-        'include': 'musicinfo',
-        'audioformat': 'mp32',
-        'limit': limit
-    }
-    
-    data = jamendo_api_request('tracks', params, cache_timeout=7200)  # 2小時緩存
+    if page:
+        entry = page_entry('tag', page, tag, fields)
+    else:
+        entry = feed_entry('tag', limit, tag, fields)
     
-    if data:
-        return JsonResponse(data)
+    if entry:
+        return cached_json_response(request, entry)
     else:
         return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
 
@@ -164,22 +529,24 @@ def tracks_by_tag(request):
 @require_http_methods(["GET"])
 def popular_tracks(request):
     """獲取熱門音軌"""
-    limit = min(int(request.GET.get('limit', 20)), 200)
+    limit = parse_limit(request)
+    
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'order': 'popularity_total',
-        'include': 'musicinfo',
-        'audioformat': 'mp32',
-        'limit': limit
-    }
-    
-    data = jamendo_api_request('tracks', params, cache_timeout=3600)  # 1小時緩存
+    if page:
+        entry = page_entry('popular', page, None, fields)
+    else:
+        entry = feed_entry('popular', limit, None, fields)
     
-    if data:
-        return JsonResponse(data)
+    if entry:
+        return cached_json_response(request, entry)
     else:
         return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
 
@@ -187,22 +554,24 @@ def popular_tracks(request):
 @require_http_methods(["GET"])
 def latest_tracks(request):
     """獲取最新音軌"""
-    limit = min(int(request.GET.get('limit', 20)), 200)
+    limit = parse_limit(request)
+    
+    try:
+        fields = parse_request_fields(request)
+        page = parse_page(request, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'order': 'releasedate_desc',
-        'include': 'musicinfo',
-        'audioformat': 'mp32',
-        'limit': limit
-    }
-    
-    data = jamendo_api_request('tracks', params, cache_timeout=1800)  # 30分鐘緩存
+    if page:
+        entry = page_entry('latest', page, None, fields)
+    else:
+        entry = feed_entry('latest', limit, None, fields)
     
-    if data:
-        return JsonResponse(data)
+    if entry:
+        return cached_json_response(request, entry)
     else:
         return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
 
@@ -210,36 +579,18 @@ def latest_tracks(request):
 @require_http_methods(["GET"])
 def random_tracks(request):
     """獲取隨機音軌"""
-    limit = min(int(request.GET.get('limit', 20)), 200)
+    limit = parse_limit(request)
     
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'order': 'random',
-        'include': 'musicinfo',
-        'audioformat': 'mp32',
-        'limit': limit
-    }
-    
-    # 隨機音軌不使用緩存
-    url = f'{JAMENDO_API_BASE}/tracks'
-    final_params = {
-        'client_id': JAMENDO_CLIENT_ID,
-        'format': 'json',
-        **params
-    }
+    # 從進程內隨機音軌池取出，池中不足的部分才請求上游
+    data = random_tracks_data(limit)
     
-    try:
-        response = requests.get(url, params=final_params, headers=get_jamendo_headers(), timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            return JsonResponse(data)
-        else:
-            return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
-    except Exception as e:
-        logger.error(f'獲取隨機音軌錯誤: {str(e)}')
-        return JsonResponse({'error': str(e)}, status=500)
+    if data:
+        return JsonResponse(data)
+    else:
+        return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
 
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -248,19 +599,39 @@ def get_track_detail(request, track_id):
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    params = {
-        'id': track_id,
-        'include': 'musicinfo+stats+lyrics',
-        'audioformat': 'mp32'
-    }
+    params = detail_params(track_id)
     
-    data = jamendo_api_request('tracks', params, cache_timeout=86400)  # 24小時緩存
+    # 詳情緩存只保存該音軌本身，命中時可直接返回
+    entry = jamendo_api_entry(
+        'tracks', params,
+        cache_profile='detail',
+        loader=lambda: fetch_track_detail(track_id)
+    )
     
-    if data and data.get('results'):
-        return JsonResponse(data['results'][0])
+    if entry:
+        return cached_json_response(request, entry)
     else:
         return JsonResponse({'error': '找不到音軌'}, status=404)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_track_details(request):
+    """按多個 id 獲取音軌（?ids=1,2,3），命中實體緩存的音軌不請求上游"""
+    try:
+        track_ids = parse_track_ids(request)
+        fields = parse_fields(request.GET.get('fields'), request.GET.get('view') or 'full')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+    
+    tracks, failed = resolve_tracks(track_ids)
+    
+    if failed and not tracks:
+        return JsonResponse({'error': 'Jamendo API 錯誤'}, status=500)
+    return JsonResponse(render_track_details(track_ids, tracks, fields))
+
 @csrf_exempt  
 @require_http_methods(["GET"])
 def get_available_tags(request):
@@ -268,24 +639,9 @@ def get_available_tags(request):
     if not JAMENDO_CLIENT_ID:
         return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
     
-    # Jamendo API 官方推薦的曲風標籤
-    # 來源：https://developer.jamendo.com/v3.0/tracks
-    jamendo_featured_genres = [
-        'pop',        # 流行音樂 - 最受歡迎的主流音樂
-        'rock',       # 搖滾音樂 - 經典搖滾風格
-        'electronic', # 電子音樂 - 電子合成器音樂
-        'jazz',       # 爵士音樂 - 爵士樂風格
-        'classical',  # 古典音樂 - 古典樂曲
-        'hiphop',     # 嘻哈音樂 - 說唱和節拍音樂
-        'metal',      # 金屬音樂 - 重金屬音樂
-        'world',      # 世界音樂 - 各國民族音樂
-        'soundtrack', # 配樂音樂 - 電影配樂等
-        'lounge'      # 休閒音樂 - 輕鬆氛圍音樂
-    ]
-    
     return JsonResponse({
-        'results': jamendo_featured_genres,
-        'count': len(jamendo_featured_genres),
+        'results': JAMENDO_FEATURED_GENRES,
+        'count': len(JAMENDO_FEATURED_GENRES),
         'source': 'jamendo_official_featured_genres',
         'description': 'Jamendo API 官方推薦的特色曲風標籤'
     })
@@ -300,6 +656,16 @@ def health_check(request):
             'error': 'JAMENDO_CLIENT_ID 未設置'
         }, status=500)
     
+    # 斷路器開啟時不再向上游發送探測請求，由斷路器在背景探測恢復
+    client = get_client()
+    if client.breaker.is_open:
+        return JsonResponse({
+            'status': 'degraded',
+            'jamendo_api': 'circuit_open',
+            'client_id_configured': True,
+            'circuit': client.breaker.snapshot()
+        }, status=503)
+    
     # 測試 Jamendo API 連接
     try:
         data = jamendo_api_request('tracks', {'limit': 1}, cache_timeout=60)
@@ -310,7 +676,8 @@ def health_check(request):
                 'jamendo_api': 'connected',
                 'client_id_configured': True,
                 'api_base': JAMENDO_API_BASE,
-                'cache_enabled': True
+                'cache_enabled': True,
+                'http_pool': client.describe()
             })
         else:
             return JsonResponse({
@@ -327,6 +694,83 @@ def health_check(request):
             'error': str(e),
             'client_id_configured': bool(JAMENDO_CLIENT_ID)
         }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def batch_sections(request):
+    """批次獲取多個音軌區塊（首頁一次請求）
+
+    緩存命中的區塊以一次 get_many 直接返回，未命中的區塊並發請求上游，
+    每個區塊各自帶有 status。
+    """
+    try:
+        specs = parse_batch_sections(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if not JAMENDO_CLIENT_ID:
+        return JsonResponse({'error': 'Jamendo 未配置'}, status=500)
+    
+    sections = [plan_batch_section(spec, index) for index, spec in enumerate(specs)]
+    lookups = {
+        section['cache_key']: (
+            batch_section_loader(section),
+            section['type'],
+            3600
+        )
+        for section in sections if section.get('cache_key')
+    }
+    hits = get_cached_many(lookups) if lookups else {}
+    
+    pending = [
+        section for section in sections
+        if not section.get('error') and section['cache_key'] not in hits
+    ]
+    fetched = {}
+    if pending:
+        workers = min(len(pending), getattr(settings, 'JAMENDO_BATCH_CONCURRENCY', 8))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {id(section): executor.submit(fetch_batch_section, section) for section in pending}
+            for key, future in futures.items():
+                try:
+                    fetched[key] = future.result()
+                except Exception as e:
+                    logger.error(f'批次區塊請求失敗: {str(e)}')
+                    fetched[key] = None
+    
+    results = []
+    for section in sections:
+        if section.get('cache_key') in hits:
+            results.append(render_batch_section(section, hits[section['cache_key']], cached=True))
+        else:
+            results.append(render_batch_section(section, fetched.get(id(section))))
+    
+    return JsonResponse({
+        'sections': results,
+        'count': len(results)
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def cache_stats(request):
+    """緩存各層命中統計（當前 worker 進程）"""
+    response_cache = get_cache()
+    extra = {
+        'random_pool': get_pool().stats(),
+        'upstream_quota': get_client().quota.snapshot()
+    }
+    if not hasattr(response_cache, 'stats'):
+        return JsonResponse({
+            'tiered': False,
+            'backend': type(response_cache).__name__,
+            **extra
+        })
+    
+    return JsonResponse({
+        'tiered': True,
+        **response_cache.stats(),
+        **extra
+    })
     
 def jamendo_api_proxy(request):
     return JsonResponse({'message': '這是 Jamendo Proxy API 的回應'})
\ No newline at end of file
@@ -0,0 +1,140 @@
+# backend/apps/jamendo/warming.py
+"""
+Jamendo 列表緩存預熱
+
+按前端使用的 limit 預先請求熱門、最新與各特色曲風列表，並在 soft TTL
+到期前刷新，讓冷啟動與緩存過期不會落到用戶請求上。
+
+- 管理命令：python manage.py warm_jamendo_cache
+- 進程內排程：JAMENDO_WARM_SCHEDULER_ENABLED=True 時由 wsgi/asgi 入口啟動
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import quota
+from .caching import get_cache, get_ttls, is_entry, refresh_entry
+from .projection import parse_fields, projected
+from .views import (
+    JAMENDO_CLIENT_ID, JAMENDO_FEATURED_GENRES, bucket_limit, feed_params, fetch_from_jamendo,
+    get_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _cached_entry(cache_key):
+    entry = get_cache().get(cache_key)
+    return entry if is_entry(entry) else None
+
+
+def _buckets(limits):
+    """前端使用的 limit 對應的緩存分桶（較小的 limit 由分桶結果切片）"""
+    return sorted({bucket_limit(limit) for limit in limits})
+
+
+def warm_targets():
+    """需要預熱的 (feed, value, limit) 列表"""
+    limits = getattr(settings, 'JAMENDO_WARM_LIMITS', {})
+    targets = []
+    for limit in _buckets(limits.get('popular', [])):
+        targets.append(('popular', None, limit))
+    for limit in _buckets(limits.get('latest', [])):
+        targets.append(('latest', None, limit))
+    for genre in JAMENDO_FEATURED_GENRES:
+        for limit in _buckets(limits.get('tag', [])):
+            targets.append(('tag', genre, limit))
+    return targets
+
+
+def warm_feed(feed, value, limit, force=False):
+    """預熱單個列表，返回 'fresh'（仍新鮮）、'refreshed'、'busy'（其他進程刷新中）或 'failed'"""
+    close_old_connections()
+    try:
+        with quota.priority(quota.FEED):
+            return _warm_feed(feed, value, limit, force)
+    finally:
+        close_old_connections()
+
+
+def _warm_feed(feed, value, limit, force):
+    # 與列表端點默認 view 使用相同的緩存鍵
+    fields = parse_fields()
+    params = feed_params(feed, limit, value)
+    cache_key = get_cache_key('tracks', params, fields)
+    margin = getattr(settings, 'JAMENDO_WARM_MARGIN', 600)
+
+    entry = _cached_entry(cache_key)
+    if not force and entry is not None and entry['soft_expires_at'] - time.time() > margin:
+        return 'fresh'
+
+    soft_ttl, hard_ttl = get_ttls(feed)
+    try:
+        loader = projected(lambda: fetch_from_jamendo('tracks', params), fields)
+        entry = refresh_entry(cache_key, loader, soft_ttl, hard_ttl, feed)
+    except Exception as e:
+        logger.error(f'緩存預熱失敗: {feed} {value or ""} limit={limit} - {str(e)}')
+        return 'failed'
+    if entry is None:
+        # loader 失敗或其他 worker 正在刷新同一鍵
+        return 'busy' if _cached_entry(cache_key) is not None else 'failed'
+    return 'refreshed'
+
+
+def warm_all(force=False, concurrency=None):
+    """以有限並發預熱所有列表，返回各狀態的數量"""
+    summary = {'fresh': 0, 'refreshed': 0, 'busy': 0, 'failed': 0}
+    if not JAMENDO_CLIENT_ID:
+        logger.warning('Jamendo 未配置，跳過緩存預熱')
+        return summary
+
+    concurrency = concurrency or getattr(settings, 'JAMENDO_WARM_CONCURRENCY', 4)
+    targets = warm_targets()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='jamendo-warm') as executor:
+        for status in executor.map(lambda target: warm_feed(*target, force=force), targets):
+            summary[status] += 1
+
+    logger.info(
+        f'緩存預熱完成 ({len(targets)} 個列表，{time.monotonic() - started:.1f}s): '
+        f'刷新 {summary["refreshed"]}，新鮮 {summary["fresh"]}，'
+        f'其他進程刷新中 {summary["busy"]}，失敗 {summary["failed"]}'
+    )
+    return summary
+
+
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def _scheduler_loop():
+    interval = getattr(settings, 'JAMENDO_WARM_INTERVAL', 300)
+    while True:
+        try:
+            warm_all()
+        except Exception as e:
+            logger.error(f'緩存預熱排程異常: {str(e)}')
+        time.sleep(interval)
+
+
+def start_scheduler():
+    """在當前進程啟動預熱線程（每個進程只啟動一次）
+
+    JAMENDO_WARM_INTERVAL 需小於 JAMENDO_WARM_MARGIN，緩存才會在 soft TTL 到期前刷新。
+    """
+    global _scheduler_pid
+    if not getattr(settings, 'JAMENDO_WARM_SCHEDULER_ENABLED', False):
+        return False
+    pid = os.getpid()
+    with _scheduler_lock:
+        if _scheduler_pid == pid:
+            return False
+        _scheduler_pid = pid
+    threading.Thread(target=_scheduler_loop, name='jamendo-warm-scheduler', daemon=True).start()
+    logger.info(f'緩存預熱排程已啟動 (pid {pid})')
+    return True
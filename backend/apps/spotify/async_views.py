@@ -0,0 +1,152 @@
+# backend/apps/spotify/async_views.py
+"""
+Spotify 端點的非同步（ASGI）版本，與 Jamendo 共用同一個 httpx.AsyncClient 連線池
+"""
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from apps.jamendo.client import get_async_http_client
+from .views import SPOTIFY_TOKEN_URL, get_spotify_headers
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def exchange_code_for_token(request):
+    """交換授權碼獲取 access token"""
+    try:
+        data = json.loads(request.body)
+        code = data.get('code')
+        redirect_uri = data.get('redirect_uri')
+
+        if not code or not redirect_uri:
+            return JsonResponse({'error': '缺少必要參數'}, status=400)
+
+        # 向 Spotify 請求 token
+        token_data = {
+            'grant_type': 'authorization_code',
+            'code': code,
+            'redirect_uri': redirect_uri
+        }
+
+        response = await get_async_http_client().post(
+            SPOTIFY_TOKEN_URL,
+            data=token_data,
+            headers=get_spotify_headers()
+        )
+
+        if response.status_code == 200:
+            token_info = response.json()
+            return JsonResponse({
+                'access_token': token_info.get('access_token'),
+                'refresh_token': token_info.get('refresh_token'),
+                'expires_in': token_info.get('expires_in'),
+                'token_type': token_info.get('token_type')
+            })
+        else:
+            return JsonResponse({
+                'error': '獲取 token 失敗',
+                'details': response.json()
+            }, status=400)
+
+    except Exception as e:
+        return JsonResponse({
+            'error': '服務器錯誤',
+            'message': str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def refresh_access_token(request):
+    """刷新 access token"""
+    try:
+        data = json.loads(request.body)
+        refresh_token = data.get('refresh_token')
+
+        if not refresh_token:
+            return JsonResponse({'error': '缺少 refresh_token'}, status=400)
+
+        # 向 Spotify 請求刷新 token
+        token_data = {
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token
+        }
+
+        response = await get_async_http_client().post(
+            SPOTIFY_TOKEN_URL,
+            data=token_data,
+            headers=get_spotify_headers()
+        )
+
+        if response.status_code == 200:
+            token_info = response.json()
+            return JsonResponse({
+                'access_token': token_info.get('access_token'),
+                'expires_in': token_info.get('expires_in'),
+                'token_type': token_info.get('token_type'),
+                # 有時候 Spotify 會返回新的 refresh_token
+                'refresh_token': token_info.get('refresh_token', refresh_token)
+            })
+        else:
+            return JsonResponse({
+                'error': '刷新 token 失敗',
+                'details': response.json()
+            }, status=400)
+
+    except Exception as e:
+        return JsonResponse({
+            'error': '服務器錯誤',
+            'message': str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def spotify_api_proxy(request):
+    """Spotify API 代理（可選，用於避免 CORS 問題）"""
+    try:
+        data = json.loads(request.body)
+        endpoint = data.get('endpoint')
+        method = data.get('method', 'GET')
+        access_token = data.get('access_token')
+        payload = data.get('payload')
+
+        if not endpoint or not access_token:
+            return JsonResponse({'error': '缺少必要參數'}, status=400)
+
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+
+        url = f'https://api.spotify.com/v1{endpoint}'
+        method = method.upper()
+
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            return JsonResponse({'error': '不支持的 HTTP 方法'}, status=405)
+
+        response = await get_async_http_client().request(
+            method,
+            url,
+            headers=headers,
+            json=payload if method in ('POST', 'PUT') else None
+        )
+
+        # 返回 Spotify API 的響應
+        if response.status_code < 400:
+            try:
+                return JsonResponse(response.json())
+            except (ValueError, TypeError):
+                return JsonResponse({'success': True})
+        else:
+            return JsonResponse({
+                'error': 'Spotify API 錯誤',
+                'status': response.status_code,
+                'details': response.text
+            }, status=response.status_code)
+
+    except Exception as e:
+        return JsonResponse({
+            'error': '服務器錯誤',
+            'message': str(e)
+        }, status=500)
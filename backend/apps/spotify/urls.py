@@ -1,10 +1,17 @@
 # backend/apps/spotify/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI 部署模式下，上游相關端點使用非同步版本
+if getattr(settings, 'ASYNC_UPSTREAM_VIEWS', False):
+    from . import async_views as upstream_views
+else:
+    upstream_views = views
+
 urlpatterns = [
-    path('token/', views.exchange_code_for_token, name='spotify-token'),
-    path('refresh/', views.refresh_access_token, name='spotify-refresh'),
+    path('token/', upstream_views.exchange_code_for_token, name='spotify-token'),
+    path('refresh/', upstream_views.refresh_access_token, name='spotify-refresh'),
     path('config/', views.get_spotify_config, name='spotify-config'),
-    path('proxy/', views.spotify_api_proxy, name='spotify-proxy'),
+    path('proxy/', upstream_views.spotify_api_proxy, name='spotify-proxy'),
 ]
\ No newline at end of file
@@ -6,6 +6,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 import json
+import os
+import threading
+
+from apps.jamendo.replay import mount_replay
 
 # Spotify API 配置
 SPOTIFY_CLIENT_ID = getattr(settings, 'SPOTIFY_CLIENT_ID', '')
@@ -21,6 +25,21 @@ def get_spotify_headers():
         'Content-Type': 'application/x-www-form-urlencoded'
     }
 
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_spotify_session():
+    """獲取當前 worker 進程共用的 Spotify Session（重用連線，錄製 / 重放模式下替換 adapter）"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = mount_replay(requests.Session())
+                _session_pid = pid
+    return _session
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def exchange_code_for_token(request):
@@ -40,7 +59,7 @@ def exchange_code_for_token(request):
             'redirect_uri': redirect_uri
         }
         
-        response = requests.post(
+        response = get_spotify_session().post(
             SPOTIFY_TOKEN_URL,
             data=token_data,
             headers=get_spotify_headers()
@@ -83,7 +102,7 @@ def refresh_access_token(request):
             'refresh_token': refresh_token
         }
         
-        response = requests.post(
+        response = get_spotify_session().post(
             SPOTIFY_TOKEN_URL,
             data=token_data,
             headers=get_spotify_headers()
@@ -141,13 +160,13 @@ def spotify_api_proxy(request):
         url = f'https://api.spotify.com/v1{endpoint}'
         
         if method.upper() == 'GET':
-            response = requests.get(url, headers=headers)
+            response = get_spotify_session().get(url, headers=headers)
         elif method.upper() == 'POST':
-            response = requests.post(url, headers=headers, json=payload)
+            response = get_spotify_session().post(url, headers=headers, json=payload)
         elif method.upper() == 'PUT':
-            response = requests.put(url, headers=headers, json=payload)
+            response = get_spotify_session().put(url, headers=headers, json=payload)
         elif method.upper() == 'DELETE':
-            response = requests.delete(url, headers=headers)
+            response = get_spotify_session().delete(url, headers=headers)
         else:
             return JsonResponse({'error': '不支持的 HTTP 方法'}, status=405)
         
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_streaming.settings')
 
 application = get_asgi_application()
+
+# 應用加載後啟動 Jamendo 緩存預熱排程（JAMENDO_WARM_SCHEDULER_ENABLED 控制）
+# 與本地音軌庫刷新排程（JAMENDO_REFRESH_ENABLED 控制）
+from apps.jamendo.refresher import start_refresher  # noqa: E402
+from apps.jamendo.warming import start_scheduler  # noqa: E402
+
+start_scheduler()
+start_refresher()
@@ -91,14 +91,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'music_streaming.wsgi.application'
+ASGI_APPLICATION = 'music_streaming.asgi.application'
+
+# 部署模式：wsgi（gunicorn 同步 worker）或 asgi（gunicorn + uvicorn worker）
+# ASGI 模式下 Jamendo/Spotify 上游端點使用非同步視圖
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+ASYNC_UPSTREAM_VIEWS = SERVER_MODE == 'asgi'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite 等待其他連線釋放寫鎖的秒數（多個 worker、背景刷新與爬蟲同時寫入時）
+SQLITE_TIMEOUT = int(os.getenv('SQLITE_TIMEOUT', '20'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'timeout': SQLITE_TIMEOUT},
     }
 }
 
@@ -121,6 +131,7 @@ if IS_RAILWAY:
             'default': {
                 'ENGINE': 'django.db.backends.sqlite3',
                 'NAME': '/tmp/db.sqlite3',
+                'OPTIONS': {'timeout': SQLITE_TIMEOUT},
             }
         }
 else:
@@ -129,6 +140,7 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {'timeout': SQLITE_TIMEOUT},
         }
     }
 
@@ -271,9 +283,159 @@ if not DEBUG:
     AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
     AWS_S3_REGION_NAME = 'us-west-2'
 
+# 緩存設定
+# 配置 REDIS_URL 時以 Redis 作為跨 worker 共享緩存，否則以 LocMemCache 作為本地替身
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        },
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'music-streaming-shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': 3000,
+        },
+    }
+
+CACHES = {
+    'default': SHARED_CACHE,
+    # Jamendo 響應：進程內 LRU（L1）在前，共享緩存（L2）在後
+    'jamendo': {
+        'BACKEND': 'apps.jamendo.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'default',
+            'MAX_ENTRIES': int(os.getenv('JAMENDO_L1_MAX_ENTRIES', '500')),
+            'MAX_BYTES': int(os.getenv('JAMENDO_L1_MAX_BYTES', str(64 * 1024 * 1024))),
+            'LOCAL_TIMEOUT': int(os.getenv('JAMENDO_L1_TIMEOUT', '30')),
+            'INVALIDATION': 'redis' if REDIS_URL else 'local',
+            # 緩存值編碼：binary（msgpack + zlib，帶版本標記）或 pickle
+            'CODEC': os.getenv('JAMENDO_CACHE_CODEC', 'binary'),
+            'CODEC_COMPRESS_MIN_SIZE': int(os.getenv('JAMENDO_CACHE_CODEC_COMPRESS_MIN_SIZE', '1024')),
+        },
+    },
+}
+JAMENDO_CACHE_ALIAS = 'jamendo'
+
 # Jamendo API 設定
 JAMENDO_CLIENT_ID = os.getenv('JAMENDO_CLIENT_ID', '93957ee4')
 
+# Jamendo 上游連線池設定（每個 worker 進程一個 keep-alive 連線池）
+JAMENDO_HTTP_POOL_SIZE = int(os.getenv('JAMENDO_HTTP_POOL_SIZE', '10'))
+JAMENDO_HTTP_CONNECT_TIMEOUT = float(os.getenv('JAMENDO_HTTP_CONNECT_TIMEOUT', '3.05'))
+JAMENDO_HTTP_READ_TIMEOUT = float(os.getenv('JAMENDO_HTTP_READ_TIMEOUT', '10'))
+JAMENDO_HTTP_MAX_RETRIES = int(os.getenv('JAMENDO_HTTP_MAX_RETRIES', '1'))
+# 斷路器：連續失敗次數達到門檻後開啟，開啟期間請求立即失敗，冷卻後背景探測恢復
+JAMENDO_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('JAMENDO_CIRCUIT_FAILURE_THRESHOLD', '5'))
+JAMENDO_CIRCUIT_RESET_TIMEOUT = int(os.getenv('JAMENDO_CIRCUIT_RESET_TIMEOUT', '30'))
+# 上游失敗（404、錯誤響應）的負緩存秒數
+JAMENDO_NEGATIVE_CACHE_TTL = int(os.getenv('JAMENDO_NEGATIVE_CACHE_TTL', '30'))
+# 最後成功數據（上游故障時返回）：只保存列表與詳情的緩存配置，保留到 hard TTL 之後的秒數
+JAMENDO_LAST_KNOWN_GOOD_PROFILES = ('popular', 'tag', 'latest', 'detail')
+JAMENDO_LAST_KNOWN_GOOD_TTL = int(os.getenv('JAMENDO_LAST_KNOWN_GOOD_TTL', '86400'))
+# 上游配額（固定窗口）：每個窗口（秒）最多請求次數，0 表示不限流；計數放在共享緩存層
+JAMENDO_QUOTA_LIMIT = int(os.getenv('JAMENDO_QUOTA_LIMIT', '0'))
+JAMENDO_QUOTA_WINDOW = int(os.getenv('JAMENDO_QUOTA_WINDOW', '60'))
+# 各優先級可使用的額度比例，以及額度用完時最多等待下一窗口的秒數
+JAMENDO_QUOTA_SHARES = {'interactive': 1.0, 'feed': 0.7, 'crawl': 0.4}
+JAMENDO_QUOTA_MAX_WAIT = {'interactive': 1.0, 'feed': 0.0, 'crawl': 60.0}
+# 請求對沖：超過近期延遲百分位仍未返回時再發一個相同請求，對沖數量不超過上游請求的預算比例
+JAMENDO_HEDGE_ENABLED = os.getenv('JAMENDO_HEDGE_ENABLED', 'False').lower() == 'true'
+JAMENDO_HEDGE_PERCENTILE = float(os.getenv('JAMENDO_HEDGE_PERCENTILE', '0.95'))
+JAMENDO_HEDGE_BUDGET = float(os.getenv('JAMENDO_HEDGE_BUDGET', '0.05'))
+JAMENDO_HEDGE_MIN_DELAY = float(os.getenv('JAMENDO_HEDGE_MIN_DELAY', '0.05'))
+JAMENDO_HEDGE_MIN_SAMPLES = int(os.getenv('JAMENDO_HEDGE_MIN_SAMPLES', '20'))
+# 非同步上游連線池（ASGI 模式，每個進程所有上游共用）
+UPSTREAM_ASYNC_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_ASYNC_MAX_CONNECTIONS', '200'))
+UPSTREAM_ASYNC_MAX_KEEPALIVE = int(os.getenv('UPSTREAM_ASYNC_MAX_KEEPALIVE', '50'))
+# 上游請求錄製 / 重放（Jamendo、Spotify）：off、record（錄製響應與延遲）、replay（不連網，從錄製檔案返回）
+UPSTREAM_REPLAY_MODE = os.getenv('UPSTREAM_REPLAY_MODE', 'off').lower()
+UPSTREAM_REPLAY_DIR = os.getenv('UPSTREAM_REPLAY_DIR', str(BASE_DIR / 'upstream_fixtures'))
+# 重放延遲：recorded（錄製時的延遲）、none、synthetic（對數常態分佈，中位數單位：秒）
+UPSTREAM_REPLAY_LATENCY = os.getenv('UPSTREAM_REPLAY_LATENCY', 'recorded').lower()
+UPSTREAM_REPLAY_LATENCY_MEDIAN = float(os.getenv('UPSTREAM_REPLAY_LATENCY_MEDIAN', '0.15'))
+UPSTREAM_REPLAY_LATENCY_SIGMA = float(os.getenv('UPSTREAM_REPLAY_LATENCY_SIGMA', '0.5'))
+UPSTREAM_REPLAY_SEED = int(os.getenv('UPSTREAM_REPLAY_SEED', '0'))
+
+# 緩存未命中時的請求合併（single-flight）設定，單位：秒
+JAMENDO_SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('JAMENDO_SINGLE_FLIGHT_LOCK_TIMEOUT', '15'))
+JAMENDO_SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv('JAMENDO_SINGLE_FLIGHT_WAIT_TIMEOUT', '15'))
+JAMENDO_SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('JAMENDO_SINGLE_FLIGHT_POLL_INTERVAL', '0.05'))
+
+# Jamendo 緩存 TTL（秒）
+# soft：超過後立即返回舊數據並在背景刷新；hard：超過後緩存真正失效
+def _jamendo_ttl(name, soft, hard):
+    return {
+        'soft': int(os.getenv(f'JAMENDO_TTL_{name}_SOFT', soft)),
+        'hard': int(os.getenv(f'JAMENDO_TTL_{name}_HARD', hard)),
+    }
+
+JAMENDO_CACHE_SWR_ENABLED = os.getenv('JAMENDO_CACHE_SWR_ENABLED', 'True').lower() == 'true'
+JAMENDO_CACHE_TTLS = {
+    'popular': _jamendo_ttl('POPULAR', 3600, 6 * 3600),     # 熱門 1 小時
+    'tag': _jamendo_ttl('TAG', 7200, 12 * 3600),            # 標籤 2 小時
+    'latest': _jamendo_ttl('LATEST', 1800, 2 * 3600),       # 最新 30 分鐘
+    'detail': _jamendo_ttl('DETAIL', 86400, 3 * 86400),     # 詳情 24 小時
+    'search': _jamendo_ttl('SEARCH', 3600, 6 * 3600),       # 搜尋 1 小時
+}
+# 機率性提前刷新（XFetch）係數，0 表示停用
+JAMENDO_CACHE_EARLY_REFRESH_BETA = float(os.getenv('JAMENDO_CACHE_EARLY_REFRESH_BETA', '1.0'))
+# 背景刷新線程數（每個 worker）
+JAMENDO_BACKGROUND_WORKERS = int(os.getenv('JAMENDO_BACKGROUND_WORKERS', '2'))
+# 批次端點每個請求並發請求上游的最大數量（同步模式）
+JAMENDO_BATCH_CONCURRENCY = int(os.getenv('JAMENDO_BATCH_CONCURRENCY', '8'))
+# 上游返回的音軌是否在背景寫入 jamendo_tracks
+JAMENDO_INGEST_ENABLED = os.getenv('JAMENDO_INGEST_ENABLED', 'True').lower() == 'true'
+# 列表請求的 limit 向上取整到分桶後請求上游並緩存，較小的 limit 由分桶結果切片
+JAMENDO_LIMIT_BUCKETS = [50, 100, 200]
+# 列表分頁：每次開始翻頁建立快照，快照與頁面在 JAMENDO_CURSOR_TTL（秒）內內容固定；
+# 快照不足時每次向上游補充的音軌數（最多 200）
+JAMENDO_CURSOR_TTL = int(os.getenv('JAMENDO_CURSOR_TTL', '3600'))
+JAMENDO_CURSOR_WINDOW = int(os.getenv('JAMENDO_CURSOR_WINDOW', '100'))
+# 緩存響應寫入時預壓縮（gzip，安裝 brotli 時另存 br），命中時按 Accept-Encoding 返回
+JAMENDO_RESPONSE_COMPRESSION = os.getenv('JAMENDO_RESPONSE_COMPRESSION', 'True').lower() == 'true'
+JAMENDO_COMPRESS_MIN_SIZE = int(os.getenv('JAMENDO_COMPRESS_MIN_SIZE', '1024'))
+JAMENDO_GZIP_LEVEL = int(os.getenv('JAMENDO_GZIP_LEVEL', '6'))
+JAMENDO_BROTLI_QUALITY = int(os.getenv('JAMENDO_BROTLI_QUALITY', '5'))
+# 列表端點默認返回的欄位：card（卡片所需欄位）或 full（上游完整數據）
+JAMENDO_LIST_DEFAULT_VIEW = os.getenv('JAMENDO_LIST_DEFAULT_VIEW', 'card')
+# 搜尋先查本地音軌庫：off（默認，只請求上游）/ local_first / local_only
+JAMENDO_LOCAL_SEARCH_MODE = os.getenv('JAMENDO_LOCAL_SEARCH_MODE', 'off')
+# local_first 模式下本地結果達到此數量即不請求上游（0 表示需達到 limit）
+JAMENDO_LOCAL_SEARCH_MIN_RESULTS = int(os.getenv('JAMENDO_LOCAL_SEARCH_MIN_RESULTS', '0'))
+# 按標籤獲取音軌先查本地音軌庫（jamendo_track_tags 索引）：off（默認）/ local_first / local_only，門檻與搜尋相同
+JAMENDO_LOCAL_TAG_MODE = os.getenv('JAMENDO_LOCAL_TAG_MODE', 'off')
+# 隨機音軌池（每個 worker）：目標大小、低於此數量時背景補充、本地音軌庫佔比
+JAMENDO_RANDOM_POOL_SIZE = int(os.getenv('JAMENDO_RANDOM_POOL_SIZE', '600'))
+JAMENDO_RANDOM_POOL_REFILL_AT = int(os.getenv('JAMENDO_RANDOM_POOL_REFILL_AT', '200'))
+JAMENDO_RANDOM_POOL_LOCAL_RATIO = float(os.getenv('JAMENDO_RANDOM_POOL_LOCAL_RATIO', '0.5'))
+# 緩存預熱：前端使用的 limit（useJamendo 默認 50，首頁 30，自定義播放清單 15/10）
+JAMENDO_WARM_LIMITS = {
+    'popular': [50, 30, 10],
+    'latest': [50, 30],
+    'tag': [50, 30, 15],
+}
+# 進程內預熱排程（每個 worker），間隔需小於提前刷新餘量
+JAMENDO_WARM_SCHEDULER_ENABLED = os.getenv('JAMENDO_WARM_SCHEDULER_ENABLED', 'False').lower() == 'true'
+JAMENDO_WARM_INTERVAL = int(os.getenv('JAMENDO_WARM_INTERVAL', '300'))
+JAMENDO_WARM_MARGIN = int(os.getenv('JAMENDO_WARM_MARGIN', '600'))
+JAMENDO_WARM_CONCURRENCY = int(os.getenv('JAMENDO_WARM_CONCURRENCY', '4'))
+# 本地音軌庫刷新：按 cached_at 取出最舊的音軌批次向上游更新，每小時最多刷新的音軌數（所有 worker 共用）
+JAMENDO_REFRESH_ENABLED = os.getenv('JAMENDO_REFRESH_ENABLED', 'False').lower() == 'true'
+JAMENDO_REFRESH_BATCH_SIZE = int(os.getenv('JAMENDO_REFRESH_BATCH_SIZE', '100'))
+JAMENDO_REFRESH_TRACKS_PER_HOUR = int(os.getenv('JAMENDO_REFRESH_TRACKS_PER_HOUR', '3000'))
+# 只刷新超過此秒數未更新的音軌
+JAMENDO_REFRESH_MIN_AGE = int(os.getenv('JAMENDO_REFRESH_MIN_AGE', '86400'))
+# 目錄批次抓取（crawl_jamendo_catalog）：同時抓取的分區數、每批寫入的音軌數與檢查點檔案
+JAMENDO_CRAWL_CONCURRENCY = int(os.getenv('JAMENDO_CRAWL_CONCURRENCY', '2'))
+JAMENDO_CRAWL_BATCH_SIZE = int(os.getenv('JAMENDO_CRAWL_BATCH_SIZE', '1000'))
+JAMENDO_CRAWL_CHECKPOINT = os.getenv('JAMENDO_CRAWL_CHECKPOINT', str(BASE_DIR / 'logs' / 'jamendo_crawl.json'))
+
 
 # 添加 CORS 允許的 headers
 CORS_ALLOW_HEADERS = [
@@ -0,0 +1,19 @@
+#!/usr/bin/env bash
+# backend/start.sh
+# 啟動腳本：SERVER_MODE=asgi 時使用 uvicorn worker（非同步上游視圖），否則使用 gunicorn 同步 worker
+set -e
+cd "$(dirname "$0")"
+
+# 使用共享緩存（REDIS_URL）時可在啟動前預熱，避免冷啟動的首批請求未命中
+if [ "${JAMENDO_WARM_ON_START:-false}" = "true" ]; then
+    python manage.py warm_jamendo_cache || echo "Jamendo 緩存預熱失敗，繼續啟動"
+fi
+
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn music_streaming.asgi:application \
+        -k uvicorn_worker.UvicornWorker \
+        --bind 0.0.0.0:$PORT --workers 2 --timeout 120
+else
+    exec gunicorn music_streaming.wsgi:application \
+        --bind 0.0.0.0:$PORT --workers 2 --timeout 120
+fi
@@ -864,6 +864,18 @@ export function useJamendo() {
     }
   }
 
+  // 綜合搜尋（音軌、藝人、專輯與本地音軌庫）
+  // 返回 { top, groups: { tracks, artists, albums } }，失敗時各分組為空陣列
+  const searchAll = async (query, options = {}) => {
+    try {
+      const response = await jamendoAPI('search/all/', { q: query, limit: 10, ...options })
+      return { top: response.top || [], groups: response.groups || {} }
+    } catch (error) {
+      console.error('❌ 綜合搜尋失敗:', error)
+      return { top: [], groups: { tracks: [], artists: [], albums: [] } }
+    }
+  }
+
   // 按標籤搜尋
   const getTracksByTag = async (tag, options = {}) => {
     try {
@@ -929,6 +941,76 @@ export function useJamendo() {
     }
   }
 
+  // 分頁獲取列表（無限捲動）- 第一頁不傳 cursor，之後傳上一頁返回的 nextCursor
+  // feed: 'popular' | 'latest' | 'tag' | 'search'，返回 { tracks, nextCursor }，沒有下一頁時 nextCursor 為 null
+  const PAGED_ENDPOINTS = {
+    popular: 'tracks/popular/',
+    latest: 'tracks/latest/',
+    tag: 'tracks/tag/',
+    search: 'search/'
+  }
+
+  const getTrackPage = async (feed, { cursor = null, limit = 20, ...options } = {}) => {
+    try {
+      const params = cursor ? { cursor, ...options } : { offset: 0, limit, ...options }
+      const response = await jamendoAPI(PAGED_ENDPOINTS[feed], params)
+      return {
+        tracks: response.results || [],
+        nextCursor: response.pagination?.next_cursor || null
+      }
+    } catch (error) {
+      console.error('❌ 分頁獲取音軌失敗:', error)
+      return { tracks: [], nextCursor: null }
+    }
+  }
+
+  // 按多個 id 獲取音軌（例如開啟播放佇列）- 一次請求，返回順序與 ids 相同
+  const getTracksByIds = async (ids, options = {}) => {
+    if (!ids.length) return []
+    try {
+      const response = await jamendoAPI('tracks/details/', { ids: ids.join(','), ...options })
+      return response.results || []
+    } catch (error) {
+      console.error('❌ 批次獲取音軌詳情失敗:', error)
+      return []
+    }
+  }
+
+  // 批次獲取多個區塊（熱門、最新、多個曲風...）- 一次請求取代多次請求
+  // sections: [{ id: 'popular', type: 'popular', limit: 50 }, { id: 'rock', type: 'tag', tag: 'rock', limit: 50 }]
+  // 返回 { [id]: tracks }，失敗的區塊返回空陣列
+  const getSections = async (sections) => {
+    try {
+      const response = await fetch(`${API_BASE}/api/jamendo/batch/`, {
+        method: 'POST',
+        headers: {
+          'Accept': 'application/json',
+          'Content-Type': 'application/json'
+        },
+        credentials: 'same-origin',
+        body: JSON.stringify({ sections })
+      })
+      
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`)
+      }
+      
+      const data = await response.json()
+      const results = {}
+      for (const section of data.sections || []) {
+        if (section.status !== 'ok' && !import.meta.env.PROD) {
+          console.warn('⚠️ 批次區塊失敗:', section.id, section.error)
+        }
+        results[section.id] = section.results || []
+      }
+      return results
+    } catch (error) {
+      console.error('❌ 批次獲取區塊失敗:', error)
+      lastError.value = error.message
+      return Object.fromEntries(sections.map((section, index) => [section.id || `section_${index}`, []]))
+    }
+  }
+
   // 連接和斷開
   const connectJamendo = async () => {
     console.log('🎵 連接 Jamendo...')
@@ -1061,10 +1143,14 @@ export function useJamendo() {
     toggleShuffle,
     toggleRepeat,
     searchTracks,
+    searchAll,
     getTracksByTag,
     getPopularTracks,
     getLatestTracks,
     getRandomTracks,
+    getTrackPage,
+    getTracksByIds,
+    getSections,
     setPlaylist,
     clearPlaylist,
     playNextInPlaylist,